@@ -0,0 +1,46 @@
+"""add device_keys
+
+Revision ID: 182fdc7ca967
+Revises: xxxx
+Create Date: 2026-10-19 10:02:11.418270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '182fdc7ca967'
+down_revision: Union[str, Sequence[str], None] = 'xxxx'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('device_keys',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key_id', sa.String(length=32), nullable=False),
+    sa.Column('device_id', sa.String(length=64), nullable=False),
+    sa.Column('secret', sa.String(length=128), nullable=False),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_device_keys_id'), 'device_keys', ['id'], unique=False)
+    op.create_index(op.f('ix_device_keys_key_id'), 'device_keys', ['key_id'], unique=True)
+    op.create_index(op.f('ix_device_keys_device_id'), 'device_keys', ['device_id'], unique=False)
+    op.create_index(op.f('ix_device_keys_updated_at'), 'device_keys', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_device_keys_updated_at'), table_name='device_keys')
+    op.drop_index(op.f('ix_device_keys_device_id'), table_name='device_keys')
+    op.drop_index(op.f('ix_device_keys_key_id'), table_name='device_keys')
+    op.drop_index(op.f('ix_device_keys_id'), table_name='device_keys')
+    op.drop_table('device_keys')
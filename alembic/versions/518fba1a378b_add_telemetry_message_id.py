@@ -0,0 +1,39 @@
+"""add telemetry_events.message_id for idempotent ingest
+
+Revision ID: 518fba1a378b
+Revises: 182fdc7ca967
+Create Date: 2026-10-19 11:40:52.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '518fba1a378b'
+down_revision: Union[str, Sequence[str], None] = '182fdc7ca967'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("telemetry_events") as batch_op:
+        batch_op.add_column(sa.Column("message_id", sa.String(length=64), nullable=True))
+
+    # NULL message ids never collide, so un-keyed rows are unaffected
+    op.create_index(
+        "ux_telemetry_events_device_message",
+        "telemetry_events",
+        ["device_id", "message_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ux_telemetry_events_device_message", table_name="telemetry_events")
+    with op.batch_alter_table("telemetry_events") as batch_op:
+        batch_op.drop_column("message_id")
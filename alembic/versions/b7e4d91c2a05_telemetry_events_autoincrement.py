@@ -0,0 +1,38 @@
+"""AUTOINCREMENT telemetry_events ids so archived ids are never reused
+
+Revision ID: b7e4d91c2a05
+Revises: f2b8d4e61a3c
+Create Date: 2026-10-19 15:21:40.113902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d91c2a05'
+down_revision: Union[str, Sequence[str], None] = 'f2b8d4e61a3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _recreate(autoincrement: bool) -> None:
+    # SQLite can't alter a primary key in place; the copy keeps every id and index, and
+    # with AUTOINCREMENT the copied ids also seed sqlite_sequence
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "telemetry_events", recreate="always", table_kwargs={"sqlite_autoincrement": autoincrement}
+    ):
+        pass
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate(True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate(False)
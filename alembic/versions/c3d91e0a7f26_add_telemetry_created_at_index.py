@@ -0,0 +1,27 @@
+"""index telemetry_events.created_at for time partitions
+
+Revision ID: c3d91e0a7f26
+Revises: 518fba1a378b
+Create Date: 2026-10-19 12:05:13.418820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d91e0a7f26'
+down_revision: Union[str, Sequence[str], None] = '518fba1a378b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_telemetry_events_created_at", "telemetry_events", ["created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_telemetry_events_created_at", table_name="telemetry_events")
@@ -0,0 +1,46 @@
+"""index copilot run history: (user_id, id) and copilot_runs.device_id
+
+Revision ID: e5a1c7b2d904
+Revises: c3d91e0a7f26
+Create Date: 2026-10-19 12:31:47.205913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7b2d904'
+down_revision: Union[str, Sequence[str], None] = 'c3d91e0a7f26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_exists(index_name: str) -> bool:
+    return index_name in {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("copilot_runs")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("copilot_runs") as batch_op:
+        batch_op.add_column(sa.Column("device_id", sa.String(length=64), nullable=True))
+
+    op.execute("UPDATE copilot_runs SET device_id = json_extract(input_context, '$.device_id')")
+
+    op.create_index("ix_copilot_runs_user_id_id", "copilot_runs", ["user_id", "id"])
+    op.create_index("ix_copilot_runs_user_id_device_id_id", "copilot_runs", ["user_id", "device_id", "id"])
+    # the composite indexes cover user_id lookups on their own
+    if _index_exists("ix_copilot_runs_user_id"):
+        op.drop_index("ix_copilot_runs_user_id", table_name="copilot_runs")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_copilot_runs_user_id", "copilot_runs", ["user_id"], unique=False)
+    op.drop_index("ix_copilot_runs_user_id_device_id_id", table_name="copilot_runs")
+    op.drop_index("ix_copilot_runs_user_id_id", table_name="copilot_runs")
+
+    with op.batch_alter_table("copilot_runs") as batch_op:
+        batch_op.drop_column("device_id")
@@ -0,0 +1,112 @@
+"""kb_snippets table; compact copilot_runs.output sources into references
+
+Revision ID: f2b8d4e61a3c
+Revises: e5a1c7b2d904
+Create Date: 2026-10-19 13:02:11.640287
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4e61a3c'
+down_revision: Union[str, Sequence[str], None] = 'e5a1c7b2d904'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 500
+
+
+def _snippet_hash(hit: dict) -> str:
+    # same as api.services.kb_snippets.snippet_hash, frozen here for the migration
+    payload = json.dumps(
+        [hit.get("id"), hit.get("title"), hit.get("source"), hit.get("snippet")],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _rewrite_outputs(conn, rewrite) -> None:
+    """rewrite(sources) -> new sources or None (unchanged), applied to every run in id order."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, output FROM copilot_runs WHERE id > :last ORDER BY id LIMIT :n"),
+            {"last": last_id, "n": BATCH},
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for run_id, raw in rows:
+            output = json.loads(raw) if raw else None
+            if isinstance(output, dict) and isinstance(output.get("sources"), list):
+                sources = rewrite(output["sources"])
+                if sources is not None:
+                    output["sources"] = sources
+                    updates.append({"id": run_id, "output": json.dumps(output)})
+        if updates:
+            conn.execute(sa.text("UPDATE copilot_runs SET output = :output WHERE id = :id"), updates)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "kb_snippets",
+        sa.Column("content_hash", sa.String(length=32), primary_key=True),
+        sa.Column("doc_id", sa.Integer(), nullable=True),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("source", sa.Text(), nullable=True),
+        sa.Column("snippet", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+    )
+
+    conn = op.get_bind()
+    insert = sa.text(
+        "INSERT OR IGNORE INTO kb_snippets (content_hash, doc_id, title, source, snippet) "
+        "VALUES (:content_hash, :doc_id, :title, :source, :snippet)"
+    )
+
+    def compact(sources):
+        if not any(isinstance(s, dict) and "snippet" in s for s in sources):
+            return None
+        refs = []
+        for s in sources:
+            if isinstance(s, dict) and "snippet" in s:
+                h = _snippet_hash(s)
+                conn.execute(insert, {
+                    "content_hash": h,
+                    "doc_id": s.get("id"),
+                    "title": s.get("title"),
+                    "source": s.get("source"),
+                    "snippet": s.get("snippet"),
+                })
+                refs.append({"id": s.get("id"), "hash": h})
+            else:
+                refs.append(s)
+        return refs
+
+    _rewrite_outputs(conn, compact)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    snippets = {
+        r[0]: {"id": r[1], "title": r[2], "source": r[3], "snippet": r[4]}
+        for r in conn.execute(sa.text("SELECT content_hash, doc_id, title, source, snippet FROM kb_snippets"))
+    }
+
+    def inline(sources):
+        if not any(isinstance(s, dict) and s.get("hash") in snippets for s in sources):
+            return None
+        return [snippets.get(s.get("hash"), s) if isinstance(s, dict) else s for s in sources]
+
+    _rewrite_outputs(conn, inline)
+    op.drop_table("kb_snippets")
@@ -0,0 +1,225 @@
+"""
+Admission control: per-key token buckets and adaptive load shedding.
+
+Rate limits (429 + Retry-After) keep one tenant from crowding out the rest:
+  - ingest, per device_id: a batch costs one token per item of that device
+  - POST /copilot/run, per user
+  - POST /auth/login, per client address and submitted email (callers are
+    anonymous there; the email alone would let anyone lock an account out)
+
+Load shedding (503 + Retry-After) turns work away early when the process is
+already behind, so the work that matters keeps flowing:
+  - DB write pressure: an EWMA of telemetry write latency (transaction time on
+    the shard writers, which includes waiting for the single writer). Larger
+    batches are scaled down to shed_db_write_batch_items, so one big healthy
+    batch doesn't read as a slow writer. Above shed_db_write_latency_ms,
+    routes that compete for the writer or the disk (copilot runs,
+    registration, exports) are refused; ingest is never shed.
+  - LLM queue depth: call_llm calls in flight. Ollama serves them one or a few
+    at a time, so beyond shed_llm_queue_depth a new copilot run would only
+    wait behind the others until its client gives up.
+
+Everything is per process, like the principal cache and the metrics.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from api.core.auth_deps import get_current_user
+from api.core.config import settings
+from api.core.metrics import ADMISSION_REJECTED
+from api.core.principal import Principal
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key: `rate` tokens/s refill up to `burst`. Keys are kept in
+    LRU order and the least recently seen are dropped past max_keys (a dropped
+    key comes back with a full bucket). rate <= 0 disables the limiter.
+
+    A request costing more than `burst` (a large batch) is admitted once the
+    bucket is full and leaves it in debt, so the long-run rate still holds.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _level(self, key: str, now: float) -> float:
+        entry = self._buckets.get(key)
+        if entry is None:
+            return self.burst
+        tokens, updated = entry
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def acquire(self, costs: Mapping[str, float]) -> float:
+        """
+        Takes costs[key] tokens from every key, all or nothing. Returns 0 when
+        admitted, otherwise the seconds until the slowest key could afford it.
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            levels = {key: self._level(key, now) for key in costs}
+            wait = 0.0
+            for key, cost in costs.items():
+                need = min(cost, self.burst)
+                if levels[key] < need:
+                    wait = max(wait, (need - levels[key]) / self.rate)
+            if wait > 0:
+                return wait
+            for key, cost in costs.items():
+                self._buckets[key] = (levels[key] - cost, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class Ewma:
+    """Exponentially weighted moving average with a time-based half-life (irregular samples)."""
+
+    def __init__(self, half_life_seconds: float) -> None:
+        self.half_life = half_life_seconds
+        self._value = 0.0
+        self._updated = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._updated == 0.0:
+                self._value = value
+            else:
+                weight = 0.5 ** ((now - self._updated) / self.half_life)
+                self._value = self._value * weight + value * (1 - weight)
+            self._updated = now
+
+    def value(self) -> float:
+        """Current average, decayed toward 0 while no samples arrive (an idle writer isn't overloaded)."""
+        with self._lock:
+            if self._updated == 0.0:
+                return 0.0
+            return self._value * 0.5 ** ((time.monotonic() - self._updated) / self.half_life)
+
+
+class LoadShedder:
+    def __init__(
+        self, db_write_latency_ms: float, db_write_batch_items: int, llm_queue_depth: int, half_life_seconds: float
+    ) -> None:
+        self.db_write_latency_ms = db_write_latency_ms
+        self.db_write_batch_items = max(db_write_batch_items, 1)
+        self.llm_queue_depth = llm_queue_depth
+        self.db_write = Ewma(half_life_seconds)
+        self._llm_in_flight = 0
+        self._lock = threading.Lock()
+
+    def observe_db_write(self, seconds: float, items: int) -> None:
+        # per-item time x batch_items for larger batches; smaller ones are mostly commit and writer wait
+        scale = min(1.0, self.db_write_batch_items / max(items, 1))
+        self.db_write.observe(seconds * 1000 * scale)
+
+    def db_overloaded(self) -> bool:
+        return self.db_write_latency_ms > 0 and self.db_write.value() > self.db_write_latency_ms
+
+    @contextmanager
+    def llm_call(self) -> Iterator[None]:
+        with self._lock:
+            self._llm_in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._llm_in_flight -= 1
+
+    def llm_overloaded(self) -> bool:
+        return self.llm_queue_depth > 0 and self._llm_in_flight >= self.llm_queue_depth
+
+    def stats(self) -> Dict[str, float]:
+        return {"db_write_latency_ms": self.db_write.value(), "llm_in_flight": self._llm_in_flight}
+
+
+ingest_limiter = TokenBucketLimiter(
+    settings.ingest_rate_per_device, settings.ingest_burst_per_device, settings.rate_limit_max_keys
+)
+copilot_limiter = TokenBucketLimiter(
+    settings.copilot_rate_per_user, settings.copilot_burst_per_user, settings.rate_limit_max_keys
+)
+login_limiter = TokenBucketLimiter(
+    settings.login_rate_per_user, settings.login_burst_per_user, settings.rate_limit_max_keys
+)
+load_shedder = LoadShedder(
+    settings.shed_db_write_latency_ms,
+    settings.shed_db_write_batch_items,
+    settings.shed_llm_queue_depth,
+    settings.shed_half_life_seconds,
+)
+
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+def rate_limited(reason: str, retry_after: float, detail: str = "Rate limit exceeded") -> HTTPException:
+    ADMISSION_REJECTED.labels(reason).inc()
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail, headers=_retry_after(retry_after)
+    )
+
+
+def overloaded(reason: str, detail: str) -> HTTPException:
+    ADMISSION_REJECTED.labels(reason).inc()
+    # a few seconds lets the EWMA / LLM queue move before the retry
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail, headers=_retry_after(5))
+
+
+def admit_devices(counts: Mapping[str, int]) -> None:
+    """Charges each device's bucket for its items in a request; 429 if any is over its rate."""
+    wait = ingest_limiter.acquire(counts)
+    if wait > 0:
+        raise rate_limited("rate_device", wait, "Device rate limit exceeded")
+
+
+def shed_if_db_overloaded() -> None:
+    """Dependency for routes that compete with ingest for the DB writer or disk."""
+    if load_shedder.db_overloaded():
+        raise overloaded("shed_db", "Database is overloaded, retry shortly")
+
+
+async def admit_copilot_run(principal: Principal = Depends(get_current_user)) -> Principal:
+    # shed before charging the bucket: a 503 shouldn't cost the user a run
+    if load_shedder.llm_overloaded():
+        raise overloaded("shed_llm", "Copilot is at capacity, retry shortly")
+    shed_if_db_overloaded()
+    wait = copilot_limiter.acquire({str(principal.id): 1})
+    if wait > 0:
+        raise rate_limited("rate_copilot", wait)
+    return principal
+
+
+def admit_login(client: str, email: str) -> None:
+    wait = login_limiter.acquire({f"{client}\x1f{email.strip().lower()}": 1})
+    if wait > 0:
+        raise rate_limited("rate_login", wait, "Too many login attempts")
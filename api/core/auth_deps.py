@@ -1,19 +1,19 @@
+from typing import Optional, Tuple
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 
 from api.core.config import settings
-from api.db.deps import get_db
+from api.core.principal import Principal, principal_cache
 from api.db.models import User
+from api.db.async_session import AsyncReadSessionLocal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+def _decode_token(token: str) -> Tuple[int, Optional[int]]:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
         sub = payload.get("sub")
@@ -26,7 +26,40 @@ def get_current_user(
             detail="Invalid or expired token",
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    exp = payload.get("exp")
+    return user_id, int(exp) if exp is not None else None
+
+
+async def _load_principal(user_id: int) -> Optional[Principal]:
+    async with AsyncReadSessionLocal() as db:
+        row = (await db.execute(select(User.id, User.email).where(User.id == user_id))).first()
+    if not row:
+        return None
+    return Principal(id=row.id, email=row.email)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    # Hot path: a cached principal skips both the JWT decode and the DB lookup.
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+
+    user_id, exp = _decode_token(token)
+    generation = principal_cache.generation()
+
+    principal = await _load_principal(user_id)
+    if principal is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+
+    principal_cache.put(token, principal, exp, generation)
+    return principal
+
+
+def is_admin(principal: Principal) -> bool:
+    return principal.email.lower() in {e.lower() for e in settings.admin_emails}
+
+
+async def get_admin_user(principal: Principal = Depends(get_current_user)) -> Principal:
+    if not is_admin(principal):
+        raise HTTPException(status_code=403, detail="Admin only")
+    return principal
@@ -6,15 +6,120 @@ class Settings(BaseSettings):
     app_name: str = "AVOps Copilot – Internal AI Tooling (Foundations)"
     env: str = "dev"  # dev | prod | test
     debug: bool = True
+    # queued logging (see api/core/logging.py); ingest batch/access lines are sampled
+    log_format: str = "json"  # json | text
+    log_queue_size: int = 10_000
+    log_ingest_sample_rate: float = 0.01
     
     jwt_secret: str = "change_me"
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 120
 
+    # verified token -> principal cache (0 disables)
+    auth_cache_ttl_seconds: int = 300
+    auth_cache_max_entries: int = 10_000
+
+    # bcrypt runs in its own process pool (0 workers = inline)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 32
+
+    # HMAC device keys on /telemetry/ingest
+    device_auth_required: bool = False
+    device_auth_max_skew_seconds: int = 300
+    device_key_refresh_seconds: int = 30
+
+    # ingest idempotency: recent-key Bloom filter sizing, stream flush size
+    ingest_dedupe_capacity: int = 1_000_000
+    ingest_dedupe_error_rate: float = 0.001
+    ingest_stream_batch_size: int = 500
+
     cors_origins: List[str] = ["http://localhost:3000"]
 
     database_url: str = "sqlite:///./avops.db"
 
+    # "production": WAL + tuned pragmas, single-writer engine, pooled read-only engine
+    sqlite_profile: str = "dev"  # dev | production
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 8
+
+    # telemetry_events sharded by device across N SQLite files (1 = main database)
+    telemetry_shards: int = 1
+    telemetry_shard_url_template: str = "sqlite:///./telemetry_{shard}_of_{count}.db"
+
+    # time partitions older than telemetry_hot_days move to compressed archive files (0 = keep all live)
+    telemetry_partition: str = "day"  # day | week
+    telemetry_hot_days: int = 0
+    telemetry_archive_retention_days: int = 0  # 0 = keep archives forever
+    telemetry_archive_dir: str = "./telemetry_archive"
+    telemetry_archive_interval_seconds: int = 0  # 0 = run scripts.archive_telemetry from cron instead
+
+    # rows per server-side cursor fetch / record batch in Parquet and Arrow exports
+    export_batch_rows: int = 50_000
+
+    # list pages with more rows than this are streamed as they are encoded (no Content-Length)
+    list_stream_min_rows: int = 50
+
+    # gzip/br for text responses at least this large (br needs the optional brotli package)
+    compression_min_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+
+    # users allowed on /api/v1/admin routes and to request profiling
+    admin_emails: List[str] = []
+
+    # request profiling (X-Profile / ?profile= from admins, or sampled); see api/core/profiling.py
+    profiling_enabled: bool = True
+    profiling_sample_rate: float = 0.0
+    profiling_ring_size: int = 50
+    profiling_dir: str = ""  # also write <id>.json / <id>.prof here when set
+    profiling_max_queries: int = 2000
+    profiling_n_plus_one_threshold: int = 5
+    profiling_top_functions: int = 40
+    profiling_tracemalloc_frames: int = 10
+
+    # /predict/risk micro-batching: concurrent requests within the window are scored in one pass (0 disables)
+    risk_batch_window_ms: float = 2.0
+    risk_batch_max_size: int = 256
+    # learned risk model published by scripts.train_risk_model (threshold rules while none is current)
+    risk_model_dir: str = "./risk_models"
+    risk_model_reload_seconds: int = 30  # manifest check interval; 0 = load once at startup
+
+    # per-key token buckets, tokens/s and burst (rate 0 disables); see api/core/admission.py
+    ingest_rate_per_device: float = 50.0
+    ingest_burst_per_device: float = 1000.0
+    copilot_rate_per_user: float = 0.1
+    copilot_burst_per_user: float = 5.0
+    login_rate_per_user: float = 0.2
+    login_burst_per_user: float = 10.0
+    rate_limit_max_keys: int = 100_000
+    # load shedding (0 disables): telemetry write latency EWMA, call_llm calls in flight
+    shed_db_write_latency_ms: float = 500.0
+    # write latency is scaled to a batch of at most this many items before it enters the EWMA
+    shed_db_write_batch_items: int = 500
+    shed_llm_queue_depth: int = 8
+    shed_half_life_seconds: float = 5.0
+
+    # background warm-up at startup; GET /ready is 503 until it finishes and while a required check fails
+    warmup_enabled: bool = True
+    warmup_latest_devices: int = 1000  # per shard, newest-active first
+    warmup_llm_timeout_seconds: int = 300
+    ready_required: List[str] = ["database", "kb"]  # of database | kb | llm
+    ready_cache_seconds: float = 2.0
+    ready_probe_timeout_seconds: float = 2.0
+
+    # Prometheus text metrics at GET /metrics (per process)
+    metrics_enabled: bool = True
+
+    # opt-in sampled request capture to JSONL for scripts.replay_traffic (auth and passwords redacted)
+    traffic_capture_enabled: bool = False
+    traffic_capture_path: str = "./requests.jsonl"
+    traffic_capture_sample_rate: float = 1.0
+    traffic_capture_max_body_bytes: int = 256 * 1024
+    traffic_capture_queue_size: int = 10_000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,63 @@
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from api.core.config import settings
+from api.services.device_keys import DeviceKeyEntry, device_keys
+
+KEY_ID_HEADER = "X-Device-Key-Id"
+TIMESTAMP_HEADER = "X-Device-Timestamp"
+SIGNATURE_HEADER = "X-Device-Signature"
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+async def get_device_key(request: Request) -> Optional[DeviceKeyEntry]:
+    """
+    Verifies the HMAC device signature on ingest requests.
+
+    Headers:
+      - X-Device-Key-Id: key id issued by POST /api/v1/device/keys
+      - X-Device-Timestamp: unix seconds, must be within device_auth_max_skew_seconds
+      - X-Device-Signature: hex HMAC-SHA256(secret, "<timestamp>." + raw body)
+
+    Unsigned requests pass through (returning None) unless device_auth_required is set.
+    """
+    key_id = request.headers.get(KEY_ID_HEADER)
+    if not key_id:
+        if settings.device_auth_required:
+            raise _unauthorized("Device signature required")
+        return None
+
+    timestamp = request.headers.get(TIMESTAMP_HEADER, "")
+    signature = request.headers.get(SIGNATURE_HEADER, "")
+    try:
+        skew = abs(time.time() - int(timestamp))
+    except ValueError:
+        raise _unauthorized("Invalid device timestamp")
+    if skew > settings.device_auth_max_skew_seconds:
+        raise _unauthorized("Device timestamp outside allowed window")
+
+    body = await request.body()
+
+    if device_keys.knows(key_id):
+        entry = device_keys.verify(key_id, timestamp, body, signature)
+    else:
+        # unknown key may trigger a (rate-limited) DB refresh; keep it off the event loop
+        entry = await run_in_threadpool(device_keys.verify, key_id, timestamp, body, signature)
+
+    if entry is None:
+        raise _unauthorized("Invalid device signature")
+    return entry
+
+
+def ensure_device_matches(entry: Optional[DeviceKeyEntry], device_id: str) -> None:
+    if entry is not None and entry.device_id != device_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Device key does not match payload device_id",
+        )
@@ -0,0 +1,45 @@
+"""
+Conditional GET for polled endpoints.
+
+ETags are derived from state version numbers that are cheaper to read than the
+response (newest event id of a device, newest run id of a user, the in-memory
+latest-store counter), so a matching If-None-Match is answered with 304 before
+the body is built. Tags are weak: the same state may be sent gzip'd, br'd or raw.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+# bump when a polled response changes shape, so clients don't keep a stale body
+SCHEMA_VERSION = "1"
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    raw = "|".join(str(p) for p in (SCHEMA_VERSION, *parts))
+    return 'W/"' + hashlib.blake2b(raw.encode(), digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison: W/"x" matches "x"
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,92 @@
+"""
+JSON for hot list endpoints without per-row Pydantic validation.
+
+Handlers that return a Response skip FastAPI's response_model validation and
+jsonable_encoder pass, so the rows (column tuples or dataclasses) go straight to
+the encoder. orjson is used when installed (dataclasses and datetimes natively);
+the stdlib fallback produces the same JSON, just slower. response_model stays
+on the route for the OpenAPI schema.
+
+Large pages are streamed: the envelope and rows are encoded chunk by chunk as
+the response is sent, so the full body is never built in memory.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from fastapi.responses import Response, StreamingResponse
+
+from api.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json fallback
+    orjson = None
+
+# target size of each streamed chunk
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def raw_json(text: str | None, empty: bytes = b"{}") -> bytes:
+    """Stored JSON text spliced into a response as-is (NULL/'null' -> empty)."""
+    if text is None or text == "null":
+        return empty
+    return text.encode()
+
+
+def iter_items(
+    rows: Iterable[Any],
+    encode_row: Callable[[Any], bytes] = dumps,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Iterator[bytes]:
+    """Encode {"items": [...], **extra} incrementally, in ~STREAM_CHUNK_BYTES pieces."""
+    buf = bytearray(b'{"items":[')
+    first = True
+    for row in rows:
+        if not first:
+            buf += b","
+        buf += encode_row(row)
+        first = False
+        if len(buf) >= STREAM_CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    buf += b"]"
+    for key, value in (extra or {}).items():
+        buf += b"," + dumps(key) + b":" + dumps(value)
+    buf += b"}"
+    yield bytes(buf)
+
+
+async def _aiter(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # async, so Starlette doesn't hop to the threadpool for every chunk of a sync iterator
+    for chunk in chunks:
+        yield chunk
+
+
+def items_response(
+    rows: Sequence[Any],
+    encode_row: Callable[[Any], bytes] = dumps,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Response:
+    """{"items": rows, **extra}; pages above list_stream_min_rows are streamed."""
+    chunks = iter_items(rows, encode_row, extra)
+    if len(rows) > settings.list_stream_min_rows:
+        return StreamingResponse(_aiter(chunks), media_type="application/json")
+    return Response(b"".join(chunks), media_type="application/json")
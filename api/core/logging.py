@@ -1,20 +1,234 @@
+"""
+Non-blocking, structured logging.
+
+Every logger (uvicorn's included) feeds a QueueHandler; a QueueListener thread
+formats and writes to stdout. Request threads only build the record and
+enqueue it, so a slow stdout pipe (container log drivers, terminals) no longer
+adds to request latency. The queue is bounded (log_queue_size); when the
+writer falls behind, records are dropped and counted instead of blocking.
+
+LOG_FORMAT=json writes one object per line:
+
+    {"ts": "2026-01-01T12:00:00.123Z", "level": "INFO", "logger": "api.main",
+     "msg": "loaded 3 device keys", "request_id": "9f1c2a..."}
+
+with any `extra={...}` fields merged in. LOG_FORMAT=text keeps the old
+"asctime | level | name | message" lines (plus the request id).
+
+Request ids come from RequestIdMiddleware: X-Request-ID from the caller or a
+fresh one, echoed on the response and attached to every record logged while
+serving the request (threadpool calls inherit it through contextvars).
+
+High-volume loggers are sampled: api.ingest batch lines and uvicorn access
+lines for ingest routes keep LOG_INGEST_SAMPLE_RATE of records (warnings and
+errors always pass).
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+
+INGEST_LOGGER = "api.ingest"
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("avops_request_id", default=None)
+
+# attributes every LogRecord has (and uvicorn's ANSI copy of the message); anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "color_message"}
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request id; handler filters run on the calling thread, where the contextvar is set."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps `rate` of INFO-and-below records from high-volume sources."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def _high_volume(self, record: logging.LogRecord) -> bool:
+        if record.name == INGEST_LOGGER:
+            return True
+        if record.name == "uvicorn.access" and isinstance(record.args, tuple) and len(record.args) >= 3:
+            # uvicorn access args: (client, method, path, http_version, status)
+            return str(record.args[2]).startswith("/api/v1/telemetry/ingest")
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno > logging.INFO or not self._high_volume(record):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            out["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        if record.stack_info:
+            out["stack"] = record.stack_info
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} | {request_id}" if request_id else line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full instead of erroring."""
+
+    def __init__(self, q: "queue.Queue") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # like the stdlib version (merge args, render exc_info to text so the record pickles
+        # and the listener needn't touch live frames) but keeps extra fields and request_id
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # blocking put: at shutdown the queue may be full, the writer drains it
+        self.queue.put(self._sentinel)
+
+
+class _Pipeline:
+    handler: Optional[DroppingQueueHandler] = None
+    listener: Optional[_Listener] = None
+
+
+_pipeline = _Pipeline()
+
+
+def _formatter(fmt: str) -> logging.Formatter:
+    if fmt == "json":
+        return JsonFormatter()
+    return _TextFormatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 
 
 def setup_logging(debug: bool) -> None:
     level = logging.DEBUG if debug else logging.INFO
+    stop_logging()
 
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        stream=sys.stdout,
-    )
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(_formatter(settings.log_format))
+    handler = DroppingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter(settings.log_ingest_sample_rate))
+    listener = _Listener(handler.queue, stream, respect_handler_level=False)
+    listener.start()
+    _pipeline.handler, _pipeline.listener = handler, listener
 
-    # Make uvicorn logs consistent
-    logging.getLogger("uvicorn").setLevel(level)
-    logging.getLogger("uvicorn.error").setLevel(level)
-    logging.getLogger("uvicorn.access").setLevel(level)
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    # Make uvicorn logs consistent: same pipeline instead of its own synchronous handlers
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uv = logging.getLogger(name)
+        uv.handlers.clear()
+        uv.propagate = True
+        uv.setLevel(level)
 
     logging.getLogger("python_multipart").setLevel(logging.INFO)
     logging.getLogger("python_multipart.multipart").setLevel(logging.INFO)
+    # per-operation DEBUG chatter (every aiosqlite call, selector choice) swamps everything else
+    logging.getLogger("aiosqlite").setLevel(logging.INFO)
+    logging.getLogger("asyncio").setLevel(logging.INFO)
+
+
+def stop_logging() -> None:
+    """Flush and stop the listener thread (atexit; uvicorn still logs after lifespan shutdown)."""
+    listener, _pipeline.listener = _pipeline.listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def dropped_records() -> int:
+    return _pipeline.handler.dropped if _pipeline.handler is not None else 0
+
+
+atexit.register(stop_logging)
+
+
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                # keep caller ids short and printable; anything else gets a fresh id
+                candidate = value.decode("latin-1")
+                if 0 < len(candidate) <= 64 and candidate.isprintable():
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
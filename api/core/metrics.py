@@ -0,0 +1,333 @@
+"""
+In-process Prometheus metrics, served as text from GET /metrics.
+
+A small registry (counters, gauges, histograms, and gauges computed at scrape
+time) instead of prometheus_client: a handful of metric families, no extra
+dependency, and the hot paths are a dict lookup, a bisect and a lock. Values
+are per process; with several uvicorn workers each scrape sees one worker, so
+scrape workers individually or run one worker per container.
+
+What feeds it:
+  - MetricsMiddleware: per-route latency histogram, request counter, in-flight
+    gauge, and per-request SQL query count / time (a contextvar the engine
+    hooks add to; anyio copies the context into threadpool calls, and the
+    object is shared, so sync routes count too)
+  - instrument_engine(): before/after_cursor_execute timing on every engine
+  - llm_client.call_llm, retrieval.retrieve_kb, the ingest routes
+  - scrape-time gauges: threadpool tokens in use, DB pool checkouts, bcrypt pool
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.traffic_capture import route_template
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in sorted(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class GaugeFunc(_Metric):
+    """Gauge read at scrape time: fn returns {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], fn: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def samples(self) -> Iterable[str]:
+        for values, value in sorted(self.fn().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge_func(self, name: str, help: str, labelnames: Sequence[str], fn) -> GaugeFunc:
+        return self.register(GaugeFunc(name, help, labelnames, fn))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("avops_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("avops_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("avops_http_requests_in_flight", "HTTP requests being served.")
+REQUEST_QUERIES = REGISTRY.histogram(
+    "avops_http_request_db_queries", "SQL statements executed per request.", ("method", "route"), COUNT_BUCKETS
+)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    "avops_http_request_db_seconds", "Time spent in SQL per request.", ("method", "route"), QUERY_BUCKETS
+)
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    "avops_db_query_duration_seconds", "SQL statement latency by statement type.", ("statement",), QUERY_BUCKETS
+)
+LLM_LATENCY = REGISTRY.histogram("avops_llm_request_duration_seconds", "call_llm latency by outcome.", ("outcome",))
+LLM_TOKENS = REGISTRY.counter("avops_llm_tokens_total", "LLM tokens reported by Ollama.", ("kind",))
+LLM_FAILURES = REGISTRY.counter("avops_llm_failures_total", "Copilot LLM failures by reason.", ("reason",))
+KB_LATENCY = REGISTRY.histogram("avops_kb_retrieval_duration_seconds", "retrieve_kb latency.", (), QUERY_BUCKETS)
+KB_HITS = REGISTRY.histogram("avops_kb_retrieval_hits", "KB hits returned per retrieve_kb call.", (), COUNT_BUCKETS)
+INGEST_PENDING = REGISTRY.gauge("avops_ingest_pending_items", "Telemetry items decoded and waiting to be written.")
+INGEST_ITEMS = REGISTRY.counter("avops_ingest_items_total", "Telemetry items written, by result.", ("result",))
+RISK_BATCH_SIZE = REGISTRY.histogram(
+    "avops_risk_batch_size", "Requests scored together per /predict/risk micro-batch.", (), BATCH_BUCKETS
+)
+RISK_BATCH_WAIT = REGISTRY.histogram(
+    "avops_risk_batch_queue_wait_seconds", "Time a /predict/risk request waited for its micro-batch.", (), QUERY_BUCKETS
+)
+RISK_SCORED = REGISTRY.counter(
+    "avops_risk_scored_total", "/predict/risk requests scored, by scorer (model or rules).", ("scorer",)
+)
+ADMISSION_REJECTED = REGISTRY.counter(
+    "avops_admission_rejected_total", "Requests refused by rate limits (429) or load shedding (503).", ("reason",)
+)
+
+
+# ---------- per-request SQL accounting ----------
+
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db: contextvars.ContextVar[Optional[_RequestDB]] = contextvars.ContextVar("avops_request_db", default=None)
+
+_instrumented: Dict[str, Engine] = {}
+
+
+def _statement_kind(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    if word in ("savepoint", "release"):
+        return "savepoint"
+    return word if word in ("select", "insert", "update", "delete", "with", "pragma") else "other"
+
+
+def instrument_engine(name: str, engine: Engine) -> None:
+    """Time every statement on engine (idempotent; pass AsyncEngine.sync_engine for async engines)."""
+    if engine in _instrumented.values():
+        return
+    _instrumented[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("avops_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("avops_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        DB_QUERY_LATENCY.labels(_statement_kind(statement)).observe(elapsed)
+        current = _request_db.get()
+        if current is not None:
+            current.queries += 1
+            current.seconds += elapsed
+
+
+def instrumented_engines() -> Dict[str, Engine]:
+    return dict(_instrumented)
+
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        request_db = _RequestDB()
+        token = _request_db.set(request_db)
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _request_db.reset(token)
+            # unmatched paths share one label so scanners can't blow up cardinality
+            route = route_template(scope) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_QUERIES.labels(method, route).observe(request_db.queries)
+            REQUEST_DB_TIME.labels(method, route).observe(request_db.seconds)
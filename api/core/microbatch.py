@@ -0,0 +1,88 @@
+"""
+Request micro-batching on the event loop.
+
+MicroBatcher.submit(item) parks the caller on a future; items submitted within
+`window_ms` of the first pending one (or until `max_size` are pending) are
+handed to `fn` as one list, and each caller gets its own result back. fn is a
+coroutine function, so a batch can share one awaited read (and one threadpool
+hop for blocking work) instead of one per request.
+
+window_ms <= 0 disables batching: every submit calls fn with a single item.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from api.core.metrics import Histogram
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(
+        self,
+        fn: Callable[[Sequence[T]], Awaitable[List[R]]],
+        window_ms: float,
+        max_size: int,
+        batch_size: Optional[Histogram] = None,
+        queue_wait: Optional[Histogram] = None,
+    ) -> None:
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self.batch_size = batch_size
+        self.queue_wait = queue_wait
+        # (item, future, submitted_at); only ever touched from the event loop thread
+        self._pending: List[Tuple[T, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # batches being scored; the loop only keeps weak references to tasks
+        self._scoring: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        if self.window <= 0:
+            return (await self._run([(item, None, time.perf_counter())]))[0]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # callers that gave up (client disconnect) don't need scoring
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._score(batch))
+        self._scoring.add(task)
+        task.add_done_callback(self._scoring.discard)
+
+    async def _score(self, batch: List[Tuple[T, asyncio.Future, float]]) -> None:
+        try:
+            results = await self._run(batch)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self, batch: List[Tuple[T, Optional[asyncio.Future], float]]) -> List[R]:
+        started = time.perf_counter()
+        if self.batch_size is not None:
+            self.batch_size.observe(len(batch))
+        if self.queue_wait is not None:
+            for _, _, submitted in batch:
+                self.queue_wait.observe(started - submitted)
+        return await self.fn([item for item, _, _ in batch])
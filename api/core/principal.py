@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from api.core.config import settings
+from api.db.models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The authenticated caller, as far as route handlers need to know.
+    Deliberately detached from the ORM so it can be cached across requests.
+    """
+
+    id: int
+    email: str
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of verified bearer token -> Principal.
+
+    - entries expire at min(now + ttl, token exp)
+    - LRU eviction once max_entries is reached
+    - invalidate_user() drops every token of a user (deletion / password change)
+      and bumps a generation, so a miss that started before it isn't cached
+
+    The cache is per process; other workers converge within the TTL.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        # bumped on any invalidation so an in-flight miss can't re-insert a stale principal;
+        # one counter rather than one per user keeps memory flat, at the cost of a few
+        # concurrent misses for other users going uncached when someone changes a password
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= now:
+                self._drop(token, principal.id)
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, token: str, principal: Principal, exp: Optional[int], generation: int) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+
+        ttl = float(self.ttl_seconds)
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            if self._generation != generation:
+                return
+
+            self._entries[token] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+
+            while len(self._entries) > self.max_entries:
+                old_token, (old_principal, _) = self._entries.popitem(last=False)
+                self._forget_token(old_token, old_principal.id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for token in self._tokens_by_user.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, token: str, user_id: int) -> None:
+        self._entries.pop(token, None)
+        self._forget_token(token, user_id)
+
+    def _forget_token(self, token: str, user_id: int) -> None:
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+    max_entries=settings.auth_cache_max_entries,
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    principal_cache.invalidate_user(user_id)
+
+
+# Invalidate on ORM-level deletes and password changes, once they are committed: evicting
+# at flush would let a concurrent miss re-cache the old row before the commit, and would
+# evict for changes that end up rolled back. Bulk query().delete()/update() bypasses mapper
+# events; callers doing that must call invalidate_user() themselves after committing.
+_PENDING_KEY = "principal_invalidations"
+
+
+def _defer_invalidation(target: User) -> None:
+    session = object_session(target)
+    if session is None:
+        invalidate_user(target.id)
+        return
+    session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    _defer_invalidation(target)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    if inspect(target).attrs.hashed_password.history.has_changes():
+        _defer_invalidation(target)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous_transaction) -> None:
+    # a savepoint rollback keeps them: the outer transaction may still commit, and an
+    # extra eviction is harmless where a missed one is not
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
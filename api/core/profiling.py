@@ -0,0 +1,358 @@
+"""
+On-demand request profiling: where did this request spend its time?
+
+A request is profiled when an admin asks for it (X-Profile header or ?profile=
+query parameter, bearer token of a user in ADMIN_EMAILS) or when it falls in
+PROFILING_SAMPLE_RATE. The value picks what to capture, comma-separated:
+
+    cpu     cProfile of the event loop thread (async handlers, middleware,
+            serialization); sync handlers run in the threadpool and show up as
+            the await on it, but their SQL and LLM calls are still timed
+    sql     every statement with parameters, start offset and duration, plus
+            repeated statement shapes flagged as probable N+1s
+    memory  tracemalloc snapshot diff (top allocation sites); slow, opt-in only
+
+"1" / "true" means cpu,sql. Each profile also breaks wall time down into SQL,
+LLM and the rest. Only one request is profiled at a time; cProfile and
+tracemalloc are process-wide, so concurrent requests on the loop show up too.
+
+Profiles are kept in a ring of the last PROFILING_RING_SIZE (and written to
+PROFILING_DIR as JSON + a .prof file for snakeviz/pstats when set), listed at
+GET /api/v1/admin/profiles. The response carries X-Profile-Id.
+"""
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+from api.core.traffic_capture import route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+DEFAULT_CAPTURE = frozenset({"cpu", "sql"})
+CAPTURES = frozenset({"cpu", "sql", "memory"})
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def parse_capture(value: Optional[str]) -> Optional[Set[str]]:
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value in ("0", "false", "off", "no"):
+        return None
+    if value in ("1", "true", "on", "yes", "all"):
+        return set(DEFAULT_CAPTURE) if value != "all" else set(CAPTURES)
+    wanted = {part.strip() for part in value.split(",")} & CAPTURES
+    return wanted or None
+
+
+def query_shape(statement: str) -> str:
+    """Statement with IN-lists collapsed, so 'IN (?, ?)' and 'IN (?, ?, ?)' count as one shape."""
+    return _IN_LIST.sub("(?...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _short(value: Any, limit: int = 200) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class RequestProfile:
+    def __init__(self, capture: Set[str], method: str, path: str, query: str, reason: str) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.capture = capture
+        self.method = method
+        self.path = path
+        self.query = query
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self.t0 = time.perf_counter()
+        self.queries: List[dict] = []
+        self.queries_dropped = 0
+        self.sql_seconds = 0.0
+        self.llm: List[dict] = []
+        self._lock = threading.Lock()
+
+    # called from engine hooks and llm_client, possibly on threadpool threads
+
+    def add_query(self, statement: str, parameters: Any, executemany: bool, start: float, elapsed: float) -> None:
+        with self._lock:
+            self.sql_seconds += elapsed
+            if len(self.queries) >= settings.profiling_max_queries:
+                self.queries_dropped += 1
+                return
+            if executemany and isinstance(parameters, (list, tuple)):
+                params = f"{len(parameters)} rows, first {_short(parameters[0] if parameters else None)}"
+            else:
+                params = _short(parameters)
+            self.queries.append({
+                "offset_ms": round((start - self.t0) * 1000, 3),
+                "duration_ms": round(elapsed * 1000, 3),
+                "statement": statement,
+                "parameters": params,
+            })
+
+    def add_llm_call(self, start: float, elapsed: float, outcome: str) -> None:
+        with self._lock:
+            self.llm.append({
+                "offset_ms": round((start - self.t0) * 1000, 3),
+                "duration_ms": round(elapsed * 1000, 3),
+                "outcome": outcome,
+            })
+
+    def n_plus_one(self) -> List[dict]:
+        shapes: "OrderedDict[str, List[float]]" = OrderedDict()
+        for q in self.queries:
+            shapes.setdefault(query_shape(q["statement"]), []).append(q["duration_ms"])
+        flagged = [
+            {"statement": shape, "count": len(times), "total_ms": round(sum(times), 3)}
+            for shape, times in shapes.items()
+            if len(times) >= settings.profiling_n_plus_one_threshold
+        ]
+        return sorted(flagged, key=lambda f: -f["count"])
+
+
+_active: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("avops_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _active.get()
+
+
+class ProfileStore:
+    """Last N profiles in memory (newest last); optionally mirrored to a directory."""
+
+    def __init__(self, size: int, directory: str = "") -> None:
+        self.size = size
+        self.directory = Path(directory) if directory else None
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict, stats: Optional[pstats.Stats] = None) -> None:
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                (self.directory / f"{profile['id']}.json").write_text(json.dumps(profile, indent=1, default=str))
+                if stats is not None:
+                    stats.dump_stats(str(self.directory / f"{profile['id']}.prof"))
+            except OSError:
+                logger.exception("could not write profile %s", profile["id"])
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            profile = self._profiles.get(profile_id)
+        if profile is None and self.directory is not None:
+            path = self.directory / f"{profile_id}.json"
+            if re.fullmatch(r"[0-9a-f]{16}", profile_id) and path.exists():
+                return json.loads(path.read_text())
+        return profile
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {k: p[k] for k in ("id", "started_at", "method", "path", "route", "status", "reason", "summary")}
+            for p in reversed(profiles)
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(settings.profiling_ring_size, settings.profiling_dir)
+
+
+# ---------- SQL hooks ----------
+
+_hooked: List[Engine] = []
+
+
+def install_query_hooks(engines: Dict[str, Engine]) -> None:
+    """Record statements into the active profile; a no-op contextvar read otherwise."""
+    for engine in engines.values():
+        if any(engine is e for e in _hooked):
+            continue
+        _hooked.append(engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if _active.get() is not None:
+                conn.info.setdefault("avops_profile_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            profile = _active.get()
+            starts = conn.info.get("avops_profile_start")
+            if profile is None or not starts:
+                return
+            start = starts.pop()
+            profile.add_query(statement, parameters, executemany, start, time.perf_counter() - start)
+
+
+# ---------- middleware ----------
+
+def _cpu_top(stats: pstats.Stats, limit: int) -> List[dict]:
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append({
+            "function": f"{filename}:{line}({func})",
+            "calls": nc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda r: -r["cumtime_ms"])
+    return rows[:limit]
+
+
+def _memory_top(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> List[dict]:
+    return [
+        {"site": str(stat.traceback), "size_diff_kib": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+        for stat in after.compare_to(before, "lineno")[:limit]
+    ]
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None) -> None:
+        self.app = app
+        self.store = store or profile_store
+        self.sample_rate = settings.profiling_sample_rate
+        self._busy = threading.Lock()
+
+    async def _requested(self, scope: Scope) -> Optional[Set[str]]:
+        headers = Headers(scope=scope)
+        capture = parse_capture(headers.get(PROFILE_HEADER))
+        if capture is None and b"profile=" in scope.get("query_string", b""):
+            capture = parse_capture(QueryParams(scope["query_string"]).get("profile"))
+        if capture is None:
+            return None
+        # flagged requests are honoured for admins only; anyone else is served normally
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        from api.core.auth_deps import get_current_user, is_admin
+
+        try:
+            principal = await get_current_user(token)
+        except Exception:
+            return None
+        return capture if is_admin(principal) else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        capture, reason = None, ""
+        flagged = b"profile=" in scope.get("query_string", b"") or any(k == b"x-profile" for k, _ in scope["headers"])
+        if flagged:
+            capture, reason = await self._requested(scope), "requested"
+        if capture is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            capture, reason = set(DEFAULT_CAPTURE), "sampled"
+        if capture is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, capture, reason)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send, capture: Set[str], reason: str) -> None:
+        profile = RequestProfile(
+            capture, scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"), reason
+        )
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        profiler = cProfile.Profile() if "cpu" in capture else None
+        started_tracing = False
+        before = None
+        if "memory" in capture:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(settings.profiling_tracemalloc_frames)
+                started_tracing = True
+            before = tracemalloc.take_snapshot()
+
+        token = _active.set(profile)
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            _active.reset(token)
+            elapsed = time.perf_counter() - profile.t0
+            after = tracemalloc.take_snapshot() if before is not None else None
+            if started_tracing:
+                tracemalloc.stop()
+            self._store(scope, profile, status, elapsed, profiler, before, after)
+
+    def _store(self, scope, profile, status, elapsed, profiler, before, after) -> None:
+        llm_ms = sum(c["duration_ms"] for c in profile.llm)
+        sql_ms = profile.sql_seconds * 1000
+        total_ms = elapsed * 1000
+        n_plus_one = profile.n_plus_one()
+        result: Dict[str, Any] = {
+            "id": profile.id,
+            "started_at": profile.started_at.isoformat(),
+            "method": profile.method,
+            "path": profile.path,
+            "query": profile.query,
+            "route": route_template(scope),
+            "status": status,
+            "reason": profile.reason,
+            "capture": sorted(profile.capture),
+            "summary": {
+                "total_ms": round(total_ms, 3),
+                "sql_ms": round(sql_ms, 3),
+                "llm_ms": round(llm_ms, 3),
+                # SQL and LLM calls on other threads may overlap, so this can undercount
+                "other_ms": round(max(0.0, total_ms - sql_ms - llm_ms), 3),
+                "queries": len(profile.queries) + profile.queries_dropped,
+                "n_plus_one": len(n_plus_one),
+            },
+            "llm_calls": profile.llm,
+        }
+        if "sql" in profile.capture:
+            result["queries"] = profile.queries
+            result["queries_dropped"] = profile.queries_dropped
+            result["n_plus_one"] = n_plus_one
+        stats = None
+        if profiler is not None:
+            stats = pstats.Stats(profiler, stream=io.StringIO())
+            result["cpu"] = _cpu_top(stats, settings.profiling_top_functions)
+        if after is not None:
+            result["memory"] = _memory_top(before, after, settings.profiling_top_functions)
+        self.store.add(result, stats)
@@ -1,24 +1,196 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from fastapi.concurrency import run_in_threadpool
 from jose import jwt
 from passlib.context import CryptContext
 
 from api.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+)
 
 
-def hash_password(password: str) -> str:
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the password hashing pool is saturated; callers should answer 503."""
+
+
+def _bcrypt_cost(hashed_password: str) -> Optional[int]:
+    # "$2b$12$<salt+hash>" -> 12
+    parts = hashed_password.split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+# --- worker functions (run inside the pool processes, must stay top-level) ---
+
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _context_for(rounds: int) -> CryptContext:
+    # the cost is passed in from the parent so workers never disagree with it
+    ctx = _contexts.get(rounds)
+    if ctx is None:
+        ctx = _contexts[rounds] = pwd_context.copy(bcrypt__rounds=rounds)
+    return ctx
+
+
+def _hash_worker(password: str, rounds: int) -> str:
+    return _context_for(rounds).hash(password)
+
+
+def _verify_worker(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    ctx = _context_for(rounds)
+    if not ctx.verify(password, hashed_password):
+        return False, None
+    if _bcrypt_cost(hashed_password) != rounds:
+        return True, ctx.hash(password)
+    return True, None
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated, bounded process pool so login/register bursts
+    burn their own CPU instead of FastAPI's shared threadpool.
+
+    Routes use run_async(): the request awaits the pool job on the event loop,
+    so a queued or running hash holds no threadpool thread. run() blocks the
+    calling thread and is meant for scripts.
+
+    At most `workers + max_pending` jobs are admitted; anything beyond that
+    fails fast with PasswordHasherBusy. workers=0 runs inline (in the
+    threadpool for run_async), for scripts and tests.
+    """
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _admit(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._admit()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._release()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._admit()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._release()
+
+    def warm_up(self) -> None:
+        """
+        Start every pool process and load bcrypt in it. Spawned workers import
+        the app's modules on their first job, which otherwise lands on the first
+        logins after a deploy.
+        """
+        if self.workers <= 0:
+            return
+        executor = self._get_executor()
+        futures = [executor.submit(_hash_worker, "warm-up", 4) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = self._in_flight
+            rejected = self._rejected
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - max(1, self.workers)),
+            "rejected": rejected,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
+def _check_length(password: str) -> None:
     # bcrypt limit is 72 bytes; enforce at server-side too (bytes, not chars)
     if len(password.encode("utf-8")) > 72:
         raise ValueError("Password too long for bcrypt (max 72 bytes).")
-    return pwd_context.hash(password)
 
 
+def hash_password(password: str) -> str:
+    _check_length(password)
+    return password_hasher.run(_hash_worker, password, settings.bcrypt_rounds)
+
+
+async def hash_password_async(password: str) -> str:
+    _check_length(password)
+    return await password_hasher.run_async(_hash_worker, password, settings.bcrypt_rounds)
+
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
+    ok, _ = verify_and_update_password(password, hashed_password)
+    return ok
+
+
+def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (ok, new_hash). new_hash is set when the stored hash was made with a
+    different bcrypt cost than settings.bcrypt_rounds, so the caller can persist it.
+    """
+    return password_hasher.run(_verify_worker, password, hashed_password, settings.bcrypt_rounds)
+
+
+async def verify_and_update_password_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.run_async(_verify_worker, password, hashed_password, settings.bcrypt_rounds)
 
 
 def create_access_token(subject: str) -> str:
@@ -0,0 +1,281 @@
+"""
+Opt-in capture of sampled API traffic to JSONL, for replay (scripts.replay_traffic).
+
+TrafficCaptureMiddleware records method, path, query, selected headers, the
+request body, status, response size and timing for a sample of requests
+(traffic_capture_sample_rate). The request path only keeps the body chunks the
+app reads anyway and enqueues them with the scope; building the record
+(headers, redaction), JSON encoding and file writes happen on a background
+writer thread. If the writer falls behind, records are dropped
+(and counted) instead of slowing requests down.
+
+Secrets are never written: Authorization, cookies and device signatures are
+replaced with "[redacted]", and password / token fields in JSON or form bodies
+are redacted the same way. A body that doesn't parse (cut at
+traffic_capture_max_body_bytes, or malformed) gets those fields' values masked
+by pattern instead of being kept as-is. Replays substitute a token of their own.
+
+One line per request:
+
+    {"ts": "2026-01-01T12:00:00.123456+00:00", "method": "POST",
+     "path": "/api/v1/telemetry/ingest", "route": "/api/v1/telemetry/ingest",
+     "query": "", "headers": {"content-type": "application/json"},
+     "body": "{...}", "status": 200, "duration_ms": 3.2, "response_bytes": 48}
+
+Bodies that are not UTF-8 (msgpack, frames) are stored base64 in "body_b64";
+bodies over traffic_capture_max_body_bytes are cut and marked "body_truncated".
+"""
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "[redacted]"
+
+# request headers kept for replay; everything else is dropped
+_KEPT_HEADERS = (
+    "content-type",
+    "accept",
+    "accept-encoding",
+    "if-none-match",
+    "authorization",
+    "x-device-key-id",
+    "x-device-timestamp",
+    "x-device-signature",
+)
+_REDACTED_HEADERS = {"authorization", "cookie", "x-device-signature"}
+_REDACTED_FIELDS = {"password", "current_password", "new_password", "client_secret", "access_token", "refresh_token"}
+_FIELD_NAMES = "|".join(sorted(_REDACTED_FIELDS))
+# "password": "..." in JSON (the string may be cut off), or password=... in a form body
+_JSON_FIELD_VALUE = re.compile(r'("(?:%s)"\s*:\s*)(?:"(?:[^"\\]|\\.)*"?|[^,}\]\s]+)' % _FIELD_NAMES)
+_FORM_FIELD_VALUE = re.compile(r"((?:^|&)(?:%s)=)[^&]*" % _FIELD_NAMES)
+
+
+def _redact_json(value):
+    if isinstance(value, dict):
+        return {k: REDACTED if k in _REDACTED_FIELDS else _redact_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(v) for v in value]
+    return value
+
+
+def _mask_fields(body: str) -> str:
+    body = _JSON_FIELD_VALUE.sub(lambda m: f'{m.group(1)}"{REDACTED}"', body)
+    return _FORM_FIELD_VALUE.sub(lambda m: m.group(1) + REDACTED, body)
+
+
+def redact_body(content_type: str, body: str) -> str:
+    """
+    Body text with password/token fields replaced. Bodies that don't parse as their
+    content type (e.g. truncated) have the values masked by pattern instead.
+    """
+    if not any(f in body for f in _REDACTED_FIELDS):
+        return body
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        pairs = parse_qsl(body, keep_blank_values=True)
+        if any(k in _REDACTED_FIELDS for k, _ in pairs):
+            return urlencode([(k, REDACTED if k in _REDACTED_FIELDS else v) for k, v in pairs])
+        return body
+    try:
+        return json.dumps(_redact_json(json.loads(body)), separators=(",", ":"))
+    except ValueError:
+        return _mask_fields(body)
+
+
+def _decode_text(body: bytes, truncated: bool) -> Optional[str]:
+    # the cut may split a multi-byte character: drop its bytes rather than fall back to base64, unredacted
+    for cut in range(4 if truncated else 1):
+        try:
+            return body[: len(body) - cut].decode("utf-8")
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+_PARAM = re.compile(r"{(\w+)(?::\w+)?}")
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """Full path template of the matched route, e.g. /api/v1/telemetry/latest/{device_id}."""
+    route_path = getattr(scope.get("route"), "path", None)
+    if route_path is None:
+        return None
+    # routes of included routers may carry only their own part of the path; recover the prefix
+    params = scope.get("path_params", {})
+    rendered = _PARAM.sub(lambda m: str(params.get(m.group(1), m.group(0))), route_path)
+    path = scope["path"]
+    if path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + route_path
+    return route_path
+
+
+@dataclass
+class CapturedRequest:
+    """What the request path hands to the writer; turned into a JSONL record off the event loop."""
+
+    ts: float
+    scope: Scope
+    body: bytes
+    truncated: bool
+    status: int
+    duration_ms: float
+    response_bytes: int
+
+    def to_record(self) -> dict:
+        scope = self.scope
+        headers = Headers(scope=scope)
+        kept = {}
+        for name in _KEPT_HEADERS:
+            value = headers.get(name)
+            if value is not None:
+                kept[name] = REDACTED if name in _REDACTED_HEADERS else value
+        record = {
+            "ts": datetime.fromtimestamp(self.ts, timezone.utc).isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "headers": kept,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 3),
+            "response_bytes": self.response_bytes,
+        }
+        if self.body:
+            text = _decode_text(self.body, self.truncated)
+            if text is None:
+                record["body_b64"] = base64.b64encode(self.body).decode("ascii")
+            else:
+                record["body"] = redact_body(kept.get("content-type", ""), text)
+        if self.truncated:
+            record["body_truncated"] = True
+        return record
+
+
+class TrafficRecorder:
+    """Bounded queue + writer thread appending records to a JSONL file."""
+
+    def __init__(self, path: str, queue_size: int = 10_000, flush_seconds: float = 1.0) -> None:
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[CapturedRequest]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: CapturedRequest) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    captured = self._queue.get(timeout=self.flush_seconds)
+                except queue.Empty:
+                    f.flush()
+                    continue
+                if captured is None:
+                    break
+                try:
+                    f.write(json.dumps(captured.to_record(), separators=(",", ":")) + "\n")
+                    self.written += 1
+                except (TypeError, ValueError):
+                    logger.exception("could not encode captured request")
+                if time.monotonic() - last_flush >= self.flush_seconds:
+                    f.flush()
+                    last_flush = time.monotonic()
+        if self.dropped:
+            logger.warning("traffic capture dropped %d records (writer queue full)", self.dropped)
+
+    def close(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+
+traffic_recorder = TrafficRecorder(settings.traffic_capture_path, settings.traffic_capture_queue_size)
+
+
+class TrafficCaptureMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        recorder: Optional[TrafficRecorder] = None,
+        sample_rate: Optional[float] = None,
+        max_body_bytes: Optional[int] = None,
+    ) -> None:
+        self.app = app
+        self.recorder = recorder or traffic_recorder
+        self.sample_rate = settings.traffic_capture_sample_rate if sample_rate is None else sample_rate
+        self.max_body_bytes = settings.traffic_capture_max_body_bytes if max_body_bytes is None else max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        ts = time.time()
+        chunks: List[bytes] = []
+        size = 0
+        truncated = False
+        status = 0
+        response_bytes = 0
+
+        async def capture_receive() -> Message:
+            nonlocal size, truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                if size < self.max_body_bytes:
+                    chunks.append(body[: self.max_body_bytes - size])
+                truncated = truncated or size + len(body) > self.max_body_bytes
+                size += len(body)
+            return message
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            self.recorder.submit(CapturedRequest(
+                ts, scope, b"".join(chunks), truncated, status, (time.perf_counter() - started) * 1000, response_bytes
+            ))
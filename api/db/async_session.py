@@ -0,0 +1,44 @@
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from api.core.config import settings
+from api.db.session import install_pragmas, is_file_sqlite
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(database_url: str) -> str:
+    """sqlite:///./avops.db -> sqlite+aiosqlite:///./avops.db (explicit drivers are kept)."""
+    scheme, sep, rest = database_url.partition("://")
+    if "+" in scheme:
+        return database_url
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def create_async_read_engine(database_url: str, profile: str) -> AsyncEngine:
+    """
+    Async twin of session.create_engines()' reader: same profiles, same pragmas.
+    There is no async writer: every write to a file goes through its one sync
+    writer engine, so ingest and the sync routes never contend for the file lock.
+    """
+    url = to_async_url(database_url)
+
+    if profile != "production" or not is_file_sqlite(database_url):
+        return create_async_engine(url, future=True)
+
+    read_engine = create_async_engine(
+        url,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+        future=True,
+    )
+    install_pragmas(read_engine.sync_engine, query_only=True)
+    return read_engine
+
+
+async_read_engine = create_async_read_engine(settings.database_url, settings.sqlite_profile)
+
+# expire_on_commit=False: rows are read after commit/close without implicit (sync) refreshes
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
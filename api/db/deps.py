@@ -1,7 +1,9 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from api.db.session import SessionLocal
+from api.db.async_session import AsyncReadSessionLocal
+from api.db.session import ReadSessionLocal, SessionLocal
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -10,3 +12,17 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Session on the read-only engine; use for GET routes that never write."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncReadSessionLocal() as db:
+        yield db
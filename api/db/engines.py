@@ -0,0 +1,31 @@
+from typing import Dict
+
+from sqlalchemy.engine import Engine
+
+
+def database_engines() -> Dict[str, Engine]:
+    """
+    Every sync engine the app talks through, by name: the main database and each
+    telemetry shard, with async readers as their sync_engine (where cursor
+    events fire). Engines shared between roles (dev profile) appear once.
+    """
+    from api.db.async_session import async_read_engine
+    from api.db.session import engine, read_engine
+    from api.services.telemetry_shards import telemetry_shards
+
+    named = [
+        ("main", engine),
+        ("main_read", read_engine),
+        ("main_async_read", async_read_engine.sync_engine),
+    ]
+    for shard in telemetry_shards.shards:
+        named += [
+            (f"shard{shard.index}", shard.engine),
+            (f"shard{shard.index}_read", shard.read_engine),
+            (f"shard{shard.index}_async_read", shard.async_read_engine.sync_engine),
+        ]
+    out: Dict[str, Engine] = {}
+    for name, e in named:
+        if all(e is not seen for seen in out.values()):
+            out[name] = e
+    return out
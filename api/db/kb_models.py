@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime
 from api.db.base import Base
 
 class KBDoc(Base):
@@ -10,3 +10,15 @@ class KBDoc(Base):
     source = Column(Text, nullable=True)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class KBSnippet(Base):
+    """One retrieval hit, shared by every copilot run that cited it (see services/kb_snippets)."""
+    __tablename__ = "kb_snippets"
+
+    content_hash = Column(String(32), primary_key=True)
+    doc_id = Column(Integer, nullable=True)
+    title = Column(Text, nullable=True)
+    source = Column(Text, nullable=True)
+    snippet = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, Integer, Text
+from sqlalchemy import String, DateTime, Index, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from api.db.base import Base
@@ -19,8 +19,19 @@ class TelemetryEvent(Base):
 
     error_code: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
+    # device-supplied message id / sequence number for idempotent retries
+    message_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("ux_telemetry_events_device_message", "device_id", "message_id", unique=True),
+        # partition boundaries for archiving and since/until range reads
+        Index("ix_telemetry_events_created_at", "created_at"),
+        # never reuse the id of a deleted (archived) row: read_event looks in the live shards first
+        {"sqlite_autoincrement": True},
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -36,7 +47,8 @@ class CopilotRun(Base):
     __tablename__ = "copilot_runs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    device_id = Column(String(64), nullable=True)  # copy of input_context.device_id for filtering
 
     task = Column(Text, nullable=False)
     input_context = Column(JSON, nullable=False, default=dict)
@@ -45,5 +57,26 @@ class CopilotRun(Base):
     status = Column(String(32), nullable=False, default="success")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # ✅ change here
 
+    # run history pages walk one user's runs newest-first (keyset on id)
+    __table_args__ = (
+        Index("ix_copilot_runs_user_id_id", "user_id", "id"),
+        Index("ix_copilot_runs_user_id_device_id_id", "user_id", "device_id", "id"),
+    )
+
 
+class DeviceKey(Base):
+    __tablename__ = "device_keys"
 
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    key_id: Mapped[str] = mapped_column(String(32), unique=True, index=True, nullable=False)
+    device_id: Mapped[str] = mapped_column(String(64), index=True, nullable=False)
+    secret: Mapped[str] = mapped_column(String(128), nullable=False)
+
+    valid_from: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # drives the incremental in-memory refresh
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True, nullable=False
+    )
@@ -1,11 +1,88 @@
-from sqlalchemy import create_engine
+from typing import Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 from api.core.config import settings
 
-# Needed for SQLite on Windows + multi-threaded FastAPI
-connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
 
-engine = create_engine(settings.database_url, connect_args=connect_args, future=True)
+def is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith("sqlite:")
+
+
+def sqlite_pragmas(query_only: bool = False) -> Tuple[str, ...]:
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        # negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    )
+    if query_only:
+        pragmas += ("PRAGMA query_only=ON",)
+    return pragmas
+
+
+def install_pragmas(engine: Engine, query_only: bool) -> None:
+    pragmas = sqlite_pragmas(query_only)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def create_engines(database_url: str, profile: str) -> Tuple[Engine, Engine]:
+    """
+    Returns (write_engine, read_engine).
+
+    profile "dev": one default engine serves both (the original behaviour).
+    profile "production" (file-backed SQLite only):
+      - WAL + tuned pragmas on every connection
+      - a single-connection writer engine, so ingest and copilot persistence
+        queue in-process instead of spinning on SQLITE_BUSY
+      - a pooled query_only reader engine for GET routes; under WAL readers
+        don't block on the writer's lock (they still share the CPU and GIL
+        with it, so a saturated process queues them like any other thread)
+    """
+    # Needed for SQLite on Windows + multi-threaded FastAPI
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+
+    if profile != "production" or not is_file_sqlite(database_url):
+        engine = create_engine(database_url, connect_args=connect_args, future=True)
+        return engine, engine
+
+    write_engine = create_engine(
+        database_url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.sqlite_busy_timeout_ms / 1000,
+        future=True,
+    )
+    install_pragmas(write_engine, query_only=False)
+
+    read_engine = create_engine(
+        database_url,
+        connect_args=connect_args,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+        future=True,
+    )
+    install_pragmas(read_engine, query_only=True)
+
+    return write_engine, read_engine
+
+
+engine, read_engine = create_engines(settings.database_url, settings.sqlite_profile)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, future=True)
@@ -1,10 +1,104 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.core.compression import CompressionMiddleware
 from api.core.config import settings
-from api.core.logging import setup_logging
+from api.core.logging import RequestIdMiddleware, setup_logging
+from api.core.metrics import MetricsMiddleware
+from api.core.profiling import ProfilingMiddleware, install_query_hooks
+from api.core.security import password_hasher
+from api.core.traffic_capture import TrafficCaptureMiddleware, traffic_recorder
 from api.routers.health import router as health_router
+from api.db.engines import database_engines
+from api.routers.metrics import instrument_engines, router as metrics_router
 from api.routers.v1 import router as v1_router
+from api.services.device_keys import device_keys
+from api.services.readiness import readiness
+from api.services.risk_model import risk_models
+from api.services.telemetry_archive import apply_retention, telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+
+logger = logging.getLogger(__name__)
+
+
+async def _refresh_device_keys_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.device_key_refresh_seconds)
+        try:
+            await run_in_threadpool(device_keys.refresh)
+        except Exception:
+            logger.exception("device key refresh failed")
+
+
+async def _reload_risk_model_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.risk_model_reload_seconds)
+        try:
+            await run_in_threadpool(risk_models.refresh)
+        except Exception:
+            logger.exception("risk model reload failed")
+
+
+async def _apply_retention_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.telemetry_archive_interval_seconds)
+        try:
+            result = await run_in_threadpool(apply_retention, telemetry_shards, telemetry_archive)
+            if result["archived"] or result["dropped"]:
+                logger.info("telemetry retention: %s", result)
+        except Exception:
+            logger.exception("telemetry retention failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # shard files (TELEMETRY_SHARDS > 1) are created on first boot; the main DB is Alembic's
+    await run_in_threadpool(telemetry_shards.ensure_schema)
+    await run_in_threadpool(telemetry_shards.check_main_database)
+    await run_in_threadpool(telemetry_shards.ensure_ids_above, telemetry_archive.max_id)
+    try:
+        loaded = await run_in_threadpool(device_keys.refresh)
+        logger.info("loaded %d device keys", loaded)
+    except Exception:
+        logger.exception("could not load device keys (is the device_keys migration applied?)")
+    refresher = asyncio.create_task(_refresh_device_keys_forever())
+    try:
+        version = await run_in_threadpool(risk_models.refresh)
+        logger.info("risk scoring: %s", f"model {version}" if version else "threshold rules")
+    except Exception:
+        logger.exception("could not load the risk model, scoring with threshold rules")
+    model_reloader = None
+    if settings.risk_model_reload_seconds > 0:
+        model_reloader = asyncio.create_task(_reload_risk_model_forever())
+    # in-process archiving suits single-worker deployments; otherwise cron scripts.archive_telemetry
+    retention = None
+    if settings.telemetry_archive_interval_seconds > 0:
+        retention = asyncio.create_task(_apply_retention_forever())
+    # in the background: startup must not wait minutes for the model; /ready reports progress
+    warmup = None
+    if settings.warmup_enabled:
+        warmup = asyncio.create_task(readiness.warm_up())
+    else:
+        readiness.skip_warm_up()
+
+    yield
+
+    if warmup is not None:
+        warmup.cancel()
+
+    refresher.cancel()
+    if model_reloader is not None:
+        model_reloader.cancel()
+    if retention is not None:
+        retention.cancel()
+    password_hasher.shutdown()
+    traffic_recorder.close()
+    await telemetry_shards.dispose()
 
 
 def create_app() -> FastAPI:
@@ -15,6 +109,7 @@ def create_app() -> FastAPI:
         description="Internal AI tooling for AV telemetry, predictive maintenance, and diagnostics.",
         version="0.1.0",
         debug=settings.debug,
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -29,8 +124,21 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    if settings.profiling_enabled:
+        install_query_hooks(database_engines())
+        app.add_middleware(ProfilingMiddleware)
+    if settings.metrics_enabled:
+        instrument_engines()
+        app.add_middleware(MetricsMiddleware)
+    if settings.traffic_capture_enabled:
+        # outermost, so captured timings include compression
+        app.add_middleware(TrafficCaptureMiddleware)
 
     app.include_router(health_router)
+    if settings.metrics_enabled:
+        app.include_router(metrics_router)
     app.include_router(v1_router)
 
     return app
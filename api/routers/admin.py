@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from api.core.auth_deps import get_admin_user
+from api.core.principal import Principal
+from api.core.profiling import profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/profiles")
+def list_profiles(current_user: Principal = Depends(get_admin_user)):
+    """Recent request profiles, newest first (summary only)."""
+    return {"items": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, current_user: Principal = Depends(get_admin_user)):
+    """Full profile: CPU top functions, SQL timeline, N+1 candidates, LLM calls, memory diff."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.delete("/profiles", status_code=204)
+def clear_profiles(current_user: Principal = Depends(get_admin_user)):
+    profile_store.clear()
@@ -1,45 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
-from api.core.security import create_access_token, hash_password, verify_password
-from api.db.deps import get_db
+from api.core.admission import admit_login, shed_if_db_overloaded
+from api.core.security import (
+    PasswordHasherBusy,
+    create_access_token,
+    hash_password_async,
+    verify_and_update_password_async,
+)
+from api.db.deps import get_db, get_read_db
+from api.db.session import SessionLocal
 from api.db.models import User
 from api.schemas.auth import RegisterRequest, TokenResponse, UserOut
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+logger = logging.getLogger(__name__)
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 
-@router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: RegisterRequest, db: Session = Depends(get_db)):
-    pw_bytes = payload.password.encode("utf-8")
-    print("REGISTER password bytes length =", len(pw_bytes), "repr =", repr(payload.password))
+def _email_taken(db: Session, email: str) -> bool:
+    taken = db.query(User.id).filter(User.email == email).first() is not None
+    # end the read transaction so the writer connection isn't held while bcrypt runs
+    db.rollback()
+    return taken
 
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+
+def _create_user(db: Session, email: str, hashed: str) -> UserOut:
+    user = User(email=email, hashed_password=hashed)
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Email already registered")
+    db.refresh(user)
+    return UserOut(id=user.id, email=user.email)
+
+
+def _credentials(db: Session, email: str):
+    user = db.query(User.id, User.hashed_password).filter(User.email == email).first()
+    # hand the read connection back before the (slow) bcrypt check
+    db.close()
+    return user
+
+
+def _store_rehash(user_id: int, new_hash: str) -> None:
+    with SessionLocal() as wdb:
+        row = wdb.get(User, user_id)
+        if row is not None:
+            row.hashed_password = new_hash
+            wdb.commit()
+
+
+# async so a request waiting on the bcrypt pool holds no threadpool thread; DB work still runs there
+@router.post("/register", response_model=UserOut, status_code=201, dependencies=[Depends(shed_if_db_overloaded)])
+async def register(payload: RegisterRequest, db: Session = Depends(get_db)):
+    # length only: bcrypt truncates past 72 bytes, the password itself is never logged
+    logger.debug("register", extra={"password_bytes": len(payload.password.encode("utf-8"))})
+
+    if await run_in_threadpool(_email_taken, db, payload.email):
         raise HTTPException(status_code=409, detail="Email already registered")
 
     try:
-        hashed = hash_password(payload.password)
+        hashed = await hash_password_async(payload.password)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
+    except PasswordHasherBusy:
+        raise _hasher_busy()
 
-    user = User(email=payload.email, hashed_password=hashed)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return UserOut(id=user.id, email=user.email)
+    return await run_in_threadpool(_create_user, db, payload.email, hashed)
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(
+    request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_read_db)
+):
     # Swagger sends "username", we'll treat it as email
     email = form_data.username
     password = form_data.password
+    # before the lookup and bcrypt: a guessing loop shouldn't cost a hash per attempt
+    admit_login(request.client.host if request.client else "", email)
 
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+    user = await run_in_threadpool(_credentials, db, email)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+    try:
+        ok, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not ok:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    # bcrypt cost changed since this hash was made: upgrade it transparently
+    if new_hash:
+        await run_in_threadpool(_store_rehash, user.id, new_hash)
+
     token = create_access_token(subject=str(user.id))
     return TokenResponse(access_token=token)
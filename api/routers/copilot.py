@@ -1,72 +1,178 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Text, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from api.core.admission import admit_copilot_run
 from api.core.auth_deps import get_current_user
-from api.db.deps import get_db
-from api.db.models import CopilotRun, User
+from api.core.etag import etag_matches, make_etag, not_modified, set_etag
+from api.core.fast_json import dumps, items_response, raw_json
+from api.core.principal import Principal
+from api.db.deps import get_async_read_db, get_db
+from api.db.models import CopilotRun
 from api.schemas.copilot import (
     CopilotRunRequest,
     CopilotRunResponse,
     CopilotRunListResponse,
 )
 from api.services.copilot_service import run_copilot_task
+from api.services.kb_snippets import hydrate_output
+from api.services.telemetry_archive import naive_utc
 
 router = APIRouter(prefix="/copilot", tags=["copilot"])
 
 
-def _to_response(run: CopilotRun) -> dict:
+def _to_response(run: CopilotRun, output: Optional[dict] = None) -> dict:
     return {
         "run_id": run.id,
         "status": run.status,
         "task": run.task,
         "input_context": run.input_context or {},
-        "output": run.output or {},
+        "output": output if output is not None else (run.output or {}),
         "created_at": run.created_at.isoformat() if run.created_at else None,
     }
 
 
+# list rows: JSON columns stay as stored text and are spliced into the body unparsed
+# (output.sources as kb_snippets references; GET /runs/{run_id} rehydrates them)
+_RUN_COLUMNS = (
+    CopilotRun.id,
+    CopilotRun.status,
+    CopilotRun.task,
+    cast(CopilotRun.input_context, Text),
+    cast(CopilotRun.output, Text),
+    CopilotRun.created_at,
+)
+
+
+def _encode_run_row(row) -> bytes:
+    run_id, status, task, input_context, output, created_at = row
+    return b"".join((
+        b'{"run_id":', dumps(run_id),
+        b',"status":', dumps(status),
+        b',"task":', dumps(task),
+        b',"input_context":', raw_json(input_context),
+        b',"output":', raw_json(output),
+        b',"created_at":', dumps(created_at),
+        b"}",
+    ))
+
+
+_SUMMARY_COLUMNS = (
+    CopilotRun.id,
+    CopilotRun.status,
+    CopilotRun.task,
+    CopilotRun.created_at,
+    CopilotRun.output[("diagnosis", 0)].as_string(),
+)
+
+
+def _encode_summary_row(row) -> bytes:
+    run_id, status, task, created_at, headline = row
+    return dumps({"run_id": run_id, "status": status, "task": task, "created_at": created_at, "headline": headline})
+
+
+def _encode_cursor(run_id: int) -> str:
+    return base64.urlsafe_b64encode(str(run_id).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.post("/run", response_model=CopilotRunResponse)
 def copilot_run(
     payload: CopilotRunRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(admit_copilot_run),
 ):
     run = run_copilot_task(db, current_user, payload.task)
-    return _to_response(run)
+    return _to_response(run, hydrate_output(db, run.output))
 
 
 @router.get("/runs", response_model=CopilotRunListResponse)
-def list_copilot_runs(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_copilot_runs(
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+    fields: str = Query("full", pattern="^(full|summary)$", description="summary omits input_context/output"),
+    status: Optional[str] = Query(None),
+    device_id: Optional[str] = Query(None, description="input_context.device_id"),
+    since: Optional[datetime] = Query(None, description="created_at >= since (UTC if no offset)"),
+    until: Optional[datetime] = Query(None, description="created_at < until"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
 ):
-    runs = (
-        db.query(CopilotRun)
-        .filter(CopilotRun.user_id == current_user.id)
-        .order_by(CopilotRun.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset")
 
-    return {"items": [_to_response(r) for r in runs]}
+    # runs are never modified after insert, so the user's newest run id versions every page
+    max_id = (
+        await db.execute(select(func.max(CopilotRun.id)).where(CopilotRun.user_id == current_user.id))
+    ).scalar()
+    etag = make_etag("runs", current_user.id, max_id, request.url.query)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    columns = _SUMMARY_COLUMNS if fields == "summary" else _RUN_COLUMNS
+    # newest first along ix_copilot_runs_user_id_id; the cursor is the last id seen
+    q = select(*columns).where(CopilotRun.user_id == current_user.id)
+    if cursor:
+        q = q.where(CopilotRun.id < _decode_cursor(cursor))
+    if status:
+        q = q.where(CopilotRun.status == status)
+    if device_id:
+        q = q.where(CopilotRun.device_id == device_id)
+    if since is not None:
+        q = q.where(CopilotRun.created_at >= naive_utc(since))
+    if until is not None:
+        q = q.where(CopilotRun.created_at < naive_utc(until))
+
+    rows = (await db.execute(q.order_by(CopilotRun.id.desc()).offset(offset).limit(limit + 1))).all()
+    next_cursor = _encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    encode = _encode_summary_row if fields == "summary" else _encode_run_row
+    return set_etag(items_response(rows, encode, {"next_cursor": next_cursor}), etag)
 
 
 @router.get("/runs/{run_id}", response_model=CopilotRunResponse)
-def get_copilot_run(
+async def get_copilot_run(
     run_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
+    # immutable run + content-addressed sources: the id is the version
+    etag = make_etag("run", run_id)
+    if etag_matches(request, etag):
+        owned = (
+            await db.execute(
+                select(CopilotRun.id).where(CopilotRun.id == run_id, CopilotRun.user_id == current_user.id)
+            )
+        ).scalar()
+        if owned is not None:
+            return not_modified(etag)
+
     run = (
-        db.query(CopilotRun)
-        .filter(CopilotRun.id == run_id, CopilotRun.user_id == current_user.id)
-        .first()
-    )
+        await db.execute(
+            select(CopilotRun).where(CopilotRun.id == run_id, CopilotRun.user_id == current_user.id)
+        )
+    ).scalar_one_or_none()
 
     if not run:
         raise HTTPException(status_code=404, detail="Copilot run not found")
 
-    return _to_response(run)
+    set_etag(response, etag)
+    # sources are stored as kb_snippets references; only single-run reads rehydrate them
+    return _to_response(run, await db.run_sync(hydrate_output, run.output))
@@ -1,17 +1,52 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
 
-from api.core.auth_deps import get_current_user
-from api.db.models import User
+from api.core.auth_deps import get_admin_user, get_current_user
+from api.core.principal import Principal
+from api.db.deps import get_db
+from api.schemas.device import DeviceKeyProvisionRequest, DeviceKeyProvisionResponse
+from api.services.device_keys import device_keys
 
 
 router = APIRouter(prefix="/device", tags=["device"])
 
 @router.post("/reset")
-def reset_device(device_id: str, current_user: User = Depends(get_current_user)):
+def reset_device(device_id: str, current_user: Principal = Depends(get_current_user)):
     return {
         "device_id": device_id,
         "action": "reset_triggered",
         "status": "simulated",
         "timestamp": datetime.utcnow().isoformat(),
     }
+
+
+@router.post("/keys", response_model=DeviceKeyProvisionResponse, status_code=201)
+def provision_device_keys(
+    payload: DeviceKeyProvisionRequest,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_admin_user),
+):
+    """
+    Bulk-issue HMAC keys. Devices that already have a key are rotated: the old
+    key stays valid for overlap_seconds. Secrets are only returned here, once.
+    Admins only: a key lets its holder sign ingest as that device.
+    """
+    created = device_keys.provision(
+        db,
+        payload.device_ids,
+        overlap_seconds=payload.overlap_seconds,
+        valid_days=payload.valid_days,
+    )
+    return {
+        "items": [
+            {
+                "device_id": k.device_id,
+                "key_id": k.key_id,
+                "secret": k.secret,
+                "valid_from": k.valid_from,
+                "expires_at": k.expires_at,
+            }
+            for k in created
+        ]
+    }
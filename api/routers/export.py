@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from api.core.admission import shed_if_db_overloaded
+from api.core.auth_deps import get_current_user
+from api.core.principal import Principal
+from api.services.export import (
+    FORMATS,
+    ExportUnavailable,
+    copilot_run_schema,
+    iter_copilot_run_batches,
+    iter_telemetry_batches,
+    stream_export,
+    telemetry_schema,
+)
+from api.services.telemetry_archive import naive_utc, telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+
+# full scans compete with ingest for the disk; refused while writes are slow
+router = APIRouter(prefix="/export", tags=["export"], dependencies=[Depends(shed_if_db_overloaded)])
+
+_FORMAT_QUERY = Query("parquet", pattern="^(parquet|arrow)$", description="parquet or arrow (IPC stream)")
+
+
+def _streaming(name: str, fmt: str, body: Iterator[bytes]) -> StreamingResponse:
+    media_type, ext = FORMATS[fmt]
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}-{stamp}.{ext}"'},
+    )
+
+
+@router.get("/telemetry")
+def export_telemetry(
+    current_user: Principal = Depends(get_current_user),
+    format: str = _FORMAT_QUERY,
+    device_id: str | None = Query(None),
+    since: datetime | None = Query(None, description="created_at >= since (UTC if no offset)"),
+    until: datetime | None = Query(None, description="created_at < until"),
+):
+    """
+    Streams telemetry events (live shards and archive) as Parquet or Arrow IPC.
+    The sync generator runs in the threadpool, one record batch at a time.
+    """
+    try:
+        schema = telemetry_schema()
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    batches = iter_telemetry_batches(
+        telemetry_shards, telemetry_archive, device_id, naive_utc(since), naive_utc(until)
+    )
+    return _streaming("telemetry", format, stream_export(batches, schema, format))
+
+
+@router.get("/copilot-runs")
+def export_copilot_runs(
+    current_user: Principal = Depends(get_current_user),
+    format: str = _FORMAT_QUERY,
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+):
+    """Streams the caller's copilot runs; input_context and output are JSON text columns."""
+    try:
+        schema = copilot_run_schema()
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    batches = iter_copilot_run_batches(current_user.id, naive_utc(since), naive_utc(until))
+    return _streaming("copilot-runs", format, stream_export(batches, schema, format))
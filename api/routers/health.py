@@ -1,5 +1,8 @@
 from datetime import datetime
 from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+
+from api.services.readiness import readiness
 
 router = APIRouter(tags=["health"])
 
@@ -14,6 +17,13 @@ def health():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
 
 
+@router.get("/ready")
+async def ready():
+    # liveness is /health; this one tells the load balancer whether to send traffic
+    ok, body = await readiness.report()
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+
 @router.get("/")
 def root():
     return {
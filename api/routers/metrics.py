@@ -0,0 +1,54 @@
+from typing import Dict, Tuple
+
+import anyio.to_thread
+from fastapi import APIRouter, Response
+
+from api.core.admission import load_shedder
+from api.core.logging import dropped_records
+from api.core.metrics import CONTENT_TYPE, REGISTRY, instrument_engine, instrumented_engines
+from api.core.security import password_hasher
+from api.db.engines import database_engines
+
+router = APIRouter(tags=["metrics"])
+
+
+def instrument_engines() -> None:
+    """Hook SQL timing into the main database engines and every telemetry shard."""
+    for name, engine in database_engines().items():
+        instrument_engine(name, engine)
+
+
+def _threadpool() -> Dict[Tuple[str, ...], float]:
+    # sync routes and run_in_threadpool borrow from anyio's default limiter (40 threads)
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {("in_use",): limiter.borrowed_tokens, ("capacity",): limiter.total_tokens}
+
+
+def _db_pools() -> Dict[Tuple[str, ...], float]:
+    out = {}
+    for name, engine in instrumented_engines().items():
+        checkedout = getattr(engine.pool, "checkedout", None)
+        if checkedout is not None:
+            out[(name,)] = checkedout()
+    return out
+
+
+def _password_hasher() -> Dict[Tuple[str, ...], float]:
+    stats = password_hasher.stats()
+    return {(key,): stats[key] for key in ("in_flight", "queue_depth", "rejected")}
+
+
+REGISTRY.gauge_func("avops_threadpool_tokens", "anyio worker threads in use / capacity.", ("state",), _threadpool)
+REGISTRY.gauge_func("avops_db_pool_checked_out", "DB connections checked out, per engine.", ("engine",), _db_pools)
+REGISTRY.gauge_func(
+    "avops_load_shedding_signals", "Inputs to load shedding: write latency EWMA (ms), LLM calls in flight.", ("signal",),
+    lambda: {(key,): value for key, value in load_shedder.stats().items()},
+)
+REGISTRY.gauge_func("avops_log_records_dropped", "Log records dropped because the log queue was full.", (), lambda: {(): dropped_records()})
+REGISTRY.gauge_func("avops_password_hasher", "bcrypt pool jobs (rejected is cumulative).", ("state",), _password_hasher)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # async on purpose: the threadpool gauge must be read from the event loop thread
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
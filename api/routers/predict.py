@@ -1,11 +1,26 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
+from api.core.config import settings
+from api.core.fast_json import dumps
+from api.core.metrics import RISK_BATCH_SIZE, RISK_BATCH_WAIT
+from api.core.microbatch import MicroBatcher
 from api.schemas.telemetry import TelemetryPayload, RiskResponse
-from api.services.risk import compute_risk
+from api.services.risk import score_risk_batch
 
 router = APIRouter(prefix="/predict", tags=["predict"])
 
+# concurrent callers within the window share one scoring pass (one history read and model call when a model is loaded)
+risk_batcher = MicroBatcher(
+    score_risk_batch,
+    window_ms=settings.risk_batch_window_ms,
+    max_size=settings.risk_batch_max_size,
+    batch_size=RISK_BATCH_SIZE,
+    queue_wait=RISK_BATCH_WAIT,
+)
+
 
 @router.post("/risk", response_model=RiskResponse)
-def predict_risk(payload: TelemetryPayload):
-    return compute_risk(payload)
+async def predict_risk(payload: TelemetryPayload):
+    # async: no threadpool hop per call; the Response skips response_model re-validation
+    result = await risk_batcher.submit(payload)
+    return Response(dumps(result), media_type="application/json")
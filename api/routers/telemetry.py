@@ -1,54 +1,311 @@
+import logging
+import time
+import uuid
+from collections import Counter
 from datetime import datetime
-from typing import Dict
-from sqlalchemy.orm import Session
+from typing import Dict, List, Mapping, Optional, Sequence
+from pydantic import ValidationError
 
-from api.db.deps import get_db
-from api.schemas.telemetry import TelemetryPayload
-from api.services.telemetry_store import save_telemetry_event
+from api.core.config import settings
+from api.schemas.telemetry import SEQ_ID_PREFIX, TelemetryPayload
+from api.services.telemetry_codec import (
+    FRAME_CONTENT_TYPE,
+    MSGPACK_CONTENT_TYPE,
+    TelemetryColumns,
+    TelemetryDecodeError,
+    columns_from_payloads,
+    decode_frame,
+    decode_msgpack,
+)
+from api.services.telemetry_archive import naive_utc, read_event, read_events, telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+from api.services.telemetry_store import IngestResult
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 
+from api.core.admission import admit_devices, load_shedder
 from api.core.auth_deps import get_current_user
-from api.db.models import TelemetryEvent, User
-from api.schemas.telemetry import TelemetryEventListResponse, TelemetryEventResponse
+from api.core.etag import etag_matches, make_etag, not_modified, set_etag
+from api.core.logging import INGEST_LOGGER
+from api.core.metrics import INGEST_ITEMS, INGEST_PENDING
+from api.core.fast_json import items_response
+from api.core.device_auth import ensure_device_matches, get_device_key
+from api.core.principal import Principal
+from api.schemas.telemetry import (
+    TelemetryBatchRequest,
+    TelemetryBatchResponse,
+    TelemetryEventListResponse,
+    TelemetryEventResponse,
+)
+from api.services.device_keys import DeviceKeyEntry
 
 
 router = APIRouter(prefix="/telemetry", tags=["telemetry"])
+ingest_logger = logging.getLogger(INGEST_LOGGER)
 
 # In-memory storage (demo)
 telemetry_store: Dict[str, Dict] = {}
+# /latest ETag: bumped on every store change; the process id keeps workers' tags apart
+_store_id = uuid.uuid4().hex
+_store_version = 0
 
 
-@router.post("/ingest")
-def ingest_telemetry(payload: TelemetryPayload, db: Session = Depends(get_db)):
-    # 1) keep the in-memory store for quick demo reads
-    telemetry_store[payload.device_id] = {
-        "data": payload.model_dump(),
-        "timestamp": datetime.utcnow().isoformat(),
+_BINARY_BODY = {"schema": {"type": "string", "format": "binary"}}
+_BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "object",
+                    "required": ["items"],
+                    "properties": {
+                        "items": {"type": "array", "items": {"$ref": "#/components/schemas/TelemetryPayload"}}
+                    },
+                }
+            },
+            MSGPACK_CONTENT_TYPE: _BINARY_BODY,
+            FRAME_CONTENT_TYPE: _BINARY_BODY,
+        },
+    }
+}
+
+
+def _latest_data(row: Dict) -> Dict:
+    """A stored row in TelemetryPayload's shape (message_id and seq apart), as /latest has always served it."""
+    key = row.pop("message_id")
+    seq = key[len(SEQ_ID_PREFIX) :] if key and key.startswith(SEQ_ID_PREFIX) else None
+    row["message_id"] = None if seq is not None else key
+    row["seq"] = int(seq) if seq is not None else None
+    return row
+
+
+def _remember_latest(columns: TelemetryColumns, results: Sequence[IngestResult]) -> None:
+    # keep the in-memory store for quick demo reads; retries don't count as new readings
+    global _store_version
+    now = datetime.utcnow().isoformat()
+    for row, result in zip(columns.rows(), results):
+        if not result.duplicate:
+            telemetry_store[row["device_id"]] = {
+                "data": _latest_data(row),
+                "timestamp": now,
+            }
+            _store_version += 1
+
+
+async def prime_latest_store(limit: int) -> int:
+    """Fill the in-memory store from each device's newest event (startup warm-up); returns devices added."""
+    global _store_version
+    added = 0
+    for record in await telemetry_shards.latest_per_device(limit):
+        # readings ingested since startup are newer than anything on disk
+        if record.device_id in telemetry_store:
+            continue
+        telemetry_store[record.device_id] = {
+            "data": _latest_data({
+                "device_id": record.device_id,
+                "temperature": record.temperature,
+                "packet_loss": record.packet_loss,
+                "audio_dropouts": record.audio_dropouts,
+                "error_code": record.error_code,
+                "message_id": record.message_id,
+            }),
+            "timestamp": record.created_at.isoformat(),
+        }
+        added += 1
+    if added:
+        _store_version += 1
+    return added
+
+
+def _admit(counts: Mapping[str, int], device_key: Optional[DeviceKeyEntry]) -> None:
+    # key check first: a signed request may only charge (and drain) its own device's bucket
+    for device_id in counts:
+        ensure_device_matches(device_key, device_id)
+    admit_devices(counts)
+
+
+async def _ingest_columns(columns: TelemetryColumns) -> List[IngestResult]:
+    """Stores columns that already went through _admit."""
+    INGEST_PENDING.inc(len(columns))
+    started = time.perf_counter()
+    try:
+        results = await telemetry_shards.save_columns(columns)
+    finally:
+        INGEST_PENDING.dec(len(columns))
+        # feeds load shedding: other DB-heavy routes back off when ingest writes slow down
+        load_shedder.observe_db_write(time.perf_counter() - started, len(columns))
+    duplicates = sum(1 for r in results if r.duplicate)
+    INGEST_ITEMS.labels("inserted").inc(len(results) - duplicates)
+    INGEST_ITEMS.labels("duplicate").inc(duplicates)
+    # sampled (LOG_INGEST_SAMPLE_RATE): one line per batch is the highest-volume log source
+    ingest_logger.info(
+        "ingested %d items (%d duplicate)", len(results), duplicates,
+        extra={"items": len(results), "duplicates": duplicates},
+    )
+    _remember_latest(columns, results)
+    return results
+
+
+def _decode_batch(content_type: str, body: bytes) -> TelemetryColumns:
+    try:
+        if content_type == MSGPACK_CONTENT_TYPE:
+            return decode_msgpack(body)
+        if content_type == FRAME_CONTENT_TYPE:
+            return decode_frame(body)
+    except TelemetryDecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if content_type not in ("", "application/json"):
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+    try:
+        batch = TelemetryBatchRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    return columns_from_payloads(batch.items)
+
+
+def _batch_response(results: Sequence[IngestResult]) -> dict:
+    duplicates = sum(1 for r in results if r.duplicate)
+    return {
+        "inserted": len(results) - duplicates,
+        "duplicates": duplicates,
+        "items": [
+            {"device_id": r.device_id, "event_id": r.event_id, "duplicate": r.duplicate}
+            for r in results
+        ],
     }
 
-    # 2) also persist to DB
-    saved = save_telemetry_event(db, payload)
+
+@router.post("/ingest")
+async def ingest_telemetry(
+    payload: TelemetryPayload,
+    device_key: Optional[DeviceKeyEntry] = Depends(get_device_key),
+):
+    _admit({payload.device_id: 1}, device_key)
+    saved = (await _ingest_columns(columns_from_payloads([payload])))[0]
 
     return {
-        "message": "Telemetry ingested",
+        "message": "Duplicate telemetry ignored" if saved.duplicate else "Telemetry ingested",
         "device_id": payload.device_id,
-        "event_id": saved.id,
+        "event_id": saved.event_id,
+        "duplicate": saved.duplicate,
+    }
+
+
+@router.post("/ingest/batch", response_model=TelemetryBatchResponse, openapi_extra=_BATCH_OPENAPI)
+async def ingest_telemetry_batch(
+    request: Request,
+    device_key: Optional[DeviceKeyEntry] = Depends(get_device_key),
+):
+    """
+    Bulk ingest. Content-Type selects the decoder:
+      - application/json: {"items": [TelemetryPayload, ...]}
+      - application/msgpack: records or a map of columns
+      - application/x-avops-frame: packed records with a device table
+    The binary formats decode straight into column arrays (see telemetry_codec).
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in (MSGPACK_CONTENT_TYPE, FRAME_CONTENT_TYPE):
+        columns = _decode_batch(content_type, body)
+    else:
+        # Pydantic validation of a large JSON batch is too slow for the event loop
+        columns = await run_in_threadpool(_decode_batch, content_type, body)
+
+    _admit(Counter(columns.device_id), device_key)
+    results = await _ingest_columns(columns)
+    return _batch_response(results)
+
+
+@router.post("/ingest/stream")
+async def ingest_telemetry_stream(
+    request: Request,
+    device_key: Optional[DeviceKeyEntry] = Depends(get_device_key),
+):
+    """
+    NDJSON body, one TelemetryPayload per line. Lines are flushed in batches of
+    ingest_stream_batch_size as they arrive; bad lines are reported, not fatal.
+    Duplicates are reported with the event id of the original row.
+    """
+    line_no = 0
+    received = 0
+    inserted = 0
+    duplicates: List[dict] = []
+    errors: List[dict] = []
+    pending: List[TelemetryPayload] = []
+    pending_lines: List[int] = []
+
+    async def flush() -> None:
+        nonlocal inserted
+        if not pending:
+            return
+        results = await _ingest_columns(columns_from_payloads(pending))
+        for line, r in zip(pending_lines, results):
+            if r.duplicate:
+                duplicates.append({"line": line, "device_id": r.device_id, "event_id": r.event_id})
+            else:
+                inserted += 1
+        pending.clear()
+        pending_lines.clear()
+
+    def accept(raw: bytes) -> None:
+        nonlocal line_no, received
+        line_no += 1
+        raw = raw.strip()
+        if not raw:
+            return
+        received += 1
+        try:
+            item = TelemetryPayload.model_validate_json(raw)
+            # over-rate lines are reported like bad ones; the rest of the stream still lands
+            _admit({item.device_id: 1}, device_key)
+        except (ValidationError, HTTPException) as e:
+            detail = e.detail if isinstance(e, HTTPException) else e.errors(include_url=False)
+            errors.append({"line": line_no, "detail": detail})
+            return
+        pending.append(item)
+        pending_lines.append(line_no)
+
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            accept(raw)
+        if len(pending) >= settings.ingest_stream_batch_size:
+            await flush()
+    accept(buffer)
+    await flush()
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "errors": errors,
     }
 
 
 @router.get("/latest")
-def get_latest_telemetry():
+def get_latest_telemetry(request: Request, response: Response):
+    etag = make_etag("latest", _store_id, _store_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return telemetry_store
 
 @router.get("/latest/{device_id}")
-def get_latest_for_device(device_id: str, db: Session = Depends(get_db)):
-    row = (
-        db.query(__import__("api.db.models").db.models.TelemetryEvent)
-        .filter_by(device_id=device_id)
-        .order_by(__import__("api.db.models").db.models.TelemetryEvent.id.desc())
-        .first()
-    )
+async def get_latest_for_device(device_id: str, request: Request, response: Response):
+    # the device's newest event id comes off the index, so a match skips the row read
+    if "if-none-match" in request.headers:
+        etag = make_etag("latest", device_id, await telemetry_shards.latest_id_for_device(device_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    row = await telemetry_shards.latest_for_device(device_id)
+    set_etag(response, make_etag("latest", device_id, row.id if row else None))
 
     if not row:
         return {"device_id": device_id, "latest": None}
@@ -67,34 +324,28 @@ def get_latest_for_device(device_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/events", response_model=TelemetryEventListResponse)
-def list_telemetry_events(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_telemetry_events(
+    current_user: Principal = Depends(get_current_user),
     device_id: str | None = Query(None),
+    since: datetime | None = Query(None, description="created_at >= since (UTC if no offset)"),
+    until: datetime | None = Query(None, description="created_at < until"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
 ):
-    q = db.query(TelemetryEvent)
-    if device_id:
-        q = q.filter(TelemetryEvent.device_id == device_id)
-
-    rows = (
-        q.order_by(TelemetryEvent.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    # since/until prune both the live shards and the archive partitions that get read
+    rows = await read_events(
+        telemetry_shards, telemetry_archive, device_id, limit, offset, naive_utc(since), naive_utc(until)
     )
-
-    return {"items": rows}
+    # TelemetryRecord rows are encoded directly; response_model only documents the shape
+    return items_response(rows)
 
 
 @router.get("/events/{event_id}", response_model=TelemetryEventResponse)
-def get_telemetry_event(
+async def get_telemetry_event(
     event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    row = db.query(TelemetryEvent).filter(TelemetryEvent.id == event_id).first()
+    row = await read_event(telemetry_shards, telemetry_archive, event_id)
     if not row:
         raise HTTPException(status_code=404, detail="Telemetry event not found")
     return row
@@ -5,6 +5,8 @@ from api.routers.predict import router as predict_router
 from api.routers.device import router as device_router
 from api.routers.auth import router as auth_router
 from api.routers.copilot import router as copilot_router
+from api.routers.export import router as export_router
+from api.routers.admin import router as admin_router
 
 router = APIRouter(prefix="/api/v1")
 
@@ -13,6 +15,8 @@ router.include_router(predict_router)
 router.include_router(device_router)
 router.include_router(auth_router)
 router.include_router(copilot_router)
+router.include_router(export_router)
+router.include_router(admin_router)
 
 @router.get("/health")
 def health_v1():
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -18,5 +18,13 @@ class CopilotRunResponse(BaseModel):
     output: Dict[str, Any] = Field(default_factory=dict)
     created_at: Union[datetime, str]
 
+class CopilotRunSummaryResponse(BaseModel):
+    run_id: int
+    status: str
+    task: str
+    created_at: Union[datetime, str]
+    headline: Optional[str] = None  # first diagnosis line
+
 class CopilotRunListResponse(BaseModel):
-    items: List[CopilotRunResponse]
+    items: List[Union[CopilotRunResponse, CopilotRunSummaryResponse]]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class DeviceKeyProvisionRequest(BaseModel):
+    device_ids: List[str] = Field(min_length=1, max_length=1000)
+    # how long the previous key of each device keeps working after rotation
+    overlap_seconds: int = Field(default=86400, ge=0)
+    valid_days: Optional[int] = Field(default=None, ge=1)
+
+
+class DeviceKeyOut(BaseModel):
+    device_id: str
+    key_id: str
+    secret: str
+    valid_from: datetime
+    expires_at: Optional[datetime] = None
+
+
+class DeviceKeyProvisionResponse(BaseModel):
+    items: List[DeviceKeyOut]
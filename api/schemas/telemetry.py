@@ -1,19 +1,49 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
+MAX_BATCH_ITEMS = 5000
+# metrics are stored as integers; archive chunk headers keep their min/max as int32
+METRIC_MIN, METRIC_MAX = -(2**31), 2**31 - 1
+# seq keys get their own namespace: seq=5 and message_id="5" are different readings
+SEQ_ID_PREFIX = "seq:"
+
 class TelemetryPayload(BaseModel):
     device_id: str
-    temperature: float
-    packet_loss: float
-    audio_dropouts: int
+    temperature: float = Field(ge=METRIC_MIN, le=METRIC_MAX)
+    packet_loss: float = Field(ge=METRIC_MIN, le=METRIC_MAX)
+    audio_dropouts: int = Field(ge=METRIC_MIN, le=METRIC_MAX)
     error_code: str | None = None
+    # idempotency: a retry carrying the same (device_id, message_id) or
+    # (device_id, seq) returns the original event instead of a new row
+    message_id: str | None = Field(default=None, max_length=64)
+    seq: int | None = None
+
+    def idempotency_id(self) -> Optional[str]:
+        if self.message_id:
+            return self.message_id
+        return f"{SEQ_ID_PREFIX}{self.seq}" if self.seq is not None else None
+
+class TelemetryBatchRequest(BaseModel):
+    items: List[TelemetryPayload] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+
+class TelemetryIngestResult(BaseModel):
+    device_id: str
+    event_id: int
+    duplicate: bool = False
+
+class TelemetryBatchResponse(BaseModel):
+    inserted: int
+    duplicates: int
+    items: List[TelemetryIngestResult]
 
 class RiskResponse(BaseModel):
     device_id: str
     risk_score: float
     reason: str
     timestamp: str
+    # "rules" (threshold scoring) or the learned model version that produced risk_score
+    model: str = "rules"
 
 class TelemetryEventResponse(BaseModel):
     id: int
@@ -22,6 +52,7 @@ class TelemetryEventResponse(BaseModel):
     packet_loss: int
     audio_dropouts: int
     error_code: Optional[str] = None
+    message_id: Optional[str] = None
     created_at: datetime
 
 class TelemetryEventListResponse(BaseModel):
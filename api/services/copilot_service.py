@@ -1,16 +1,22 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
 from datetime import datetime
 from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 
-from api.db.models import CopilotRun, TelemetryEvent, User
+from api.core.metrics import LLM_FAILURES
+from api.core.principal import Principal
+from api.db.models import CopilotRun
+from api.services.kb_snippets import store_sources
 from api.services.retrieval import retrieve_kb
 from api.services.llm_client import call_llm
+from api.services.telemetry_shards import TelemetryRecord, telemetry_shards
 
+logger = logging.getLogger(__name__)
 
 _JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
 
@@ -73,18 +79,14 @@ def _try_parse_llm_json(text: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def run_copilot_task(db: Session, user: User, task: str) -> CopilotRun:
+def run_copilot_task(db: Session, user: Principal, task: str) -> CopilotRun:
     # 1) extract device id and get latest telemetry
     device_id = _extract_device_id(task)
 
-    latest: Optional[TelemetryEvent] = None
+    latest: Optional[TelemetryRecord] = None
     if device_id:
-        latest = (
-            db.query(TelemetryEvent)
-            .filter(TelemetryEvent.device_id == device_id)
-            .order_by(TelemetryEvent.id.desc())
-            .first()
-        )
+        # telemetry may live in a shard file rather than this session's database
+        latest = telemetry_shards.latest_for_device_sync(device_id)
 
     # 2) rule-based baseline (works even if LLM fails)
     diagnosis: List[str] = []
@@ -119,6 +121,10 @@ def run_copilot_task(db: Session, user: User, task: str) -> CopilotRun:
     except Exception:
         kb_hits = []
 
+    # end the read transaction before the slow LLM call so this request doesn't
+    # pin a DB connection (the single writer, under the production SQLite profile)
+    db.rollback()
+
     # 4) build prompts
     system_prompt = (
         "You are an AV operations copilot.\n"
@@ -162,18 +168,21 @@ def run_copilot_task(db: Session, user: User, task: str) -> CopilotRun:
                     "next_steps": [str(x) for x in n],
                     "notes": str(llm_parsed.get("notes", "")).strip(),
                 }
+        if llm_output is None:
+            LLM_FAILURES.labels("invalid_json").inc()
     except Exception as e:
-        print("LLM ERROR:", repr(e))
+        logger.warning("LLM call failed: %r", e)
         llm_output = None
 
-    # 6) final output stored in DB
+    # 6) final output stored in DB; hits are stored once in kb_snippets, runs keep references
+    sources = store_sources(db, kb_hits)
     final_output: Dict[str, Any]
     if llm_output:
         final_output = {
             **llm_output,
             "generated_at": datetime.utcnow().isoformat(),
             "used_retrieval": bool(kb_hits),
-            "sources": kb_hits,  # keeps demo explainable
+            "sources": sources,  # keeps demo explainable
         }
     else:
         final_output = {
@@ -182,13 +191,14 @@ def run_copilot_task(db: Session, user: User, task: str) -> CopilotRun:
             "notes": "rule-based fallback (LLM unavailable or invalid JSON).",
             "generated_at": datetime.utcnow().isoformat(),
             "used_retrieval": bool(kb_hits),
-            "sources": kb_hits,
+            "sources": sources,
         }
 
     # 7) persist CopilotRun
     # IMPORTANT: set created_at explicitly to avoid SQLite NOT NULL default issues
     run = CopilotRun(
         user_id=user.id,
+        device_id=device_id,
         task=task,
         input_context={
             "device_id": device_id,
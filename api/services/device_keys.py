@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from api.db.models import DeviceKey
+from api.db.session import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DeviceKeyEntry:
+    key_id: str
+    device_id: str
+    secret: bytes
+    valid_from: datetime
+    expires_at: Optional[datetime]
+
+    def is_valid_at(self, now: datetime) -> bool:
+        if now < self.valid_from:
+            return False
+        return self.expires_at is None or now < self.expires_at
+
+
+def sign_payload(secret: str | bytes, timestamp: str, body: bytes) -> str:
+    """
+    Device-side signature: hex HMAC-SHA256 over b"<timestamp>." + raw body.
+    Exposed here so scripts / simulators sign exactly like the server verifies.
+    """
+    key = secret.encode("utf-8") if isinstance(secret, str) else secret
+    return hmac.new(key, timestamp.encode("ascii") + b"." + body, hashlib.sha256).hexdigest()
+
+
+class DeviceKeyRegistry:
+    """
+    In-memory key_id -> DeviceKeyEntry table.
+
+    Loaded once at startup and refreshed incrementally (rows with a newer
+    updated_at), so verifying a packet is a dict lookup plus one HMAC.
+    """
+
+    def __init__(self, miss_refresh_interval: float = 5.0) -> None:
+        self._entries: Dict[str, DeviceKeyEntry] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._miss_refresh_interval = miss_refresh_interval
+        self._last_refresh = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def knows(self, key_id: str) -> bool:
+        return key_id in self._entries
+
+    def _apply(self, rows: Iterable[DeviceKey]) -> int:
+        n = 0
+        with self._lock:
+            for row in rows:
+                self._entries[row.key_id] = DeviceKeyEntry(
+                    key_id=row.key_id,
+                    device_id=row.device_id,
+                    secret=row.secret.encode("utf-8"),
+                    valid_from=row.valid_from,
+                    expires_at=row.expires_at,
+                )
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+                n += 1
+        return n
+
+    def refresh(self, db: Optional[Session] = None) -> int:
+        """Pull rows changed since the last refresh. Returns how many were applied."""
+        own_session = db is None
+        db = db or ReadSessionLocal()
+        try:
+            q = db.query(DeviceKey)
+            if self._watermark is not None:
+                # >= so rows sharing the watermark timestamp aren't missed; re-applying is harmless
+                q = q.filter(DeviceKey.updated_at >= self._watermark)
+            n = self._apply(q.all())
+        finally:
+            if own_session:
+                db.close()
+        self._last_refresh = time.monotonic()
+        return n
+
+    def lookup(self, key_id: str) -> Optional[DeviceKeyEntry]:
+        entry = self._entries.get(key_id)
+        if entry is not None:
+            return entry
+
+        # Unknown key: it may have been provisioned by another worker. Refresh,
+        # but rate-limited so garbage key ids can't turn into a DB hammer.
+        if time.monotonic() - self._last_refresh < self._miss_refresh_interval:
+            return None
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("device key refresh failed")
+            return None
+        return self._entries.get(key_id)
+
+    def verify(self, key_id: str, timestamp: str, body: bytes, signature: str) -> Optional[DeviceKeyEntry]:
+        entry = self.lookup(key_id)
+        if entry is None or not entry.is_valid_at(datetime.utcnow()):
+            return None
+        expected = sign_payload(entry.secret, timestamp, body)
+        if not hmac.compare_digest(expected, signature.lower()):
+            return None
+        return entry
+
+    def provision(
+        self,
+        db: Session,
+        device_ids: List[str],
+        overlap_seconds: int,
+        valid_days: Optional[int] = None,
+    ) -> List[DeviceKey]:
+        """
+        Issue one new key per device. Existing keys of those devices are rotated:
+        they stay valid for `overlap_seconds` so devices can switch over.
+        """
+        now = datetime.utcnow()
+        overlap_until = now + timedelta(seconds=overlap_seconds)
+        expires_at = now + timedelta(days=valid_days) if valid_days else None
+
+        unique_ids = list(dict.fromkeys(device_ids))
+        existing = (
+            db.query(DeviceKey)
+            .filter(DeviceKey.device_id.in_(unique_ids))
+            .filter((DeviceKey.expires_at.is_(None)) | (DeviceKey.expires_at > overlap_until))
+            .all()
+        )
+        for old in existing:
+            old.expires_at = overlap_until
+
+        created: List[DeviceKey] = []
+        for device_id in unique_ids:
+            key = DeviceKey(
+                key_id=f"dk_{secrets.token_hex(8)}",
+                device_id=device_id,
+                secret=secrets.token_urlsafe(32),
+                valid_from=now,
+                expires_at=expires_at,
+                updated_at=now,
+            )
+            db.add(key)
+            created.append(key)
+
+        db.commit()
+        for key in created:
+            db.refresh(key)
+
+        self._apply(existing + created)
+        return created
+
+
+device_keys = DeviceKeyRegistry()
@@ -0,0 +1,243 @@
+"""
+Bulk export of telemetry_events and copilot_runs as Parquet or Arrow IPC.
+
+Rows are read with server-side cursors (stream_results + partitions) in
+export_batch_rows chunks and every chunk is written as one record batch (one
+Parquet row group), so memory stays bounded by the batch size whatever the
+export size. stream_export() yields the encoded bytes as they are produced, for
+a StreamingResponse or a file.
+
+Telemetry covers archived partitions (oldest first) and then every live shard
+in id order; rows are not globally sorted across shards.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Text, cast, select
+
+from api.core.config import settings
+from api.db.models import CopilotRun, TelemetryEvent
+from api.db.session import read_engine
+from api.services.telemetry_archive import TelemetryArchive
+from api.services.telemetry_shards import ShardRouter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for exports
+    pa = None
+    pq = None
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+class ExportUnavailable(RuntimeError):
+    pass
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ExportUnavailable("pyarrow is not installed on this server")
+
+
+def telemetry_schema() -> "pa.Schema":
+    _require_pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("device_id", pa.string()),
+        ("temperature", pa.int32()),
+        ("packet_loss", pa.int32()),
+        ("audio_dropouts", pa.int32()),
+        ("error_code", pa.string()),
+        ("message_id", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def copilot_run_schema() -> "pa.Schema":
+    _require_pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("status", pa.string()),
+        ("task", pa.string()),
+        # JSON text; nested shapes vary by run and LLM output
+        ("input_context", pa.string()),
+        ("output", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def _rows_to_batch(schema: "pa.Schema", rows: Sequence[tuple]) -> "pa.RecordBatch":
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+# ---------- telemetry ----------
+
+def iter_telemetry_batches(
+    router: ShardRouter,
+    archive: TelemetryArchive,
+    device_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_rows: Optional[int] = None,
+) -> Iterator["pa.RecordBatch"]:
+    schema = telemetry_schema()
+    batch_rows = batch_rows or settings.export_batch_rows
+
+    for partition in archive.prune(since, until):
+        cols = archive.partition_columns(partition, device_id, since, until)
+        idx = np.flatnonzero(cols.mask(device_id, since, until))[::-1]  # oldest first
+        errors = np.append(cols.errors, "")
+        for start in range(0, len(idx), batch_rows):
+            sel = idx[start : start + batch_rows]
+            err = cols.error_codes[sel]
+            msg = cols.message_id[sel]
+            yield pa.RecordBatch.from_arrays(
+                [
+                    pa.array(cols.id[sel]),
+                    pa.array(cols.devices[cols.device_codes[sel]]),
+                    pa.array(cols.temperature[sel]),
+                    pa.array(cols.packet_loss[sel]),
+                    pa.array(cols.audio_dropouts[sel]),
+                    pa.array(errors[err], mask=err < 0, type=pa.string()),
+                    pa.array(msg, mask=msg == "", type=pa.string()),
+                    pa.array(cols.created_at[sel], type=pa.timestamp("us")),
+                ],
+                schema=schema,
+            )
+
+    watermark = archive.watermark
+    if until is not None and watermark is not None and until <= watermark:
+        return
+
+    q = select(
+        TelemetryEvent.id,
+        TelemetryEvent.device_id,
+        TelemetryEvent.temperature,
+        TelemetryEvent.packet_loss,
+        TelemetryEvent.audio_dropouts,
+        TelemetryEvent.error_code,
+        TelemetryEvent.message_id,
+        TelemetryEvent.created_at,
+    ).order_by(TelemetryEvent.id)
+    if device_id:
+        q = q.where(TelemetryEvent.device_id == device_id)
+    if since is not None:
+        q = q.where(TelemetryEvent.created_at >= since)
+    if until is not None:
+        q = q.where(TelemetryEvent.created_at < until)
+
+    shards = [router.shard_for(device_id)] if device_id else router.shards
+    for shard in shards:
+        with shard.read_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(q)
+            for rows in result.partitions():
+                if router.count > 1:
+                    rows = [(router.encode_id(shard.index, r[0]), *r[1:]) for r in rows]
+                yield _rows_to_batch(schema, rows)
+
+
+# ---------- copilot runs ----------
+
+def iter_copilot_run_batches(
+    user_id: Optional[int],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_rows: Optional[int] = None,
+) -> Iterator["pa.RecordBatch"]:
+    """user_id None exports every user's runs (CLI only)."""
+    schema = copilot_run_schema()
+    batch_rows = batch_rows or settings.export_batch_rows
+
+    # the JSON columns are selected as stored text, so nothing is parsed and re-dumped
+    table = CopilotRun.__table__
+    q = select(
+        table.c.id,
+        table.c.user_id,
+        table.c.status,
+        table.c.task,
+        cast(table.c.input_context, Text),
+        cast(table.c.output, Text),
+        table.c.created_at,
+    ).order_by(table.c.id)
+    if user_id is not None:
+        q = q.where(table.c.user_id == user_id)
+    if since is not None:
+        q = q.where(table.c.created_at >= since)
+    if until is not None:
+        q = q.where(table.c.created_at < until)
+
+    with read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(q)
+        for rows in result.partitions():
+            yield _rows_to_batch(schema, rows)
+
+
+# ---------- encoding ----------
+
+class _ChunkSink:
+    """Minimal writable file that hands written bytes back to the generator."""
+
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.closed = False
+        self._pos = 0
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self.parts.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+
+def stream_export(batches: Iterator["pa.RecordBatch"], schema: "pa.Schema", fmt: str) -> Iterator[bytes]:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    _require_pyarrow()
+
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(out, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+        write = writer.write_batch
+
+    try:
+        for batch in batches:
+            if batch.num_rows:
+                write(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+from typing import Optional
+
+from api.core.config import settings
+
+
+class _BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RecentKeyFilter:
+    """
+    Probabilistic set of recently ingested idempotency keys.
+
+    might_contain() == False means "definitely new": the insert can go straight
+    to the DB. True means "maybe a retry" and the caller checks the unique index.
+    Two generations rotate once the current one reaches capacity, so memory
+    stays bounded and the false-positive rate doesn't creep up over time.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = _BloomFilter(capacity, error_rate)
+        self._previous: Optional[_BloomFilter] = None
+        self._lock = threading.Lock()
+
+    def might_contain(self, key: str) -> bool:
+        if key in self._current:
+            return True
+        previous = self._previous
+        return previous is not None and key in previous
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            if self._current.count >= self.capacity:
+                self._previous = self._current
+                self._current = _BloomFilter(self.capacity, self.error_rate)
+            self._current.add(key)
+
+
+def idempotency_key(device_id: str, message_id: Optional[str]) -> Optional[str]:
+    if not message_id:
+        return None
+    return f"{device_id}\x1f{message_id}"
+
+
+recent_keys = RecentKeyFilter(
+    capacity=settings.ingest_dedupe_capacity,
+    error_rate=settings.ingest_dedupe_error_rate,
+)
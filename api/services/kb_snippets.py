@@ -0,0 +1,87 @@
+"""
+KB sources of copilot runs, stored once in kb_snippets.
+
+run_copilot_task() used to copy every retrieval hit (title, source, snippet)
+into CopilotRun.output["sources"]; popular runbook snippets ended up stored
+once per run. Runs now keep references, {"id": <kb doc id>, "hash": <content
+hash>}, and the hit itself lives in kb_snippets keyed by that hash.
+
+List endpoints return the references as stored. hydrate_sources() turns them
+back into the original hits and is only called when a single run is returned.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from api.db.kb_models import KBSnippet
+
+
+def snippet_hash(hit: Dict[str, Any]) -> str:
+    # doc id is part of the key: the same text from two docs stays two sources
+    payload = json.dumps(
+        [hit.get("id"), hit.get("title"), hit.get("source"), hit.get("snippet")],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def is_reference(source: Any) -> bool:
+    return isinstance(source, dict) and "hash" in source and "snippet" not in source
+
+
+def store_sources(db: Session, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Upsert hits into kb_snippets (in db's transaction) and return their references."""
+    refs: List[Dict[str, Any]] = []
+    rows: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        h = snippet_hash(hit)
+        refs.append({"id": hit.get("id"), "hash": h})
+        rows[h] = {
+            "content_hash": h,
+            "doc_id": hit.get("id"),
+            "title": hit.get("title"),
+            "source": hit.get("source"),
+            "snippet": hit.get("snippet"),
+        }
+    if rows:
+        db.execute(
+            insert(KBSnippet).on_conflict_do_nothing(index_elements=["content_hash"]),
+            list(rows.values()),
+        )
+    return refs
+
+
+def hydrate_sources(db: Session, sources: Optional[List[Any]]) -> List[Any]:
+    """References -> full hits; inline (pre-compaction) hits and unknown hashes pass through."""
+    if not sources:
+        return sources or []
+    hashes = {s["hash"] for s in sources if is_reference(s)}
+    if not hashes:
+        return sources
+
+    found = {
+        row.content_hash: row
+        for row in db.execute(select(KBSnippet).where(KBSnippet.content_hash.in_(hashes))).scalars()
+    }
+    out: List[Any] = []
+    for s in sources:
+        row = found.get(s["hash"]) if is_reference(s) else None
+        if row is None:
+            out.append(s)
+        else:
+            out.append({"id": row.doc_id, "title": row.title, "source": row.source, "snippet": row.snippet})
+    return out
+
+
+def hydrate_output(db: Session, output: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    output = dict(output or {})
+    if "sources" in output:
+        output["sources"] = hydrate_sources(db, output["sources"])
+    return output
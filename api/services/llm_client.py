@@ -2,10 +2,18 @@
 from __future__ import annotations
 
 import os
+import time
+
 import requests
 
+from api.core.admission import load_shedder
+from api.core.metrics import LLM_FAILURES, LLM_LATENCY, LLM_TOKENS
+from api.core.profiling import current_profile
+
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434").rstrip("/")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
+# how long Ollama keeps the model resident after a call (its default, 5m, unloads it between bursts)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
 
 def call_llm(system: str, user: str, model: str | None = None, timeout: int = 60) -> str:
@@ -15,6 +23,7 @@ def call_llm(system: str, user: str, model: str | None = None, timeout: int = 60
     Env:
       - OLLAMA_URL (default http://localhost:11434)
       - OLLAMA_MODEL (default llama3.1)
+      - OLLAMA_KEEP_ALIVE (default 30m)
     """
     model_name = model or OLLAMA_MODEL
 
@@ -25,22 +34,73 @@ def call_llm(system: str, user: str, model: str | None = None, timeout: int = 60
             {"role": "user", "content": user},
         ],
         "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
         # Optional: to make JSON-only output more reliable
         "options": {
             "temperature": 0.2,
         },
     }
 
-    r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=timeout)
-    r.raise_for_status()
+    started = time.perf_counter()
+    try:
+        # counted while waiting on Ollama: the queue depth that sheds new copilot runs
+        with load_shedder.llm_call():
+            r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=timeout)
+        r.raise_for_status()
 
-    data = r.json()
+        data = r.json()
 
-    # Ollama returns: {"message": {"role": "assistant", "content": "..."}}
-    msg = data.get("message") or {}
-    content = msg.get("content")
+        # Ollama returns: {"message": {"role": "assistant", "content": "..."}}
+        msg = data.get("message") or {}
+        content = msg.get("content")
 
-    if not isinstance(content, str):
-        raise RuntimeError(f"Unexpected Ollama response format: {data}")
+        if not isinstance(content, str):
+            raise RuntimeError(f"Unexpected Ollama response format: {data}")
+    except Exception as e:
+        _observe(started, "error")
+        LLM_FAILURES.labels(_failure_reason(e)).inc()
+        raise
 
+    _observe(started, "ok")
+    # token counts as reported by Ollama (absent when the prompt was cached)
+    LLM_TOKENS.labels("prompt").inc(data.get("prompt_eval_count") or 0)
+    LLM_TOKENS.labels("completion").inc(data.get("eval_count") or 0)
     return content.strip()
+
+
+def preload_model(model: str | None = None, timeout: float = 300) -> None:
+    """Loads the model into Ollama's memory without generating (a request with no prompt)."""
+    payload = {"model": model or OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE}
+    r = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=timeout)
+    r.raise_for_status()
+
+
+def model_loaded(model: str | None = None, timeout: float = 2) -> bool:
+    """Whether Ollama currently holds the model in memory (/api/ps)."""
+    name = model or OLLAMA_MODEL
+    r = requests.get(f"{OLLAMA_URL}/api/ps", timeout=timeout)
+    r.raise_for_status()
+    for m in r.json().get("models") or []:
+        loaded = m.get("name") or m.get("model") or ""
+        # "llama3.1" is reported as "llama3.1:latest"
+        if loaded == name or loaded.split(":")[0] == name:
+            return True
+    return False
+
+
+def _observe(started: float, outcome: str) -> None:
+    elapsed = time.perf_counter() - started
+    LLM_LATENCY.labels(outcome).observe(elapsed)
+    profile = current_profile()
+    if profile is not None:
+        profile.add_llm_call(started, elapsed, outcome)
+
+
+def _failure_reason(e: Exception) -> str:
+    if isinstance(e, requests.Timeout):
+        return "timeout"
+    if isinstance(e, requests.ConnectionError):
+        return "connection"
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return f"http_{e.response.status_code}"
+    return "bad_response"
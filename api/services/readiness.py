@@ -0,0 +1,236 @@
+"""
+Startup warm-up and the GET /ready probe.
+
+A fresh instance is slow until its dependencies are warm: Ollama has to load the
+model, SQLite pages (hot indexes, the FTS index) are cold, the in-memory latest
+store is empty and the bcrypt pool has no processes yet. The lifespan runs
+Readiness.warm_up() in the background; until it finishes /ready answers 503, so
+a load balancer keeps the instance out of rotation while /health (liveness)
+already says ok.
+
+Once warm, /ready probes each dependency (cached for ready_cache_seconds) and
+answers 503 while any check listed in ready_required fails. The others are
+reported but don't gate traffic: the copilot degrades to rule-based output when
+the LLM is down, which beats taking every instance out at once.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from api.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CheckResult:
+    ready: bool
+    latency_ms: float
+    detail: Optional[str] = None
+
+
+async def _timed(fn: Callable[[], Awaitable[Optional[str]]], timeout: Optional[float]) -> CheckResult:
+    started = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(fn(), timeout)
+        ok = True
+    except asyncio.TimeoutError:
+        ok, detail = False, f"timed out after {timeout}s"
+    except Exception as e:
+        ok, detail = False, f"{type(e).__name__}: {e}"
+    return CheckResult(ok, round((time.perf_counter() - started) * 1000, 1), detail)
+
+
+def _read_engines():
+    from api.db.async_session import async_read_engine
+    from api.services.telemetry_shards import telemetry_shards
+
+    engines = [async_read_engine]
+    for shard in telemetry_shards.shards:
+        if all(shard.async_read_engine is not e for e in engines):
+            engines.append(shard.async_read_engine)
+    return engines
+
+
+# --- warm-up steps (each returns a short detail for the report) ---
+
+
+async def _warm_database() -> str:
+    from api.db.async_session import async_read_engine
+    from api.services.telemetry_shards import telemetry_shards
+
+    engines = _read_engines()
+    for engine in engines:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    # walk the indexes the hot routes use: copilot run history per user, recent events
+    async with async_read_engine.connect() as conn:
+        await conn.execute(text("SELECT user_id, MAX(id) FROM copilot_runs GROUP BY user_id"))
+    events = await telemetry_shards.list_events(None, 500, 0)
+    return f"{len(engines)} engine(s), {len(events)} recent events read"
+
+
+async def _warm_latest() -> str:
+    from api.routers.telemetry import prime_latest_store
+
+    added = await prime_latest_store(settings.warmup_latest_devices)
+    return f"{added} devices loaded"
+
+
+async def _warm_auth() -> str:
+    from api.core.security import password_hasher
+    from api.db.async_session import async_read_engine
+
+    # principals are cached per token, so there is nothing to preload; warm what a miss touches
+    async with async_read_engine.connect() as conn:
+        users = (await conn.execute(text("SELECT COUNT(email) FROM users"))).scalar()
+    await run_in_threadpool(password_hasher.warm_up)
+    return f"{users} users, {password_hasher.workers} bcrypt worker(s) started"
+
+
+async def _warm_kb() -> str:
+    from api.db.async_session import async_read_engine
+
+    async with async_read_engine.connect() as conn:
+        # the FTS5 index lives in the _data shadow table; reading it pulls every segment into cache
+        segments = (await conn.execute(text("SELECT COUNT(*), SUM(LENGTH(block)) FROM kb_docs_fts_data"))).first()
+        docs = (await conn.execute(text("SELECT COUNT(*) FROM kb_docs"))).scalar()
+    return f"{docs} docs, {segments[1] or 0} index bytes"
+
+
+async def _in_daemon_thread(fn: Callable[..., None], *args) -> None:
+    # loading a model can take minutes; a threadpool worker would hold up process exit until it returns
+    loop = asyncio.get_running_loop()
+    done: asyncio.Future = loop.create_future()
+
+    def settle(error: Optional[BaseException]) -> None:
+        if done.done():
+            return
+        if error is None:
+            done.set_result(None)
+        else:
+            done.set_exception(error)
+
+    def run() -> None:
+        error: Optional[BaseException] = None
+        try:
+            fn(*args)
+        except BaseException as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(settle, error)
+        except RuntimeError:
+            pass  # loop already closed (shutdown during warm-up)
+
+    threading.Thread(target=run, name="avops-warmup", daemon=True).start()
+    await done
+
+
+async def _warm_llm() -> str:
+    from api.services.llm_client import OLLAMA_MODEL, preload_model
+
+    await _in_daemon_thread(preload_model, None, settings.warmup_llm_timeout_seconds)
+    return f"{OLLAMA_MODEL} loaded"
+
+
+WARMUP_STEPS: Sequence[Tuple[str, Callable[[], Awaitable[str]]]] = (
+    ("database", _warm_database),
+    ("latest", _warm_latest),
+    ("auth", _warm_auth),
+    ("kb", _warm_kb),
+    ("llm", _warm_llm),
+)
+
+
+# --- live probes for /ready ---
+
+
+async def _probe_database() -> Optional[str]:
+    for engine in _read_engines():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    return None
+
+
+async def _probe_kb() -> Optional[str]:
+    from api.db.async_session import async_read_engine
+
+    async with async_read_engine.connect() as conn:
+        await conn.execute(text("SELECT rowid FROM kb_docs_fts LIMIT 1"))
+    return None
+
+
+async def _probe_llm() -> Optional[str]:
+    from api.services.llm_client import OLLAMA_MODEL, model_loaded
+
+    if not await run_in_threadpool(model_loaded, None, settings.ready_probe_timeout_seconds):
+        raise RuntimeError(f"{OLLAMA_MODEL} is not loaded")
+    return None
+
+
+PROBES: Dict[str, Callable[[], Awaitable[Optional[str]]]] = {
+    "database": _probe_database,
+    "kb": _probe_kb,
+    "llm": _probe_llm,
+}
+
+
+class Readiness:
+    def __init__(self, required: List[str], cache_seconds: float, probe_timeout: float) -> None:
+        self.required = set(required)
+        self.cache_seconds = cache_seconds
+        self.probe_timeout = probe_timeout
+        self.warm = False
+        self.warmup: Dict[str, CheckResult] = {}
+        self._probed: Optional[Tuple[float, Dict[str, CheckResult]]] = None
+
+    def skip_warm_up(self) -> None:
+        self.warm = True
+
+    async def warm_up(self) -> None:
+        """Runs every step in order; a failed step is recorded, it doesn't stop the others."""
+        started = time.perf_counter()
+        for name, step in WARMUP_STEPS:
+            self.warmup[name] = result = await _timed(step, None)
+            log = logger.info if result.ready else logger.warning
+            log("warm-up %s: %s (%.0f ms)", name, result.detail, result.latency_ms)
+        self.warm = True
+        logger.info("warm-up finished in %.1f s", time.perf_counter() - started)
+
+    async def probe(self) -> Dict[str, CheckResult]:
+        # concurrent callers inside the same window may both probe; the probes are cheap
+        if self._probed is not None and time.monotonic() - self._probed[0] < self.cache_seconds:
+            return self._probed[1]
+        names = list(PROBES)
+        results = await asyncio.gather(*(_timed(PROBES[n], self.probe_timeout) for n in names))
+        checks = dict(zip(names, results))
+        self._probed = (time.monotonic(), checks)
+        return checks
+
+    async def report(self) -> Tuple[bool, dict]:
+        body: dict = {"warmup": {name: asdict(r) for name, r in self.warmup.items()}}
+        if not self.warm:
+            body["status"] = "warming"
+            return False, body
+        checks = await self.probe()
+        ready = all(checks[name].ready for name in self.required if name in checks)
+        body["status"] = "ready" if ready else "not_ready"
+        body["checks"] = {
+            name: {**asdict(result), "required": name in self.required} for name, result in checks.items()
+        }
+        return ready, body
+
+
+readiness = Readiness(
+    required=settings.ready_required,
+    cache_seconds=settings.ready_cache_seconds,
+    probe_timeout=settings.ready_probe_timeout_seconds,
+)
@@ -2,11 +2,14 @@
 from __future__ import annotations
 
 import re
+import time
 from typing import List, Dict, Any
 
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from api.core.metrics import KB_HITS, KB_LATENCY
+
 
 _WORD_RE = re.compile(r"[A-Za-z0-9_]+")
 
@@ -42,11 +45,14 @@ def retrieve_kb(db: Session, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """
     )
 
+    started = time.perf_counter()
     try:
         rows = db.execute(sql, {"q": fts_q, "k": int(k)}).fetchall()
     except Exception:
         # If FTS table isn't created yet or query fails, don't crash the whole copilot
         return []
+    KB_LATENCY.observe(time.perf_counter() - started)
+    KB_HITS.observe(len(rows))
 
     return [
         {"id": r[0], "title": r[1], "source": r[2], "snippet": r[3]}
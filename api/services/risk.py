@@ -1,7 +1,24 @@
+import logging
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Sequence, Tuple
 
+import numpy as np
+
+from api.core.metrics import RISK_SCORED
 from api.schemas.telemetry import TelemetryPayload, RiskResponse
+from api.services.risk_model import risk_models
+
+logger = logging.getLogger(__name__)
+
+_NORMAL = "Device operating within normal parameters"
+_MODEL_ONLY = "No threshold exceeded; risk predicted from recent device history"
+# (weight, reason) per rule, in the order compute_risk adds them; bit i of a row's mask = rule i fired
+_RULES = (
+    (0.4, "High device temperature"),
+    (0.3, "Elevated packet loss"),
+    (0.2, "Frequent audio dropouts"),
+)
+_ERROR_WEIGHT = 0.1
 
 
 def compute_risk(payload: TelemetryPayload) -> RiskResponse:
@@ -29,6 +46,83 @@ def compute_risk(payload: TelemetryPayload) -> RiskResponse:
     return RiskResponse(
         device_id=payload.device_id,
         risk_score=round(risk_score, 2),
-        reason=", ".join(reasons) if reasons else "Device operating within normal parameters",
+        reason=", ".join(reasons) if reasons else _NORMAL,
         timestamp=datetime.utcnow().isoformat(),
     )
+
+
+def _rule_reasons() -> List[List[str]]:
+    return [[reason for bit, (_, reason) in enumerate(_RULES) if mask >> bit & 1] for mask in range(1 << len(_RULES))]
+
+
+_MASK_REASONS = _rule_reasons()
+
+
+def rule_scores(
+    temperature: np.ndarray, packet_loss: np.ndarray, audio_dropouts: np.ndarray, has_error: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """compute_risk's scores over arrays, plus a bitmask of the _RULES that fired per row."""
+    fired = (temperature > 70, packet_loss > 5, audio_dropouts > 3)
+    # summed rule by rule in compute_risk's order so the floats round identically
+    score = np.zeros(len(temperature))
+    mask = np.zeros(len(temperature), dtype=np.int64)
+    for bit, (hit, (weight, _)) in enumerate(zip(fired, _RULES)):
+        score = np.where(hit, score + weight, score)
+        mask |= hit.astype(np.int64) << bit
+    score = np.where(has_error, score + _ERROR_WEIGHT, score)
+    return np.round(np.minimum(score, 1.0), 2), mask
+
+
+def compute_risk_batch(payloads: Sequence[TelemetryPayload]) -> List[Dict]:
+    """
+    compute_risk over many payloads in one numpy pass; same scores and reasons,
+    as plain dicts (the caller encodes them without building RiskResponse models).
+    """
+    n = len(payloads)
+    score, mask = rule_scores(
+        np.fromiter((p.temperature for p in payloads), dtype=np.float64, count=n),
+        np.fromiter((p.packet_loss for p in payloads), dtype=np.float64, count=n),
+        np.fromiter((p.audio_dropouts for p in payloads), dtype=np.int64, count=n),
+        np.fromiter((bool(p.error_code) for p in payloads), dtype=bool, count=n),
+    )
+
+    timestamp = datetime.utcnow().isoformat()
+    out = []
+    for payload, row_score, row_mask in zip(payloads, score.tolist(), mask.tolist()):
+        reasons = _MASK_REASONS[row_mask]
+        if payload.error_code:
+            reasons = reasons + [f"Error code reported: {payload.error_code}"]
+        out.append({
+            "device_id": payload.device_id,
+            "risk_score": row_score,
+            "reason": ", ".join(reasons) if reasons else _NORMAL,
+            "timestamp": timestamp,
+            "model": "rules",
+        })
+    return out
+
+
+async def score_risk_batch(payloads: Sequence[TelemetryPayload]) -> List[Dict]:
+    """
+    Scores with the current learned model (api/services/risk_model.py) when one
+    is loaded, otherwise with the threshold rules. Reasons always list the
+    thresholds the reading exceeds; a model failure falls back to the rules.
+    """
+    results = compute_risk_batch(payloads)
+    model = risk_models.current
+    if model is None:
+        RISK_SCORED.labels("rules").inc(len(payloads))
+        return results
+    try:
+        probabilities = await model.predict_payloads(payloads)
+    except Exception:
+        logger.exception("risk model %s failed, scoring with threshold rules", model.version)
+        RISK_SCORED.labels("rules").inc(len(payloads))
+        return results
+    RISK_SCORED.labels("model").inc(len(payloads))
+    for result, probability in zip(results, probabilities.tolist()):
+        result["risk_score"] = round(probability, 2)
+        result["model"] = model.version
+        if result["reason"] == _NORMAL:
+            result["reason"] = _MODEL_ONLY
+    return results
@@ -0,0 +1,305 @@
+"""
+Learned risk model: features, versioned artifacts on disk and hot reload.
+
+scripts/train_risk_model.py fits a classifier on telemetry_events history (live
+shards and archive). For every stored reading, feature_matrix() describes the
+reading and the device's previous `window` readings (rolling means/maxima,
+error-code frequencies, time since the last reading), and the label says
+whether the device had an incident (an error code, packet loss > 5 or audio
+dropouts > 3) within the following horizon_minutes. Readings whose horizon runs
+past the device's last reading are left out: their outcome isn't known yet.
+
+/predict/risk builds the same features: the payload is the current reading and
+the history is the device's newest `window` stored readings, fetched for the
+whole micro-batch at once. risk_score is the predicted incident probability.
+
+Artifacts
+---------
+    <risk_model_dir>/
+        manifest.json      {"current": "v0003", "versions": [...]}, metadata per version
+        v0003.pkl          the pickled estimator
+
+publish() writes the artifact, then the manifest (write-then-rename). Each
+process loads the current version once and re-reads the manifest when its
+mtime changes (every risk_model_reload_seconds), swapping in the new current
+version. Editing "current" back rolls back; "current": null returns to the
+threshold rules. A version whose feature list differs from FEATURES is refused
+and the loaded one kept. Artifacts are pickles, so only whoever trains should be
+able to write the directory.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from api.core.config import settings
+from api.schemas.telemetry import TelemetryPayload
+from api.services.telemetry_shards import TelemetryRecord, telemetry_shards
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+NO_ERROR = -1
+_EPOCH = datetime(1970, 1, 1)
+
+FEATURES = (
+    "temperature",
+    "packet_loss",
+    "audio_dropouts",
+    "has_error",
+    "history_len",
+    "minutes_since_last",
+    "temperature_mean",
+    "temperature_max",
+    "temperature_delta",
+    "packet_loss_mean",
+    "packet_loss_max",
+    "audio_dropouts_mean",
+    "audio_dropouts_max",
+    "error_rate",
+    "same_error_rate",
+    "distinct_errors",
+)
+_SERIES = ("temperature", "packet_loss", "audio_dropouts", "error_code", "minutes")
+
+
+def minutes(ts: datetime) -> float:
+    return (ts - _EPOCH).total_seconds() / 60
+
+
+# ---------- features and labels (shared by training and inference) ----------
+
+
+def feature_matrix(current: Mapping[str, np.ndarray], history: Mapping[str, np.ndarray]) -> np.ndarray:
+    """
+    One row of FEATURES per reading.
+
+    current: (n,) arrays of temperature, packet_loss, audio_dropouts, error_code
+    (integer ids, NO_ERROR for none; only compared with each other, so any
+    mapping consistent within the call works) and minutes (reading time).
+    history: the same keys as (n, window) arrays, oldest to newest and
+    right-aligned, plus `valid` marking the columns that hold a reading.
+    History aggregates are NaN for a device's first reading.
+    """
+    valid = history["valid"]
+    count = valid.sum(axis=1)
+    seen = count > 0
+
+    def mean(values: np.ndarray) -> np.ndarray:
+        total = np.where(valid, values, 0.0).sum(axis=1)
+        return np.divide(total, count, out=np.full(len(count), np.nan), where=seen)
+
+    def maximum(values: np.ndarray) -> np.ndarray:
+        return np.where(seen, np.where(valid, values, -np.inf).max(axis=1), np.nan)
+
+    codes = np.where(valid, history["error_code"], NO_ERROR)
+    errors = codes != NO_ERROR
+    same = errors & (codes == current["error_code"][:, None])
+    ordered = np.sort(codes, axis=1)
+    # sorted, NO_ERROR first: count the first error and every change to a new code after it
+    starts = (ordered[:, 1:] != ordered[:, :-1]) & (ordered[:, 1:] != NO_ERROR)
+    distinct = (ordered[:, 0] != NO_ERROR) + starts.sum(axis=1)
+
+    temperature_mean = mean(history["temperature"])
+    columns = {
+        "temperature": current["temperature"],
+        "packet_loss": current["packet_loss"],
+        "audio_dropouts": current["audio_dropouts"],
+        "has_error": current["error_code"] != NO_ERROR,
+        "history_len": count,
+        # windows are right-aligned, so the last column is the newest reading
+        "minutes_since_last": np.where(seen, current["minutes"] - history["minutes"][:, -1], np.nan),
+        "temperature_mean": temperature_mean,
+        "temperature_max": maximum(history["temperature"]),
+        "temperature_delta": current["temperature"] - temperature_mean,
+        "packet_loss_mean": mean(history["packet_loss"]),
+        "packet_loss_max": maximum(history["packet_loss"]),
+        "audio_dropouts_mean": mean(history["audio_dropouts"]),
+        "audio_dropouts_max": maximum(history["audio_dropouts"]),
+        "error_rate": mean(errors),
+        "same_error_rate": mean(same),
+        "distinct_errors": np.where(seen, distinct, np.nan),
+    }
+    return np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURES])
+
+
+def history_windows(series: Mapping[str, np.ndarray], window: int) -> Dict[str, np.ndarray]:
+    """
+    For one device's readings in time order, each reading's previous `window`
+    readings as feature_matrix() history (row i holds readings i-window .. i-1).
+    """
+    n = len(series["minutes"])
+    out: Dict[str, np.ndarray] = {}
+    for key in _SERIES:
+        values = np.asarray(series[key], dtype=np.int64 if key == "error_code" else np.float64)
+        fill = NO_ERROR if key == "error_code" else 0
+        padded = np.concatenate([np.full(window, fill, dtype=values.dtype), values])
+        out[key] = np.lib.stride_tricks.sliding_window_view(padded, window)[:n]
+    padded_valid = np.concatenate([np.zeros(window, dtype=bool), np.ones(n, dtype=bool)])
+    out["valid"] = np.lib.stride_tricks.sliding_window_view(padded_valid, window)[:n]
+    return out
+
+
+def incidents(packet_loss: np.ndarray, audio_dropouts: np.ndarray, error_code: np.ndarray) -> np.ndarray:
+    return (error_code != NO_ERROR) | (packet_loss > 5) | (audio_dropouts > 3)
+
+
+def incident_labels(
+    reading_minutes: np.ndarray, incident: np.ndarray, horizon_minutes: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For one device's readings in time order: (label, known). label[i] is True
+    when a later reading within horizon_minutes is an incident; known[i] is
+    False when the horizon runs past the last reading.
+    """
+    seen = np.concatenate([[0], np.cumsum(incident)])
+    # index one past the last reading inside (t, t + horizon]
+    end = np.searchsorted(reading_minutes, reading_minutes + horizon_minutes, side="right")
+    label = seen[end] - seen[np.arange(len(incident)) + 1] > 0
+    known = reading_minutes + horizon_minutes <= reading_minutes[-1]
+    return label, known
+
+
+def _inference_features(
+    payloads: Sequence[TelemetryPayload], recent: Mapping[str, List[TelemetryRecord]], window: int, now: datetime
+) -> np.ndarray:
+    n = len(payloads)
+    vocab: Dict[str, int] = {}
+
+    def code(error_code: Optional[str]) -> int:
+        return vocab.setdefault(error_code, len(vocab)) if error_code else NO_ERROR
+
+    history = {key: np.zeros((n, window)) for key in _SERIES if key != "error_code"}
+    history["error_code"] = np.full((n, window), NO_ERROR, dtype=np.int64)
+    history["valid"] = np.zeros((n, window), dtype=bool)
+    for i, payload in enumerate(payloads):
+        records = recent.get(payload.device_id, [])
+        # a reading that was ingested before being scored isn't its own history
+        if records and payload.idempotency_id() and records[0].message_id == payload.idempotency_id():
+            records = records[1:]
+        for j, record in enumerate(records[:window]):
+            col = window - 1 - j  # newest first -> right-aligned
+            history["temperature"][i, col] = record.temperature
+            history["packet_loss"][i, col] = record.packet_loss
+            history["audio_dropouts"][i, col] = record.audio_dropouts
+            history["error_code"][i, col] = code(record.error_code)
+            history["minutes"][i, col] = minutes(record.created_at)
+            history["valid"][i, col] = True
+
+    current = {
+        # stored readings are truncated to int on ingest (telemetry_codec); match what training saw
+        "temperature": np.trunc([p.temperature for p in payloads]),
+        "packet_loss": np.trunc([p.packet_loss for p in payloads]),
+        "audio_dropouts": np.array([p.audio_dropouts for p in payloads], dtype=np.float64),
+        "error_code": np.array([code(p.error_code) for p in payloads], dtype=np.int64),
+        "minutes": np.full(n, minutes(now)),
+    }
+    return feature_matrix(current, history)
+
+
+# ---------- artifacts ----------
+
+
+@dataclass
+class LoadedModel:
+    version: str
+    window: int
+    horizon_minutes: float
+    estimator: Any
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Incident probability per row."""
+        return self.estimator.predict_proba(features)[:, 1]
+
+    async def predict_payloads(self, payloads: Sequence[TelemetryPayload]) -> np.ndarray:
+        # one extra row in case the newest stored reading is the payload itself
+        recent = await telemetry_shards.recent_for_devices([p.device_id for p in payloads], self.window + 1)
+        features = _inference_features(payloads, recent, self.window, datetime.utcnow())
+        # tree ensembles release the GIL but still take milliseconds per batch: keep them off the loop
+        return await run_in_threadpool(self.predict, features)
+
+
+class RiskModelStore:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.current: Optional[LoadedModel] = None
+        self._manifest_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def manifest(self) -> dict:
+        try:
+            with open(self._path(MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"current": None, "versions": []}
+
+    def _write(self, name: str, data: bytes) -> None:
+        tmp = self._path(name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+
+    def publish(self, estimator: Any, meta: Dict[str, Any]) -> str:
+        """Stores a new version and makes it current; running processes pick it up on their next check."""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            manifest = self.manifest()
+            number = 1 + max((int(v["version"][1:]) for v in manifest["versions"]), default=0)
+            version = f"v{number:04d}"
+            self._write(f"{version}.pkl", pickle.dumps(estimator, protocol=pickle.HIGHEST_PROTOCOL))
+            manifest["versions"].append({
+                "version": version,
+                "file": f"{version}.pkl",
+                "created_at": datetime.utcnow().isoformat(),
+                "features": list(FEATURES),
+                **meta,
+            })
+            manifest["current"] = version
+            self._write(MANIFEST, json.dumps(manifest, indent=1).encode("utf-8"))
+        return version
+
+    def refresh(self) -> Optional[str]:
+        """Loads the manifest's current version if the manifest changed; returns the version in use."""
+        try:
+            mtime = os.stat(self._path(MANIFEST)).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return self.current.version if self.current else None
+        with self._lock:
+            manifest = self.manifest()
+            target = manifest.get("current")
+            loaded = self.current
+            if target is None:
+                if loaded is not None:
+                    logger.info("risk model %s unloaded, scoring with threshold rules", loaded.version)
+                self.current = None
+            elif loaded is None or loaded.version != target:
+                meta = next((v for v in manifest["versions"] if v["version"] == target), None)
+                if meta is None:
+                    logger.error("risk model %s is not in %s", target, self._path(MANIFEST))
+                elif tuple(meta["features"]) != FEATURES:
+                    logger.error("risk model %s was trained on other features, keeping the loaded one", target)
+                else:
+                    # a failed load raises before the mtime is recorded, so the next check retries
+                    with open(self._path(meta["file"]), "rb") as f:
+                        estimator = pickle.load(f)
+                    self.current = LoadedModel(target, int(meta["window"]), float(meta["horizon_minutes"]), estimator)
+                    logger.info("risk model %s loaded (window %d)", target, self.current.window)
+            self._manifest_mtime = mtime
+        return self.current.version if self.current else None
+
+
+risk_models = RiskModelStore(settings.risk_model_dir)
@@ -0,0 +1,409 @@
+"""
+Time-partitioned retention for telemetry_events.
+
+Events are bucketed into partitions by created_at (a UTC day, or an ISO week
+starting Monday). The live database (every shard) holds the hot partitions;
+once a partition is entirely older than telemetry_hot_days it is compacted into
+one compressed columnar file and deleted from the live tables:
+
+    <telemetry_archive_dir>/
+        manifest.json                  one entry per archived partition
+        2026-10-12_7d.avc              per-device chunks (see telemetry_chunks)
+
+Partitions archived before the chunk format are .npz files (np.savez_compressed,
+one array per column, device_id/error_code dictionary encoded) and are still
+read; re-archiving a partition rewrites it as a chunk file. Chunk files are
+scanned chunk by chunk, skipping chunks whose device, time or id range can't
+match.
+
+Everything below the archive watermark (end of the newest archived partition)
+lives only in the archive, so range reads prune by since/until: the live query
+is skipped when until <= watermark, and only archive files whose partition
+overlaps [since, until) are opened.
+
+Archived events keep the id they had when archived; they lose the unique
+(device_id, message_id) index, so retries older than the hot window are no
+longer deduplicated.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from api.core.config import settings
+from api.services.telemetry_chunks import ChunkFile, ChunkHeader, encode_chunk_file
+from api.services.telemetry_shards import ShardRouter, TelemetryRecord
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+_EPOCH = datetime(1970, 1, 1)
+_DECODED_CACHE_SIZE = 8
+
+
+def naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """created_at is stored as naive UTC; aware query bounds are converted to match."""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def partition_bounds(ts: datetime, granularity: str) -> tuple[datetime, datetime]:
+    start = datetime(ts.year, ts.month, ts.day)
+    if granularity == "week":
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7)
+    if granularity != "day":
+        raise ValueError(f"Unknown telemetry partition granularity: {granularity}")
+    return start, start + timedelta(days=1)
+
+
+def _to_micros(values: Sequence[datetime]) -> np.ndarray:
+    return np.array([(v - _EPOCH) // timedelta(microseconds=1) for v in values], dtype=np.int64)
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+@dataclass
+class ArchivePartition:
+    start: datetime
+    end: datetime
+    file: str
+    rows: int
+    id_min: int
+    id_max: int
+
+    def overlaps(self, since: Optional[datetime], until: Optional[datetime]) -> bool:
+        return (since is None or self.end > since) and (until is None or self.start < until)
+
+    def to_json(self) -> dict:
+        d = asdict(self)
+        d["start"], d["end"] = self.start.isoformat(), self.end.isoformat()
+        return d
+
+    @classmethod
+    def from_json(cls, d: dict) -> "ArchivePartition":
+        return cls(**{**d, "start": datetime.fromisoformat(d["start"]), "end": datetime.fromisoformat(d["end"])})
+
+
+class ArchiveColumns:
+    """One decoded partition: NumPy columns sorted newest first."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        order = np.lexsort((arrays["id"], arrays["created_at"]))[::-1]
+        self.id = arrays["id"][order]
+        self.created_at = arrays["created_at"][order]
+        self.device_codes = arrays["device_code"][order]
+        self.devices = arrays["devices"]
+        self.temperature = arrays["temperature"][order]
+        self.packet_loss = arrays["packet_loss"][order]
+        self.audio_dropouts = arrays["audio_dropouts"][order]
+        self.error_codes = arrays["error_code"][order]
+        self.errors = arrays["errors"]
+        self.message_id = arrays["message_id"][order]
+
+    def mask(self, device_id: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> np.ndarray:
+        m = np.ones(len(self.id), dtype=bool)
+        if device_id is not None:
+            hits = np.flatnonzero(self.devices == device_id)
+            if not len(hits):
+                return np.zeros(len(self.id), dtype=bool)
+            m &= self.device_codes == hits[0]
+        if since is not None:
+            m &= self.created_at >= _to_micros([since])[0]
+        if until is not None:
+            m &= self.created_at < _to_micros([until])[0]
+        return m
+
+    def record(self, i: int) -> TelemetryRecord:
+        err = int(self.error_codes[i])
+        return TelemetryRecord(
+            id=int(self.id[i]),
+            device_id=str(self.devices[self.device_codes[i]]),
+            temperature=int(self.temperature[i]),
+            packet_loss=int(self.packet_loss[i]),
+            audio_dropouts=int(self.audio_dropouts[i]),
+            error_code=None if err < 0 else str(self.errors[err]),
+            message_id=str(self.message_id[i]) or None,
+            created_at=_from_micros(self.created_at[i]),
+        )
+
+
+class TelemetryArchive:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._decoded: "OrderedDict[str, ArchiveColumns]" = OrderedDict()
+        self._manifest_mtime: Optional[float] = None
+        self._partitions: List[ArchivePartition] = []
+        self._refresh()
+
+    # ---------- manifest ----------
+
+    def _load_manifest(self) -> List[ArchivePartition]:
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return sorted((ArchivePartition.from_json(d) for d in json.load(f)), key=lambda p: p.start)
+
+    def _save_manifest(self, partitions: List[ArchivePartition]) -> None:
+        # write-then-rename so readers never see a half-written manifest
+        tmp = os.path.join(self.root, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([p.to_json() for p in partitions], f, indent=1)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+        self._partitions = partitions
+        self._manifest_mtime = os.stat(os.path.join(self.root, MANIFEST)).st_mtime
+
+    def _refresh(self) -> None:
+        # another worker (or the cron script) may have archived since we last looked
+        try:
+            mtime = os.stat(os.path.join(self.root, MANIFEST)).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            self._partitions = self._load_manifest()
+            self._manifest_mtime = mtime
+            self._decoded.clear()
+
+    @property
+    def partitions(self) -> List[ArchivePartition]:
+        self._refresh()
+        return list(self._partitions)
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """Everything created before this lives only in the archive."""
+        partitions = self.partitions
+        return partitions[-1].end if partitions else None
+
+    @property
+    def max_id(self) -> int:
+        """Highest archived event id (0 when nothing is archived)."""
+        return max((p.id_max for p in self.partitions), default=0)
+
+    def prune(self, since: Optional[datetime], until: Optional[datetime]) -> List[ArchivePartition]:
+        return [p for p in self.partitions if p.overlaps(since, until)]
+
+    # ---------- files ----------
+
+    def _open(self, partition: ArchivePartition) -> Union[ArchiveColumns, ChunkFile]:
+        with self._lock:
+            cached = self._decoded.get(partition.file)
+            if cached is not None:
+                self._decoded.move_to_end(partition.file)
+                return cached
+        path = os.path.join(self.root, partition.file)
+        if partition.file.endswith(".npz"):
+            with np.load(path) as npz:
+                opened: Union[ArchiveColumns, ChunkFile] = ArchiveColumns({k: npz[k] for k in npz.files})
+        else:
+            opened = ChunkFile.open(path)
+        with self._lock:
+            self._decoded[partition.file] = opened
+            while len(self._decoded) > _DECODED_CACHE_SIZE:
+                self._decoded.popitem(last=False)
+        return opened
+
+    def partition_columns(
+        self,
+        partition: ArchivePartition,
+        device_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        header_filter: Optional[Callable[[ChunkHeader], bool]] = None,
+    ) -> ArchiveColumns:
+        """Decoded columns of one partition; chunk files only decode chunks that can match."""
+        opened = self._open(partition)
+        if isinstance(opened, ArchiveColumns):
+            return opened
+        return ArchiveColumns(opened.scan(
+            device_id,
+            None if since is None else int(_to_micros([since])[0]),
+            None if until is None else int(_to_micros([until])[0]),
+            header_filter,
+        ))
+
+    def write_partition(self, start: datetime, end: datetime, rows: List[TelemetryRecord]) -> ArchivePartition:
+        """Writes (or extends) the file for one partition and records it in the manifest."""
+        os.makedirs(self.root, exist_ok=True)
+        stem = f"{start.date().isoformat()}_{(end - start).days}d"
+        name = stem + ".avc"
+
+        existing = next((p for p in self.partitions if p.file.rsplit(".", 1)[0] == stem), None)
+        if existing is not None:
+            # a previous run archived this partition but died before deleting the live rows
+            cols = self.partition_columns(existing)
+            seen = {r.id for r in rows}
+            rows = rows + [cols.record(i) for i in range(len(cols.id)) if int(cols.id[i]) not in seen]
+
+        ids = np.array([r.id for r in rows], dtype=np.int64)
+        blob = encode_chunk_file(
+            [r.device_id for r in rows],
+            _to_micros([r.created_at for r in rows]),
+            ids,
+            {
+                "temperature": np.array([r.temperature for r in rows], dtype=np.int32),
+                "packet_loss": np.array([r.packet_loss for r in rows], dtype=np.int32),
+                "audio_dropouts": np.array([r.audio_dropouts for r in rows], dtype=np.int32),
+            },
+            [r.error_code for r in rows],
+            [r.message_id for r in rows],
+        )
+        tmp = os.path.join(self.root, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, os.path.join(self.root, name))
+
+        replaced = {name} | ({existing.file} if existing else set())
+        partition = ArchivePartition(start, end, name, len(rows), int(ids.min()), int(ids.max()))
+        with self._lock:
+            for file in replaced:
+                self._decoded.pop(file, None)
+            others = [p for p in self._partitions if p.file not in replaced]
+            self._save_manifest(sorted(others + [partition], key=lambda p: p.start))
+        # an older .npz copy of the partition is superseded by the chunk file
+        for file in replaced - {name}:
+            os.remove(os.path.join(self.root, file))
+        return partition
+
+    def drop_before(self, cutoff: datetime) -> int:
+        """Deletes archive partitions that end at or before cutoff."""
+        self._refresh()
+        with self._lock:
+            expired = [p for p in self._partitions if p.end <= cutoff]
+            if not expired:
+                return 0
+            self._save_manifest([p for p in self._partitions if p.end > cutoff])
+            for p in expired:
+                self._decoded.pop(p.file, None)
+        for p in expired:
+            try:
+                os.remove(os.path.join(self.root, p.file))
+            except FileNotFoundError:
+                pass
+        return len(expired)
+
+    # ---------- reads ----------
+
+    def query(
+        self,
+        device_id: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        limit: int,
+    ) -> List[TelemetryRecord]:
+        """Newest first, at most `limit` rows, opening only partitions that overlap the range."""
+        out: List[TelemetryRecord] = []
+        for partition in reversed(self.prune(since, until)):
+            cols = self.partition_columns(partition, device_id, since, until)
+            for i in np.flatnonzero(cols.mask(device_id, since, until))[: limit - len(out)]:
+                out.append(cols.record(int(i)))
+            if len(out) >= limit:
+                break
+        return out
+
+    def get(self, event_id: int) -> Optional[TelemetryRecord]:
+        for partition in self.partitions:
+            if partition.id_min <= event_id <= partition.id_max:
+                cols = self.partition_columns(partition, header_filter=lambda h: h.id_min <= event_id <= h.id_max)
+                hits = np.flatnonzero(cols.id == event_id)
+                if len(hits):
+                    return cols.record(int(hits[0]))
+        return None
+
+
+async def read_events(
+    router: ShardRouter,
+    archive: TelemetryArchive,
+    device_id: Optional[str],
+    limit: int,
+    offset: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[TelemetryRecord]:
+    """
+    Newest first across live shards and archive. Archived rows are all older than
+    live ones, so the result is live rows followed by archived rows; since/until
+    decide which of the two (and which archive files) are read at all.
+    """
+    cold = archive.prune(since, until)
+    if not cold:
+        return await router.list_events(device_id, limit, offset, since, until)
+
+    want = offset + limit
+    watermark = cold[-1].end
+    rows: List[TelemetryRecord] = []
+    if until is None or until > watermark:
+        rows = await router.list_events(device_id, want, 0, since, until)
+    if len(rows) < want:
+        rows += await run_in_threadpool(archive.query, device_id, since, until, want - len(rows))
+    return rows[offset:want]
+
+
+async def read_event(router: ShardRouter, archive: TelemetryArchive, event_id: int) -> Optional[TelemetryRecord]:
+    row = await router.get_event(event_id)
+    if row is None:
+        row = await run_in_threadpool(archive.get, event_id)
+    return row
+
+
+def archive_due_partitions(
+    router: ShardRouter,
+    archive: TelemetryArchive,
+    now: Optional[datetime] = None,
+    hot_days: Optional[int] = None,
+    granularity: Optional[str] = None,
+) -> List[ArchivePartition]:
+    """
+    Moves every live partition that ends before the hot window into the archive,
+    oldest first: read from all shards, write the file, then delete the live rows.
+    """
+    now = now or datetime.utcnow()
+    hot_days = settings.telemetry_hot_days if hot_days is None else hot_days
+    granularity = granularity or settings.telemetry_partition
+    cutoff, _ = partition_bounds(now - timedelta(days=hot_days), granularity)
+
+    archived: List[ArchivePartition] = []
+    while True:
+        oldest = router.oldest_created_at()
+        if oldest is None:
+            break
+        start, end = partition_bounds(oldest, granularity)
+        if end > cutoff:
+            break
+
+        rows = router.rows_between(start, end)
+        partition = archive.write_partition(start, end, rows)
+        router.delete_before(end)
+        logger.info("archived telemetry partition %s (%d events)", partition.file, len(rows))
+        archived.append(partition)
+
+    return archived
+
+
+def apply_retention(router: ShardRouter, archive: TelemetryArchive, now: Optional[datetime] = None) -> dict:
+    """Archive due partitions, then drop archives past telemetry_archive_retention_days."""
+    now = now or datetime.utcnow()
+    archived = archive_due_partitions(router, archive, now) if settings.telemetry_hot_days > 0 else []
+    dropped = 0
+    if settings.telemetry_archive_retention_days > 0:
+        dropped = archive.drop_before(now - timedelta(days=settings.telemetry_archive_retention_days))
+    return {"archived": [p.file for p in archived], "dropped": dropped}
+
+
+telemetry_archive = TelemetryArchive(settings.telemetry_archive_dir)
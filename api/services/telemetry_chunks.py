@@ -0,0 +1,515 @@
+"""
+Columnar per-device chunk encoding for sealed telemetry history.
+
+A chunk holds up to CHUNK_ROWS readings of one device, oldest first. Every
+column is encoded on its own; integers go through zigzag + LEB128 varints.
+
+    header  <BBHIqqqqiiiiii  version, flags, len(device_id), n,
+                             created_at min/max (us), id min/max,
+                             temperature/packet_loss/audio_dropouts min/max
+            device_id        utf-8
+            <7I              byte length of each section below
+    created_at               delta-of-delta: t0, t1 - t0, then (t[i] - t[i-1]) - (t[i-1] - t[i-2])
+    id                       delta: id0, then id[i] - id[i-1]
+    temperature              delta, as id (the same for packet_loss and audio_dropouts)
+    packet_loss
+    audio_dropouts
+    error_code               dictionary (u8 count, then u8 length + utf-8 per code) followed by
+                             run-length pairs (code, run); code 0 = no error, k = table[k - 1]
+    message_id               FLAG_NUMERIC_MESSAGE_IDS: delta-encoded integers, with
+                             FLAG_SEQ_MESSAGE_IDS the integers of "seq:<n>" keys;
+                             otherwise varint (length + 1, 0 = none) per row, then the utf-8 bytes
+
+Regular reporting intervals make delta-of-delta timestamps mostly zero (one
+byte), and slowly drifting metrics make deltas small. Metrics are integers in
+this schema, so Gorilla-style XOR float encoding is not needed.
+
+The headers carry min/max so a scan can skip chunks by time range or by metric
+bounds without decoding them. A chunk file stores chunks back to back, then a
+JSON index (device, offset, length, n, time and id ranges) and a trailer:
+
+    b"AVC1" chunk* index_json <Q index_offset> b"AVC1"
+
+decode_chunk and ChunkFile.scan return NumPy arrays.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from api.schemas.telemetry import SEQ_ID_PREFIX
+
+CHUNK_ROWS = 1024
+FILE_MAGIC = b"AVC1"
+VERSION = 1
+FLAG_NUMERIC_MESSAGE_IDS = 0x01
+FLAG_SEQ_MESSAGE_IDS = 0x02
+
+_HEADER = struct.Struct("<BBHIqqqqiiiiii")
+_SECTIONS = struct.Struct("<7I")
+_TRAILER = struct.Struct("<Q4s")
+_METRICS = ("temperature", "packet_loss", "audio_dropouts")
+
+
+class ChunkDecodeError(ValueError):
+    pass
+
+
+# ---------- varints ----------
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    v = values.astype(np.int64)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128 for a uint64 array, vectorised over the whole column."""
+    u = np.asarray(values, dtype=np.uint64)
+    if not len(u):
+        return b""
+    nbytes = np.ones(len(u), dtype=np.int64)
+    rest = u >> np.uint64(7)
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        sel = nbytes > k
+        byte = ((u[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)).astype(np.uint8)
+        more = (nbytes[sel] > k + 1).astype(np.uint8) << 7
+        out[starts[sel] + k] = byte | more
+    return out.tobytes()
+
+
+def decode_varints(buf: bytes, count: int) -> np.ndarray:
+    return _decode_varints(buf, count)[0]
+
+
+def _decode_varints(buf: bytes, count: int) -> tuple[np.ndarray, int]:
+    """Returns (values, bytes consumed)."""
+    if count == 0:
+        return np.empty(0, dtype=np.uint64), 0
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(raw < 0x80)
+    if len(ends) < count:
+        raise ChunkDecodeError("Truncated varint section")
+    ends = ends[:count]
+    raw = raw[: ends[-1] + 1]
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    pos = np.arange(len(raw)) - np.repeat(starts, lengths)
+    parts = (raw & 0x7F).astype(np.uint64) << (7 * pos).astype(np.uint64)
+    # the 7-bit groups don't overlap, so a sum is the same as OR-ing them together
+    return np.add.reduceat(parts, starts), len(raw)
+
+
+def _encode_deltas(values: np.ndarray) -> bytes:
+    v = values.astype(np.int64)
+    return encode_varints(_zigzag(np.diff(v, prepend=0)))
+
+
+def _decode_deltas(buf: bytes, n: int) -> np.ndarray:
+    return np.cumsum(_unzigzag(decode_varints(buf, n)))
+
+
+def _encode_delta_of_delta(values: np.ndarray) -> bytes:
+    v = values.astype(np.int64)
+    out = np.empty(len(v), dtype=np.int64)
+    out[0] = v[0]
+    if len(v) > 1:
+        d = np.diff(v)
+        out[1] = d[0]
+        out[2:] = np.diff(d)
+    return encode_varints(_zigzag(out))
+
+
+def _decode_delta_of_delta(buf: bytes, n: int) -> np.ndarray:
+    enc = _unzigzag(decode_varints(buf, n))
+    out = np.empty(n, dtype=np.int64)
+    out[0] = enc[0]
+    out[1:] = enc[0] + np.cumsum(np.cumsum(enc[1:]))
+    return out
+
+
+# ---------- error codes ----------
+
+def _encode_errors(codes: Sequence[Optional[str]]) -> bytes:
+    table: Dict[str, int] = {}
+    ids = np.fromiter(
+        (0 if c is None else table.setdefault(c, len(table) + 1) for c in codes),
+        dtype=np.int64,
+        count=len(codes),
+    )
+    if len(table) > 255:
+        raise ValueError("More than 255 distinct error codes in one chunk")
+
+    out = bytearray([len(table)])
+    for code in table:
+        raw = code.encode("utf-8")
+        out.append(len(raw))
+        out += raw
+
+    change = np.flatnonzero(np.diff(ids)) + 1
+    run_starts = np.concatenate(([0], change))
+    runs = np.diff(np.concatenate((run_starts, [len(ids)])))
+    pairs = np.empty(2 * len(run_starts), dtype=np.uint64)
+    pairs[0::2] = ids[run_starts]
+    pairs[1::2] = runs
+    out += struct.pack("<I", len(run_starts))
+    out += encode_varints(pairs)
+    return bytes(out)
+
+
+def _decode_errors(buf: bytes) -> tuple[np.ndarray, List[str]]:
+    """Returns (codes, table) with codes -1 for no error and i for table[i]."""
+    count, pos, table = buf[0], 1, []
+    for _ in range(count):
+        size = buf[pos]
+        table.append(buf[pos + 1 : pos + 1 + size].decode("utf-8"))
+        pos += 1 + size
+    (n_runs,) = struct.unpack_from("<I", buf, pos)
+    pairs = decode_varints(buf[pos + 4 :], 2 * n_runs).astype(np.int64)
+    return np.repeat(pairs[0::2] - 1, pairs[1::2]).astype(np.int32), table
+
+
+# ---------- message ids ----------
+
+def _numeric_ids(message_ids: Sequence[Optional[str]]) -> Optional[np.ndarray]:
+    try:
+        ints = [int(m) for m in message_ids]  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    # only lossless when str(int(m)) == m (no signs, spaces or leading zeros)
+    if any(str(i) != m or not -(2**62) < i < 2**62 for i, m in zip(ints, message_ids)):
+        return None
+    return np.array(ints, dtype=np.int64)
+
+
+def _encode_message_ids(message_ids: Sequence[Optional[str]]) -> tuple[int, bytes]:
+    numeric = _numeric_ids(message_ids)
+    if numeric is not None:
+        return FLAG_NUMERIC_MESSAGE_IDS, _encode_deltas(numeric)
+    # per-device seq keys (TelemetryPayload.idempotency_id) delta-encode just as well without their prefix
+    if all(m is not None and m.startswith(SEQ_ID_PREFIX) for m in message_ids):
+        numeric = _numeric_ids([m[len(SEQ_ID_PREFIX) :] for m in message_ids])  # type: ignore[index]
+        if numeric is not None:
+            return FLAG_NUMERIC_MESSAGE_IDS | FLAG_SEQ_MESSAGE_IDS, _encode_deltas(numeric)
+    raw = [b"" if m is None else m.encode("utf-8") for m in message_ids]
+    lengths = np.array([0 if m is None else len(r) + 1 for m, r in zip(message_ids, raw)], dtype=np.uint64)
+    return 0, encode_varints(lengths) + b"".join(raw)
+
+
+def _decode_message_ids(buf: bytes, n: int, flags: int) -> np.ndarray:
+    if flags & FLAG_NUMERIC_MESSAGE_IDS:
+        ids = _decode_deltas(buf, n).astype(str)
+        return np.char.add(SEQ_ID_PREFIX, ids) if flags & FLAG_SEQ_MESSAGE_IDS else ids
+    lengths, consumed = _decode_varints(buf, n)
+    data = buf[consumed:]
+    out, pos = [], 0
+    for size in lengths.tolist():
+        if size == 0:
+            out.append("")
+        else:
+            out.append(data[pos : pos + size - 1].decode("utf-8"))
+            pos += size - 1
+    return np.array(out, dtype=str)
+
+
+# ---------- chunks ----------
+
+@dataclass
+class ChunkHeader:
+    device_id: str
+    n: int
+    flags: int
+    ts_min: int
+    ts_max: int
+    id_min: int
+    id_max: int
+    temperature: tuple[int, int]
+    packet_loss: tuple[int, int]
+    audio_dropouts: tuple[int, int]
+    body_offset: int
+
+
+def read_header(blob: bytes, offset: int = 0) -> ChunkHeader:
+    try:
+        f = _HEADER.unpack_from(blob, offset)
+    except struct.error as e:
+        raise ChunkDecodeError(f"Truncated chunk header: {e}")
+    version, flags, dev_len, n = f[:4]
+    if version != VERSION:
+        raise ChunkDecodeError(f"Unsupported chunk version {version}")
+    start = offset + _HEADER.size
+    device_id = bytes(blob[start : start + dev_len]).decode("utf-8")
+    return ChunkHeader(
+        device_id=device_id,
+        n=n,
+        flags=flags,
+        ts_min=f[4],
+        ts_max=f[5],
+        id_min=f[6],
+        id_max=f[7],
+        temperature=(f[8], f[9]),
+        packet_loss=(f[10], f[11]),
+        audio_dropouts=(f[12], f[13]),
+        body_offset=start + dev_len,
+    )
+
+
+def encode_chunk(
+    device_id: str,
+    created_at_us: np.ndarray,
+    ids: np.ndarray,
+    metrics: Dict[str, np.ndarray],
+    error_codes: Sequence[Optional[str]],
+    message_ids: Sequence[Optional[str]],
+) -> bytes:
+    """One device's readings, already sorted by created_at."""
+    n = len(ids)
+    if not 0 < n <= CHUNK_ROWS:
+        raise ValueError(f"Chunk must hold 1..{CHUNK_ROWS} rows, got {n}")
+    flags, msg_section = _encode_message_ids(message_ids)
+    sections = [
+        _encode_delta_of_delta(created_at_us),
+        _encode_deltas(ids),
+        *(_encode_deltas(metrics[m]) for m in _METRICS),
+        _encode_errors(error_codes),
+        msg_section,
+    ]
+    dev = device_id.encode("utf-8")
+    bounds = []
+    for m in _METRICS:
+        bounds += [int(metrics[m].min()), int(metrics[m].max())]
+    header = _HEADER.pack(
+        VERSION, flags, len(dev), n,
+        int(created_at_us.min()), int(created_at_us.max()),
+        int(ids.min()), int(ids.max()),
+        *bounds,
+    )
+    return header + dev + _SECTIONS.pack(*(len(s) for s in sections)) + b"".join(sections)
+
+
+COLUMNS = ("created_at", "id", *_METRICS, "error_code", "message_id")
+
+
+def decode_chunk(blob: bytes, offset: int = 0, columns: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    """
+    Returns the chunk's columns as NumPy arrays: created_at (int64 us), id,
+    temperature, packet_loss, audio_dropouts, error_code (int32, -1 = none,
+    else an index into "errors"), message_id (str, "" = none), plus device_id.
+    `columns` limits decoding to those sections; the rest are skipped.
+    """
+    h = read_header(blob, offset)
+    wanted = set(COLUMNS if columns is None else columns)
+    lengths = _SECTIONS.unpack_from(blob, h.body_offset)
+    pos = h.body_offset + _SECTIONS.size
+    raw: Dict[str, bytes] = {}
+    for name, size in zip(COLUMNS, lengths):
+        if name in wanted:
+            raw[name] = bytes(blob[pos : pos + size])
+        pos += size
+
+    out: Dict[str, object] = {"device_id": h.device_id}
+    if "created_at" in raw:
+        out["created_at"] = _decode_delta_of_delta(raw["created_at"], h.n)
+    if "id" in raw:
+        out["id"] = _decode_deltas(raw["id"], h.n)
+    for name in _METRICS:
+        if name in raw:
+            out[name] = _decode_deltas(raw[name], h.n).astype(np.int32)
+    if "error_code" in raw:
+        out["error_code"], out["errors"] = _decode_errors(raw["error_code"])
+    if "message_id" in raw:
+        out["message_id"] = _decode_message_ids(raw["message_id"], h.n, h.flags)
+    return out
+
+
+# ---------- chunk files ----------
+
+class ChunkFileWriter:
+    """Builds a chunk file one device at a time, so callers never hold the whole partition."""
+
+    def __init__(self, chunk_rows: int = CHUNK_ROWS) -> None:
+        self.chunk_rows = chunk_rows
+        self._out = bytearray(FILE_MAGIC)
+        self._index: List[dict] = []
+
+    def add_device(
+        self,
+        device_id: str,
+        created_at_us: np.ndarray,
+        ids: np.ndarray,
+        metrics: Dict[str, np.ndarray],
+        error_codes: Sequence[Optional[str]],
+        message_ids: Sequence[Optional[str]],
+    ) -> None:
+        """One device's readings in any order; they are sorted by time and cut into chunks."""
+        order = np.lexsort((ids, created_at_us))
+        errors = np.asarray(error_codes, dtype=object)[order]
+        messages = np.asarray(message_ids, dtype=object)[order]
+        created_at_us, ids = created_at_us[order], ids[order]
+        metrics = {m: metrics[m][order] for m in _METRICS}
+
+        for start in range(0, len(order), self.chunk_rows):
+            sel = slice(start, start + self.chunk_rows)
+            blob = encode_chunk(
+                device_id,
+                created_at_us[sel],
+                ids[sel],
+                {m: metrics[m][sel] for m in _METRICS},
+                errors[sel].tolist(),
+                messages[sel].tolist(),
+            )
+            self._index.append({
+                "device_id": device_id,
+                "offset": len(self._out),
+                "length": len(blob),
+                "n": len(ids[sel]),
+                "ts_min": int(created_at_us[sel][0]),
+                "ts_max": int(created_at_us[sel][-1]),
+                "id_min": int(ids[sel].min()),
+                "id_max": int(ids[sel].max()),
+            })
+            self._out += blob
+
+    def finish(self) -> bytes:
+        index_offset = len(self._out)
+        self._out += json.dumps(self._index, separators=(",", ":")).encode("utf-8")
+        self._out += _TRAILER.pack(index_offset, FILE_MAGIC)
+        return bytes(self._out)
+
+
+def encode_chunk_file(
+    device_id: Sequence[str],
+    created_at_us: np.ndarray,
+    ids: np.ndarray,
+    metrics: Dict[str, np.ndarray],
+    error_codes: Sequence[Optional[str]],
+    message_ids: Sequence[Optional[str]],
+    chunk_rows: int = CHUNK_ROWS,
+) -> bytes:
+    """Rows of many devices in any order -> one chunk file."""
+    devices, device_idx = np.unique(np.asarray(device_id, dtype=str), return_inverse=True)
+    order = np.argsort(device_idx, kind="stable")
+    bounds = np.flatnonzero(np.diff(device_idx[order])) + 1
+    errors = np.asarray(error_codes, dtype=object)
+    messages = np.asarray(message_ids, dtype=object)
+
+    writer = ChunkFileWriter(chunk_rows)
+    for group in np.split(order, bounds):
+        if len(group):
+            writer.add_device(
+                str(devices[device_idx[group[0]]]),
+                created_at_us[group],
+                ids[group],
+                {m: metrics[m][group] for m in _METRICS},
+                errors[group].tolist(),
+                messages[group].tolist(),
+            )
+    return writer.finish()
+
+
+class ChunkFile:
+    """Read side of a chunk file; chunks are skipped using the index and headers."""
+
+    def __init__(self, data: bytes) -> None:
+        if data[:4] != FILE_MAGIC or len(data) < 4 + _TRAILER.size:
+            raise ChunkDecodeError("Not a telemetry chunk file")
+        index_offset, magic = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+        if magic != FILE_MAGIC:
+            raise ChunkDecodeError("Truncated telemetry chunk file")
+        self.data = memoryview(data)
+        self.index = json.loads(bytes(self.data[index_offset : len(data) - _TRAILER.size]))
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkFile":
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    @property
+    def rows(self) -> int:
+        return sum(e["n"] for e in self.index)
+
+    def _entries(
+        self,
+        device_id: Optional[str],
+        since_us: Optional[int],
+        until_us: Optional[int],
+        header_filter: Optional[Callable[[ChunkHeader], bool]],
+    ) -> Iterator[dict]:
+        for e in self.index:
+            if device_id is not None and e["device_id"] != device_id:
+                continue
+            if since_us is not None and e["ts_max"] < since_us:
+                continue
+            if until_us is not None and e["ts_min"] >= until_us:
+                continue
+            if header_filter is not None and not header_filter(read_header(self.data, e["offset"])):
+                continue
+            yield e
+
+    def chunks(
+        self,
+        device_id: Optional[str] = None,
+        since_us: Optional[int] = None,
+        until_us: Optional[int] = None,
+        header_filter: Optional[Callable[[ChunkHeader], bool]] = None,
+    ) -> Iterator[int]:
+        """Offsets of chunks that may hold matching rows."""
+        for e in self._entries(device_id, since_us, until_us, header_filter):
+            yield e["offset"]
+
+    def scan(
+        self,
+        device_id: Optional[str] = None,
+        since_us: Optional[int] = None,
+        until_us: Optional[int] = None,
+        header_filter: Optional[Callable[[ChunkHeader], bool]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Decodes the surviving chunks into one set of columns (device_id and
+        error_code dictionary-encoded file-wide). Rows are not filtered; chunk
+        skipping is by bounds only, so callers mask exact ranges themselves.
+        With `columns`, only those columns (plus device_code/devices) are returned.
+        """
+        wanted = COLUMNS if columns is None else tuple(columns)
+        entries = list(self._entries(device_id, since_us, until_us, header_filter))
+        decoded = [decode_chunk(self.data, e["offset"], wanted) for e in entries]
+
+        devices: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        device_code, error_code = [], []
+        for e, c in zip(entries, decoded):
+            device_code.append(np.full(e["n"], devices.setdefault(e["device_id"], len(devices)), dtype=np.int32))
+            if "error_code" in c:
+                remap = np.array([errors.setdefault(x, len(errors)) for x in c["errors"]] + [-1], dtype=np.int32)
+                # -1 (no error) indexes the trailing -1
+                error_code.append(remap[c["error_code"]])
+
+        out = {
+            "device_code": np.concatenate(device_code) if entries else np.empty(0, dtype=np.int32),
+            "devices": np.array(list(devices), dtype=str),
+        }
+        for name in wanted:
+            if name == "error_code":
+                out["error_code"] = np.concatenate(error_code) if entries else np.empty(0, dtype=np.int32)
+                out["errors"] = np.array(list(errors), dtype=str)
+            elif entries:
+                out[name] = np.concatenate([c[name] for c in decoded])
+            else:
+                out[name] = np.empty(0, dtype=str if name == "message_id" else np.int64)
+        return out
@@ -0,0 +1,316 @@
+"""
+Column-oriented decoders for bulk telemetry ingest.
+
+JSON batches go through Pydantic like everything else. The binary formats skip
+per-record model construction entirely and decode straight into TelemetryColumns,
+which is what the bulk insert consumes.
+
+application/msgpack
+-------------------
+Either a list of maps with the TelemetryPayload keys, or (cheaper) one map of
+equal-length columns:
+
+    {"device_id": [...], "temperature": [...], "packet_loss": [...],
+     "audio_dropouts": [...], "error_code": [...]?, "message_id": [...]?}
+
+application/x-avops-frame  (version 1, all integers little-endian)
+-----------------------------------------------------------------
+    header, 16 bytes
+      magic       4s   b"AVT1"
+      version     u8   1
+      flags       u8   bit 0: the seq field is meaningful (idempotency key "seq:<seq>")
+      n_devices   u16
+      n_errors    u16
+      reserved    u16  0
+      n_records   u32
+    device table  n_devices x (u8 length, utf-8 bytes)
+    error table   n_errors  x (u8 length, utf-8 bytes)
+    records       n_records x 18 bytes
+      device_idx      u16  index into the device table
+      error_idx       u16  index into the error table, 0xFFFF = none
+      temperature     f32
+      packet_loss     f32
+      audio_dropouts  u16
+      seq             u32
+
+encode_frame() produces this format and is what clients / benchmarks should use.
+"""
+from __future__ import annotations
+
+import math
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from api.schemas.telemetry import METRIC_MAX, METRIC_MIN, MAX_BATCH_ITEMS, SEQ_ID_PREFIX, TelemetryPayload
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for application/msgpack ingest
+    msgpack = None
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+FRAME_CONTENT_TYPE = "application/x-avops-frame"
+
+FRAME_MAGIC = b"AVT1"
+FRAME_VERSION = 1
+FRAME_FLAG_SEQ = 0x01
+NO_ERROR = 0xFFFF
+
+_HEADER = struct.Struct("<4sBBHHHI")
+_RECORD = np.dtype(
+    [
+        ("device_idx", "<u2"),
+        ("error_idx", "<u2"),
+        ("temperature", "<f4"),
+        ("packet_loss", "<f4"),
+        ("audio_dropouts", "<u2"),
+        ("seq", "<u4"),
+    ]
+)
+
+
+class TelemetryDecodeError(ValueError):
+    pass
+
+
+@dataclass
+class TelemetryColumns:
+    """One list per telemetry_events column, already normalized to DB types."""
+
+    device_id: List[str] = field(default_factory=list)
+    temperature: List[int] = field(default_factory=list)
+    packet_loss: List[int] = field(default_factory=list)
+    audio_dropouts: List[int] = field(default_factory=list)
+    error_code: List[Optional[str]] = field(default_factory=list)
+    message_id: List[Optional[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.device_id)
+
+    def take(self, indices: Sequence[int]) -> "TelemetryColumns":
+        return TelemetryColumns(
+            device_id=[self.device_id[i] for i in indices],
+            temperature=[self.temperature[i] for i in indices],
+            packet_loss=[self.packet_loss[i] for i in indices],
+            audio_dropouts=[self.audio_dropouts[i] for i in indices],
+            error_code=[self.error_code[i] for i in indices],
+            message_id=[self.message_id[i] for i in indices],
+        )
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "device_id": d,
+                "temperature": t,
+                "packet_loss": p,
+                "audio_dropouts": a,
+                "error_code": e,
+                "message_id": m,
+            }
+            for d, t, p, a, e, m in zip(
+                self.device_id,
+                self.temperature,
+                self.packet_loss,
+                self.audio_dropouts,
+                self.error_code,
+                self.message_id,
+            )
+        ]
+
+
+def columns_from_payloads(payloads: Sequence[TelemetryPayload]) -> TelemetryColumns:
+    return TelemetryColumns(
+        device_id=[p.device_id for p in payloads],
+        temperature=[int(p.temperature) for p in payloads],
+        packet_loss=[int(p.packet_loss) for p in payloads],
+        audio_dropouts=[int(p.audio_dropouts) for p in payloads],
+        error_code=[p.error_code for p in payloads],
+        message_id=[p.idempotency_id() for p in payloads],
+    )
+
+
+def _check_count(n: int) -> None:
+    if n == 0:
+        raise TelemetryDecodeError("Batch is empty")
+    if n > MAX_BATCH_ITEMS:
+        raise TelemetryDecodeError(f"Batch too large (max {MAX_BATCH_ITEMS} records)")
+
+
+# ---------- msgpack ----------
+
+def _int_column(name: str, values: Any, n: int) -> List[int]:
+    if not isinstance(values, list) or len(values) != n:
+        raise TelemetryDecodeError(f"Column '{name}' must be a list of {n} numbers")
+    out: List[int] = []
+    for v in values:
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v):
+            raise TelemetryDecodeError(f"Column '{name}' must contain finite numbers")
+        if not METRIC_MIN <= v <= METRIC_MAX:
+            raise TelemetryDecodeError(f"Column '{name}' values must be between {METRIC_MIN} and {METRIC_MAX}")
+        out.append(int(v))
+    return out
+
+
+def _str_column(name: str, values: Any, n: int, optional: bool, max_len: int = 64) -> List[Optional[str]]:
+    if values is None and optional:
+        return [None] * n
+    if not isinstance(values, list) or len(values) != n:
+        raise TelemetryDecodeError(f"Column '{name}' must be a list of {n} strings")
+    for v in values:
+        if v is None and optional:
+            continue
+        if not isinstance(v, str) or len(v) > max_len:
+            raise TelemetryDecodeError(f"Column '{name}' must contain strings up to {max_len} chars")
+    return values
+
+
+def _records_to_column_map(records: List[Any]) -> Dict[str, List[Any]]:
+    cols: Dict[str, List[Any]] = {
+        "device_id": [], "temperature": [], "packet_loss": [],
+        "audio_dropouts": [], "error_code": [], "message_id": [],
+    }
+    for r in records:
+        if not isinstance(r, dict):
+            raise TelemetryDecodeError("msgpack records must be maps")
+        message_id = r.get("message_id")
+        if message_id is None and r.get("seq") is not None:
+            message_id = f"{SEQ_ID_PREFIX}{r['seq']}"
+        cols["device_id"].append(r.get("device_id"))
+        cols["temperature"].append(r.get("temperature"))
+        cols["packet_loss"].append(r.get("packet_loss"))
+        cols["audio_dropouts"].append(r.get("audio_dropouts"))
+        cols["error_code"].append(r.get("error_code"))
+        cols["message_id"].append(message_id)
+    return cols
+
+
+def decode_msgpack(body: bytes) -> TelemetryColumns:
+    if msgpack is None:
+        raise TelemetryDecodeError("msgpack support is not installed on this server")
+    try:
+        obj = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise TelemetryDecodeError(f"Invalid msgpack body: {e}")
+
+    if isinstance(obj, list):
+        obj = _records_to_column_map(obj)
+    if not isinstance(obj, dict):
+        raise TelemetryDecodeError("msgpack body must be a list of records or a map of columns")
+
+    device_ids = obj.get("device_id")
+    n = len(device_ids) if isinstance(device_ids, list) else 0
+    _check_count(n)
+
+    return TelemetryColumns(
+        device_id=_str_column("device_id", device_ids, n, optional=False),  # type: ignore[arg-type]
+        temperature=_int_column("temperature", obj.get("temperature"), n),
+        packet_loss=_int_column("packet_loss", obj.get("packet_loss"), n),
+        audio_dropouts=_int_column("audio_dropouts", obj.get("audio_dropouts"), n),
+        error_code=_str_column("error_code", obj.get("error_code"), n, optional=True),
+        message_id=_str_column("message_id", obj.get("message_id"), n, optional=True),
+    )
+
+
+# ---------- packed frames ----------
+
+def _read_table(body: bytes, offset: int, count: int, what: str) -> tuple[List[str], int]:
+    out: List[str] = []
+    for _ in range(count):
+        if offset >= len(body):
+            raise TelemetryDecodeError(f"Frame truncated in {what} table")
+        length = body[offset]
+        offset += 1
+        raw = body[offset : offset + length]
+        if len(raw) != length:
+            raise TelemetryDecodeError(f"Frame truncated in {what} table")
+        try:
+            out.append(raw.decode("utf-8"))
+        except UnicodeDecodeError:
+            raise TelemetryDecodeError(f"Invalid utf-8 in {what} table")
+        offset += length
+    return out, offset
+
+
+def decode_frame(body: bytes) -> TelemetryColumns:
+    if len(body) < _HEADER.size:
+        raise TelemetryDecodeError("Frame too short")
+    magic, version, flags, n_devices, n_errors, _, n_records = _HEADER.unpack_from(body, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise TelemetryDecodeError("Unsupported frame (bad magic or version)")
+    _check_count(n_records)
+
+    devices, offset = _read_table(body, _HEADER.size, n_devices, "device")
+    errors, offset = _read_table(body, offset, n_errors, "error")
+
+    if len(body) - offset != n_records * _RECORD.itemsize:
+        raise TelemetryDecodeError("Frame length does not match record count")
+    recs = np.frombuffer(body, dtype=_RECORD, count=n_records, offset=offset)
+
+    device_idx = recs["device_idx"]
+    error_idx = recs["error_idx"]
+    if n_devices == 0 or int(device_idx.max()) >= n_devices:
+        raise TelemetryDecodeError("Record references an unknown device")
+    has_error = error_idx != NO_ERROR
+    if has_error.any() and int(error_idx[has_error].max()) >= n_errors:
+        raise TelemetryDecodeError("Record references an unknown error code")
+
+    temperature = recs["temperature"]
+    packet_loss = recs["packet_loss"]
+    if not (np.isfinite(temperature).all() and np.isfinite(packet_loss).all()):
+        raise TelemetryDecodeError("Non-finite metric in frame")
+    for metric in (temperature, packet_loss):
+        # in float64 (the bounds round in f32), before the int64 cast, which is undefined out of range
+        wide = metric.astype(np.float64)
+        if ((wide < METRIC_MIN) | (wide > METRIC_MAX)).any():
+            raise TelemetryDecodeError(f"Metric out of range in frame (between {METRIC_MIN} and {METRIC_MAX})")
+
+    device_table = np.array(devices, dtype=object)
+    error_table = np.array(errors + [None], dtype=object)
+    error_lookup = np.where(has_error, error_idx, len(errors))
+
+    if flags & FRAME_FLAG_SEQ:
+        message_id: List[Optional[str]] = [f"{SEQ_ID_PREFIX}{s}" for s in recs["seq"].tolist()]
+    else:
+        message_id = [None] * n_records
+
+    return TelemetryColumns(
+        device_id=device_table[device_idx].tolist(),
+        temperature=temperature.astype(np.int64).tolist(),
+        packet_loss=packet_loss.astype(np.int64).tolist(),
+        audio_dropouts=recs["audio_dropouts"].astype(np.int64).tolist(),
+        error_code=error_table[error_lookup].tolist(),
+        message_id=message_id,
+    )
+
+
+def encode_frame(records: Sequence[Dict[str, Any]], with_seq: bool = False) -> bytes:
+    """Build an x-avops-frame body from TelemetryPayload-shaped dicts."""
+    devices: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    recs = np.zeros(len(records), dtype=_RECORD)
+
+    for i, r in enumerate(records):
+        recs[i]["device_idx"] = devices.setdefault(r["device_id"], len(devices))
+        code = r.get("error_code")
+        recs[i]["error_idx"] = errors.setdefault(code, len(errors)) if code else NO_ERROR
+        recs[i]["temperature"] = r["temperature"]
+        recs[i]["packet_loss"] = r["packet_loss"]
+        recs[i]["audio_dropouts"] = r["audio_dropouts"]
+        recs[i]["seq"] = r.get("seq") or 0
+
+    def table(names: Dict[str, int]) -> bytes:
+        out = bytearray()
+        for name in names:
+            raw = name.encode("utf-8")
+            if len(raw) > 255:
+                raise ValueError(f"Table entry too long for a frame: {name!r}")
+            out.append(len(raw))
+            out += raw
+        return bytes(out)
+
+    flags = FRAME_FLAG_SEQ if with_seq else 0
+    header = _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, len(devices), len(errors), 0, len(records))
+    return header + table(devices) + table(errors) + recs.tobytes()
@@ -0,0 +1,516 @@
+"""
+Device-hash sharding of telemetry_events across SQLite files.
+
+SQLite allows one writer per file, so with TELEMETRY_SHARDS=N events are routed
+by a stable hash of device_id to one of N shard files, each with its own writer.
+Per-device reads hit exactly one shard; fleet-wide reads fan out in parallel and
+are merge-sorted.
+
+TELEMETRY_SHARDS=1 (the default) maps shard 0 onto the main database, so nothing
+changes for single-file deployments.
+
+Event ids
+---------
+Each shard has its own rowids. With N > 1 the API exposes global ids:
+
+    global_id = local_id * SHARD_ID_STRIDE + shard_index
+
+so any id can be routed back to its shard without a lookup. With N == 1 the
+global id is the local id. Resharding (scripts/reshard_telemetry.py) renumbers
+events; idempotency keys (device_id, message_id) survive it.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import MetaData, delete, func, inspect, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from api.core.config import settings
+from api.db.models import TelemetryEvent
+from api.services.telemetry_codec import TelemetryColumns
+from api.services.telemetry_store import IngestResult, save_telemetry_columns
+
+logger = logging.getLogger(__name__)
+
+SHARD_ID_STRIDE = 1024
+# per-device subqueries per UNION ALL statement (SQLite allows at most 500 compound terms)
+_UNION_CHUNK = 200
+
+T = TypeVar("T")
+
+
+@dataclass
+class TelemetryRecord:
+    """A telemetry_events row as the API sees it (global id, detached from any session)."""
+
+    id: int
+    device_id: str
+    temperature: int
+    packet_loss: int
+    audio_dropouts: int
+    error_code: Optional[str]
+    message_id: Optional[str]
+    created_at: datetime
+
+
+_COLUMNS = (
+    TelemetryEvent.id,
+    TelemetryEvent.device_id,
+    TelemetryEvent.temperature,
+    TelemetryEvent.packet_loss,
+    TelemetryEvent.audio_dropouts,
+    TelemetryEvent.error_code,
+    TelemetryEvent.message_id,
+    TelemetryEvent.created_at,
+)
+
+
+def shard_index(device_id: str, count: int) -> int:
+    # crc32 is stable across processes and Python versions (unlike hash())
+    return zlib.crc32(device_id.encode("utf-8")) % count
+
+
+class TelemetryShard:
+    def __init__(
+        self,
+        index: int,
+        engine: Engine,
+        read_engine: Engine,
+        async_read_engine: AsyncEngine,
+    ) -> None:
+        self.index = index
+        self.engine = engine
+        self.read_engine = read_engine
+        self.async_read_engine = async_read_engine
+        self.Session = sessionmaker(bind=engine, autoflush=False, future=True)
+        self.ReadSession = sessionmaker(bind=read_engine, autoflush=False, future=True)
+        # async ingest queues here for the (sync) writer engine instead of holding threadpool threads
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.AsyncReadSession = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+    @classmethod
+    def from_url(cls, index: int, url: str, profile: str) -> "TelemetryShard":
+        # imported here so building the module-level router doesn't pull in engines twice
+        from api.db.async_session import create_async_read_engine
+        from api.db.session import create_engines
+
+        engine, read_engine = create_engines(url, profile)
+        return cls(index, engine, read_engine, create_async_read_engine(url, profile))
+
+    def ensure_schema(self) -> None:
+        TelemetryEvent.__table__.create(self.engine, checkfirst=True)
+        if self.engine.dialect.name == "sqlite":
+            self._ensure_autoincrement()
+
+    def _ensure_autoincrement(self) -> None:
+        """
+        Rebuilds a shard file created before ids were AUTOINCREMENT (the Alembic
+        revision b7e4d91c2a05 does the same for the main DB). Ids are copied, so
+        they also seed sqlite_sequence.
+        """
+        table = TelemetryEvent.__table__
+        rebuilt = f"{table.name}_autoincrement"
+        with self.engine.connect() as conn:
+            ddl = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar()
+            if "AUTOINCREMENT" in (ddl or "").upper():
+                return
+            # pysqlite opens the transaction at the INSERT: an interrupted rebuild leaves only the new table
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {rebuilt}")
+            conn.execute(CreateTable(table.to_metadata(MetaData(), name=rebuilt)))
+            columns = ", ".join(c.name for c in table.columns)
+            conn.exec_driver_sql(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}")
+            conn.exec_driver_sql(f"DROP TABLE {table.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {rebuilt} RENAME TO {table.name}")
+            for index in table.indexes:
+                index.create(conn)
+            conn.commit()
+
+    def has_events(self) -> bool:
+        with self.ReadSession() as db:
+            return db.execute(select(TelemetryEvent.id).limit(1)).first() is not None
+
+    def raise_id_floor(self, local_id: int) -> None:
+        """Events inserted from now on get ids above local_id."""
+        if self.engine.dialect.name != "sqlite" or local_id <= 0:
+            return
+        name = TelemetryEvent.__tablename__
+        with self.engine.begin() as conn:
+            # no sqlite_sequence: the table isn't AUTOINCREMENT yet (main DB before the migration)
+            if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").first() is None:
+                return
+            raised = conn.exec_driver_sql(
+                "UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?", (local_id, name)
+            ).rowcount
+            if not raised:
+                conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, local_id))
+
+    def _write_sync(self, fn: Callable[..., T], *args) -> T:
+        with self.Session() as db:
+            return fn(db, *args)
+
+    async def write(self, fn: Callable[..., T], *args) -> T:
+        """fn(session, *args) on the shard's writer engine, from async code."""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard{self.index}-writer")
+        return await asyncio.wrap_future(self._writer.submit(self._write_sync, fn, *args))
+
+    async def dispose(self) -> None:
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            await asyncio.get_running_loop().run_in_executor(None, writer.shutdown)
+        await self.async_read_engine.dispose()
+        self.engine.dispose()
+        self.read_engine.dispose()
+
+
+class ShardRouter:
+    def __init__(self, shards: Sequence[TelemetryShard], managed_schema: bool = True) -> None:
+        if not shards or len(shards) > SHARD_ID_STRIDE:
+            raise ValueError(f"Shard count must be between 1 and {SHARD_ID_STRIDE}")
+        self.shards = list(shards)
+        # False when shard 0 is the main DB, whose schema belongs to Alembic
+        self.managed_schema = managed_schema
+
+    @property
+    def count(self) -> int:
+        return len(self.shards)
+
+    # ---------- routing ----------
+
+    def shard_for(self, device_id: str) -> TelemetryShard:
+        return self.shards[shard_index(device_id, self.count)]
+
+    def encode_id(self, shard: int, local_id: int) -> int:
+        return local_id if self.count == 1 else local_id * SHARD_ID_STRIDE + shard
+
+    def decode_id(self, global_id: int) -> Optional[Tuple[int, int]]:
+        if self.count == 1:
+            return 0, global_id
+        shard, local_id = global_id % SHARD_ID_STRIDE, global_id // SHARD_ID_STRIDE
+        if shard >= self.count:
+            return None
+        return shard, local_id
+
+    def _record(self, shard: int, row) -> TelemetryRecord:
+        return TelemetryRecord(
+            id=self.encode_id(shard, row.id),
+            device_id=row.device_id,
+            temperature=row.temperature,
+            packet_loss=row.packet_loss,
+            audio_dropouts=row.audio_dropouts,
+            error_code=row.error_code,
+            message_id=row.message_id,
+            created_at=row.created_at,
+        )
+
+    def _group(self, columns: TelemetryColumns) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for i, device_id in enumerate(columns.device_id):
+            groups.setdefault(shard_index(device_id, self.count), []).append(i)
+        return groups
+
+    def _regroup_results(
+        self, n: int, groups: Dict[int, List[int]], per_shard: Sequence[List[IngestResult]]
+    ) -> List[IngestResult]:
+        out: List[Optional[IngestResult]] = [None] * n
+        for (shard, indices), results in zip(groups.items(), per_shard):
+            for i, r in zip(indices, results):
+                out[i] = IngestResult(r.device_id, self.encode_id(shard, r.event_id), r.duplicate)
+        return out  # type: ignore[return-value]
+
+    def ensure_schema(self) -> None:
+        if self.managed_schema:
+            for shard in self.shards:
+                shard.ensure_schema()
+
+    def check_main_database(self) -> None:
+        """
+        With shard files, telemetry_events rows in the main DB are never read. Refuses
+        to start when they are the only telemetry (TELEMETRY_SHARDS was changed without
+        scripts.reshard_telemetry); warns when the shards hold events too, e.g. the
+        source copy a reshard leaves behind.
+        """
+        if not self.managed_schema:
+            return
+        from api.db.session import read_engine
+
+        with read_engine.connect() as conn:
+            if not inspect(conn).has_table(TelemetryEvent.__tablename__):
+                return
+            if conn.execute(select(TelemetryEvent.id).limit(1)).first() is None:
+                return
+            stranded = conn.execute(select(func.count(TelemetryEvent.id))).scalar_one()
+        if not any(shard.has_events() for shard in self.shards):
+            raise RuntimeError(
+                f"The main database holds {stranded} telemetry events but TELEMETRY_SHARDS={self.count} "
+                f"reads only the shard files, which are empty; run "
+                f"`python -m scripts.reshard_telemetry {self.count}` with the old TELEMETRY_SHARDS first"
+            )
+        logger.warning(
+            "the main database still holds %d telemetry events that TELEMETRY_SHARDS=%d never reads; "
+            "delete them once the reshard is verified",
+            stranded,
+            self.count,
+        )
+
+    def ensure_ids_above(self, global_id: int) -> None:
+        """
+        New events get global ids above global_id, in any shard. Called with the
+        archive's highest id: archives written before ids were AUTOINCREMENT, or
+        under another shard layout, may hold ids the live shards would hand out again.
+        """
+        local_id = global_id if self.count == 1 else global_id // SHARD_ID_STRIDE
+        for shard in self.shards:
+            shard.raise_id_floor(local_id)
+
+    # ---------- writes ----------
+
+    async def save_columns(self, columns: TelemetryColumns) -> List[IngestResult]:
+        """Idempotent insert; each shard's slice is written concurrently by its own writer."""
+        groups = self._group(columns)
+
+        per_shard = await asyncio.gather(
+            *(self.shards[s].write(save_telemetry_columns, columns.take(indices)) for s, indices in groups.items())
+        )
+        return self._regroup_results(len(columns), groups, per_shard)
+
+    def save_columns_sync(self, columns: TelemetryColumns) -> List[IngestResult]:
+        groups = self._group(columns)
+        per_shard = []
+        for s, indices in groups.items():
+            with self.shards[s].Session() as db:
+                per_shard.append(save_telemetry_columns(db, columns.take(indices)))
+        return self._regroup_results(len(columns), groups, per_shard)
+
+    # ---------- reads ----------
+
+    async def get_event(self, global_id: int) -> Optional[TelemetryRecord]:
+        decoded = self.decode_id(global_id)
+        if decoded is None:
+            return None
+        shard, local_id = decoded
+        async with self.shards[shard].AsyncReadSession() as db:
+            row = (await db.execute(select(*_COLUMNS).where(TelemetryEvent.id == local_id))).first()
+        return self._record(shard, row) if row else None
+
+    async def latest_for_device(self, device_id: str) -> Optional[TelemetryRecord]:
+        shard = self.shard_for(device_id)
+        async with shard.AsyncReadSession() as db:
+            row = (
+                await db.execute(
+                    select(*_COLUMNS)
+                    .where(TelemetryEvent.device_id == device_id)
+                    .order_by(TelemetryEvent.id.desc())
+                    .limit(1)
+                )
+            ).first()
+        return self._record(shard.index, row) if row else None
+
+    async def latest_id_for_device(self, device_id: str) -> Optional[int]:
+        """Global id of the device's newest event; answered from the device_id index alone."""
+        shard = self.shard_for(device_id)
+        async with shard.AsyncReadSession() as db:
+            local_id = (
+                await db.execute(select(func.max(TelemetryEvent.id)).where(TelemetryEvent.device_id == device_id))
+            ).scalar()
+        return None if local_id is None else self.encode_id(shard.index, local_id)
+
+    async def latest_per_device(self, limit: int) -> List[TelemetryRecord]:
+        """
+        Each device's newest event, most recently active devices first (at most
+        `limit` per shard). Walks the whole device_id index, so it also pulls it
+        into the page cache.
+        """
+        newest = select(func.max(TelemetryEvent.id)).group_by(TelemetryEvent.device_id)
+
+        async def fetch(shard: TelemetryShard) -> List[TelemetryRecord]:
+            q = (
+                select(*_COLUMNS)
+                .where(TelemetryEvent.id.in_(newest))
+                .order_by(TelemetryEvent.created_at.desc(), TelemetryEvent.id.desc())
+                .limit(limit)
+            )
+            async with shard.AsyncReadSession() as db:
+                rows = (await db.execute(q)).all()
+            return [self._record(shard.index, r) for r in rows]
+
+        results = await asyncio.gather(*(fetch(s) for s in self.shards))
+        return [record for shard_records in results for record in shard_records]
+
+    async def recent_for_devices(self, device_ids: Sequence[str], per_device: int) -> Dict[str, List[TelemetryRecord]]:
+        """
+        The newest `per_device` events of each device, newest first (devices
+        without events are left out). One UNION ALL of per-device index range
+        scans per shard and chunk, instead of a query per device.
+        """
+        groups: Dict[int, List[str]] = {}
+        for device_id in dict.fromkeys(device_ids):
+            groups.setdefault(shard_index(device_id, self.count), []).append(device_id)
+
+        async def fetch(shard: TelemetryShard, ids: List[str]) -> List[TelemetryRecord]:
+            out: List[TelemetryRecord] = []
+            async with shard.AsyncReadSession() as db:
+                for start in range(0, len(ids), _UNION_CHUNK):
+                    parts = [
+                        select(*_COLUMNS)
+                        .where(TelemetryEvent.device_id == device_id)
+                        .order_by(TelemetryEvent.id.desc())
+                        .limit(per_device)
+                        .subquery()
+                        .select()
+                        for device_id in ids[start : start + _UNION_CHUNK]
+                    ]
+                    rows = (await db.execute(union_all(*parts))).all()
+                    out.extend(self._record(shard.index, r) for r in rows)
+            return out
+
+        results = await asyncio.gather(*(fetch(self.shards[i], ids) for i, ids in groups.items()))
+        recent: Dict[str, List[TelemetryRecord]] = {}
+        for records in results:
+            for record in records:
+                recent.setdefault(record.device_id, []).append(record)
+        return recent
+
+    def latest_for_device_sync(self, device_id: str) -> Optional[TelemetryRecord]:
+        shard = self.shard_for(device_id)
+        with shard.ReadSession() as db:
+            row = db.execute(
+                select(*_COLUMNS)
+                .where(TelemetryEvent.device_id == device_id)
+                .order_by(TelemetryEvent.id.desc())
+                .limit(1)
+            ).first()
+        return self._record(shard.index, row) if row else None
+
+    async def list_events(
+        self,
+        device_id: Optional[str],
+        limit: int,
+        offset: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[TelemetryRecord]:
+        """
+        Newest first, optionally within [since, until). A device filter reads one
+        shard in id order; otherwise every shard returns its newest offset+limit
+        rows by (created_at, id) in parallel and the streams are merge-sorted.
+        Events ingested late with an older timestamp sort by created_at, not id.
+        """
+        if device_id:
+            shards = [self.shard_for(device_id)]
+        else:
+            shards = self.shards
+
+        async def fetch(shard: TelemetryShard) -> List[TelemetryRecord]:
+            q = select(*_COLUMNS)
+            if device_id:
+                q = q.where(TelemetryEvent.device_id == device_id)
+            if since is not None:
+                q = q.where(TelemetryEvent.created_at >= since)
+            if until is not None:
+                q = q.where(TelemetryEvent.created_at < until)
+            per_shard_limit = limit + offset if len(shards) > 1 else limit
+            if device_id:
+                # one device's ids follow its created_at, resharded or not; keeps the device_id index order
+                q = q.order_by(TelemetryEvent.id.desc())
+            else:
+                # a reshard renumbers ids source shard by source shard, so across devices they aren't in
+                # time order; sort by the merge key instead (the created_at index ends in rowid)
+                q = q.order_by(TelemetryEvent.created_at.desc(), TelemetryEvent.id.desc())
+            q = q.limit(per_shard_limit)
+            if len(shards) == 1:
+                q = q.offset(offset)
+            async with shard.AsyncReadSession() as db:
+                rows = (await db.execute(q)).all()
+            return [self._record(shard.index, r) for r in rows]
+
+        results = await asyncio.gather(*(fetch(s) for s in shards))
+        if len(results) == 1:
+            return results[0]
+
+        merged = heapq.merge(*results, key=lambda r: (r.created_at, r.id), reverse=True)
+        return list(merged)[offset : offset + limit]
+
+    def oldest_created_at(self) -> Optional[datetime]:
+        oldest = None
+        for shard in self.shards:
+            with shard.ReadSession() as db:
+                ts = db.execute(select(func.min(TelemetryEvent.created_at))).scalar()
+            if ts is not None and (oldest is None or ts < oldest):
+                oldest = ts
+        return oldest
+
+    def rows_between(self, start: datetime, end: datetime) -> List[TelemetryRecord]:
+        """Every live row with start <= created_at < end, across all shards."""
+        out: List[TelemetryRecord] = []
+        for shard in self.shards:
+            with shard.ReadSession() as db:
+                rows = db.execute(
+                    select(*_COLUMNS).where(TelemetryEvent.created_at >= start, TelemetryEvent.created_at < end)
+                )
+                out.extend(self._record(shard.index, r) for r in rows)
+        return out
+
+    def delete_before(self, end: datetime) -> int:
+        deleted = 0
+        for shard in self.shards:
+            with shard.Session() as db:
+                deleted += db.execute(delete(TelemetryEvent).where(TelemetryEvent.created_at < end)).rowcount
+                db.commit()
+        return deleted
+
+    def iter_shard_rows(self, shard: int, batch_size: int = 5000) -> Iterator[List[TelemetryRecord]]:
+        """All rows of one shard in local id order, in batches (keyset paging)."""
+        last_id = 0
+        with self.shards[shard].ReadSession() as db:
+            while True:
+                rows = db.execute(
+                    select(*_COLUMNS)
+                    .where(TelemetryEvent.id > last_id)
+                    .order_by(TelemetryEvent.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    return
+                last_id = rows[-1].id
+                yield [self._record(shard, r) for r in rows]
+
+    async def dispose(self) -> None:
+        for shard in self.shards:
+            await shard.dispose()
+
+
+def shard_urls(count: int, template: Optional[str] = None) -> List[str]:
+    template = template or settings.telemetry_shard_url_template
+    return [template.format(shard=i, count=count) for i in range(count)]
+
+
+def build_router(count: int, template: Optional[str] = None, profile: Optional[str] = None) -> ShardRouter:
+    profile = profile or settings.sqlite_profile
+    if count == 1 and template is None:
+        from api.db.async_session import async_read_engine
+        from api.db.session import engine, read_engine
+
+        return ShardRouter(
+            [TelemetryShard(0, engine, read_engine, async_read_engine)],
+            managed_schema=False,
+        )
+    return ShardRouter(
+        [TelemetryShard.from_url(i, url, profile) for i, url in enumerate(shard_urls(count, template))]
+    )
+
+
+telemetry_shards = build_router(settings.telemetry_shards)
@@ -1,18 +1,111 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from api.db.models import TelemetryEvent
 from api.schemas.telemetry import TelemetryPayload
+from api.services.idempotency import idempotency_key, recent_keys
+from api.services.telemetry_codec import TelemetryColumns, columns_from_payloads
+
+
+@dataclass
+class IngestResult:
+    device_id: str
+    event_id: int
+    duplicate: bool = False
 
 
-def save_telemetry_event(db: Session, payload: TelemetryPayload) -> TelemetryEvent:
-    row = TelemetryEvent(
-        device_id=payload.device_id,
-        temperature=int(payload.temperature),
-        packet_loss=int(payload.packet_loss),
-        audio_dropouts=int(payload.audio_dropouts),
-        error_code=payload.error_code,
+def _existing_ids(db: Session, pairs: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    if not pairs:
+        return {}
+    rows = (
+        db.query(TelemetryEvent.device_id, TelemetryEvent.message_id, TelemetryEvent.id)
+        .filter(tuple_(TelemetryEvent.device_id, TelemetryEvent.message_id).in_(list(pairs)))
+        .all()
     )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
+    return {(r[0], r[1]): r[2] for r in rows}
+
+
+def _insert_one_by_one(db: Session, rows: List[dict]) -> List[Tuple[int, bool]]:
+    # Slow path, only after a unique-index race inside a bulk insert.
+    out: List[Tuple[int, bool]] = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                new_id = db.execute(insert(TelemetryEvent).returning(TelemetryEvent.id), row).scalar_one()
+            out.append((new_id, False))
+        except IntegrityError:
+            existing = _existing_ids(db, [(row["device_id"], row["message_id"])])
+            out.append((existing[(row["device_id"], row["message_id"])], True))
+    return out
+
+
+def save_telemetry_columns(db: Session, columns: TelemetryColumns) -> List[IngestResult]:
+    """
+    Idempotent bulk insert of column arrays (see telemetry_codec).
+
+    Payloads without a message id / seq are always inserted. For keyed payloads
+    the recent-key filter answers "definitely new" in memory; only suspected
+    retries are checked against the (device_id, message_id) unique index, and
+    those return the original event id.
+    """
+    rows = columns.rows()
+    results: List[Optional[IngestResult]] = [None] * len(rows)
+
+    suspects = [
+        (r["device_id"], r["message_id"])
+        for r in rows
+        if r["message_id"] and recent_keys.might_contain(idempotency_key(r["device_id"], r["message_id"]))
+    ]
+    known = _existing_ids(db, suspects)
+
+    to_insert: List[int] = []
+    first_in_batch: Dict[Tuple[str, str], int] = {}
+    repeats: List[Tuple[int, int]] = []  # (index, index of first occurrence in this batch)
+
+    for i, r in enumerate(rows):
+        pair = (r["device_id"], r["message_id"])
+        if r["message_id"]:
+            if pair in known:
+                results[i] = IngestResult(r["device_id"], known[pair], duplicate=True)
+                continue
+            if pair in first_in_batch:
+                repeats.append((i, first_in_batch[pair]))
+                continue
+            first_in_batch[pair] = i
+        to_insert.append(i)
+
+    if to_insert:
+        batch = [rows[i] for i in to_insert]
+        try:
+            with db.begin_nested():
+                new_ids = db.execute(
+                    insert(TelemetryEvent).returning(TelemetryEvent.id, sort_by_parameter_order=True),
+                    batch,
+                ).scalars().all()
+            inserted = [(new_id, False) for new_id in new_ids]
+        except IntegrityError:
+            inserted = _insert_one_by_one(db, batch)
+        db.commit()
+
+        for i, (event_id, duplicate) in zip(to_insert, inserted):
+            results[i] = IngestResult(rows[i]["device_id"], event_id, duplicate=duplicate)
+            key = idempotency_key(rows[i]["device_id"], rows[i]["message_id"])
+            if key:
+                recent_keys.add(key)
+
+    for i, first in repeats:
+        results[i] = IngestResult(rows[i]["device_id"], results[first].event_id, duplicate=True)
+
+    return results  # type: ignore[return-value]
+
+
+def save_telemetry_events(db: Session, payloads: Sequence[TelemetryPayload]) -> List[IngestResult]:
+    return save_telemetry_columns(db, columns_from_payloads(payloads))
+
+
+def save_telemetry_event(db: Session, payload: TelemetryPayload) -> IngestResult:
+    return save_telemetry_events(db, [payload])[0]
@@ -0,0 +1,42 @@
+"""
+Apply the telemetry retention policy once (meant for cron).
+
+Partitions (TELEMETRY_PARTITION = day | week) that ended more than
+TELEMETRY_HOT_DAYS ago are written to TELEMETRY_ARCHIVE_DIR and deleted from
+every live shard; archive files older than TELEMETRY_ARCHIVE_RETENTION_DAYS are
+removed. Freed pages in the live database are reused by new inserts; pass
+--vacuum to also shrink the files.
+
+    python -m scripts.archive_telemetry [--vacuum]
+"""
+import sys
+import time
+
+from sqlalchemy import text
+
+from api.core.config import settings
+from api.services.telemetry_archive import apply_retention, telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+
+
+def main() -> None:
+    if settings.telemetry_hot_days <= 0 and settings.telemetry_archive_retention_days <= 0:
+        sys.exit("Retention is disabled: set TELEMETRY_HOT_DAYS and/or TELEMETRY_ARCHIVE_RETENTION_DAYS")
+
+    start = time.perf_counter()
+    result = apply_retention(telemetry_shards, telemetry_archive)
+    for name in result["archived"]:
+        print(f"archived {name}")
+    print(f"dropped {result['dropped']} expired archive partition(s)")
+
+    if "--vacuum" in sys.argv[1:] and result["archived"]:
+        for shard in telemetry_shards.shards:
+            with shard.engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+            print(f"vacuumed {shard.engine.url}")
+
+    print(f"done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
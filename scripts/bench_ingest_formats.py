@@ -0,0 +1,71 @@
+"""
+Decode throughput of the bulk ingest formats: JSON (+ Pydantic), msgpack, packed frame.
+
+Measures body -> TelemetryColumns, i.e. everything the ingest node does before
+the INSERT. Run from the repo root:
+
+    python -m scripts.bench_ingest_formats [records_per_batch] [batches]
+"""
+import json
+import random
+import sys
+import time
+
+import msgpack
+
+from api.schemas.telemetry import TelemetryBatchRequest
+from api.services.telemetry_codec import columns_from_payloads, decode_frame, decode_msgpack, encode_frame
+
+BATCH = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+rng = random.Random(42)
+records = [
+    {
+        "device_id": f"device-{rng.randrange(500):04d}",
+        "temperature": rng.uniform(30, 90),
+        "packet_loss": rng.uniform(0, 10),
+        "audio_dropouts": rng.randrange(8),
+        "error_code": rng.choice([None, None, None, "E42", "E17"]),
+        "seq": i,
+    }
+    for i in range(BATCH)
+]
+
+bodies = {
+    "json + pydantic": json.dumps({"items": records}).encode(),
+    "msgpack records": msgpack.packb(records),
+    "msgpack columns": msgpack.packb({
+        "device_id": [r["device_id"] for r in records],
+        "temperature": [r["temperature"] for r in records],
+        "packet_loss": [r["packet_loss"] for r in records],
+        "audio_dropouts": [r["audio_dropouts"] for r in records],
+        "error_code": [r["error_code"] for r in records],
+        "message_id": [f"seq:{r['seq']}" for r in records],
+    }),
+    "packed frame": encode_frame(records, with_seq=True),
+}
+
+decoders = {
+    "json + pydantic": lambda b: columns_from_payloads(TelemetryBatchRequest.model_validate_json(b).items),
+    "msgpack records": decode_msgpack,
+    "msgpack columns": decode_msgpack,
+    "packed frame": decode_frame,
+}
+
+print(f"{BATCH} records/batch, {ROUNDS} batches")
+print(f"{'format':<18}{'bytes/rec':>10}{'records/s':>14}{'vs json':>9}")
+
+baseline = None
+for name, body in bodies.items():
+    decode = decoders[name]
+    decode(body)  # warm-up
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        cols = decode(body)
+    elapsed = time.perf_counter() - start
+    assert len(cols) == BATCH
+
+    rate = BATCH * ROUNDS / elapsed
+    baseline = baseline or rate
+    print(f"{name:<18}{len(body) / BATCH:>10.1f}{rate:>14,.0f}{rate / baseline:>8.1f}x")
@@ -0,0 +1,245 @@
+"""
+Latency of GET /telemetry/events and GET /copilot/runs at their max page size,
+before and after the column-projected fast JSON path (api.core.fast_json).
+
+"before" mounts the previous handler bodies next to the real routes: rows go
+back through response_model validation and the stdlib encoder, and copilot runs
+are hydrated as ORM objects and mapped through _to_response. Both versions run
+against the same temp DB in the same app, and their bodies are checked to be
+identical JSON before timing.
+
+End-to-end numbers include the TestClient round trip (a thread hop each way),
+so serialization alone is also timed on the fetched rows: response_model
+validation + stdlib encoder vs fast_json.
+
+    python -m scripts.bench_list_endpoints [requests] [events] [runs]
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ.setdefault("DEBUG", "false")
+
+from fastapi import APIRouter, Depends, Query  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from api.core.auth_deps import get_current_user  # noqa: E402
+from api.core.fast_json import iter_items  # noqa: E402
+from api.core.principal import Principal  # noqa: E402
+from api.core.security import create_access_token  # noqa: E402
+from api.db import kb_models, models  # noqa: E402,F401
+from api.db.base import Base  # noqa: E402
+from api.db.deps import get_async_read_db  # noqa: E402
+from api.db.models import CopilotRun, TelemetryEvent, User  # noqa: E402
+from api.db.async_session import AsyncReadSessionLocal, async_read_engine  # noqa: E402
+from api.db.session import engine  # noqa: E402
+from api.main import create_app  # noqa: E402
+from api.routers.copilot import _RUN_COLUMNS, _encode_run_row, _to_response  # noqa: E402
+from api.schemas.copilot import CopilotRunListResponse  # noqa: E402
+from api.schemas.telemetry import TelemetryEventListResponse  # noqa: E402
+from api.services.telemetry_archive import read_events, telemetry_archive  # noqa: E402
+from api.services.telemetry_shards import telemetry_shards  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+EVENTS = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+RUNS = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+START = datetime(2026, 1, 1)
+
+before = APIRouter(prefix="/before")
+
+
+@before.get("/telemetry/events", response_model=TelemetryEventListResponse)
+async def before_events(
+    current_user: Principal = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    return {"items": await read_events(telemetry_shards, telemetry_archive, None, limit, offset)}
+
+
+@before.get("/copilot/runs", response_model=CopilotRunListResponse)
+async def before_runs(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    runs = (
+        await db.execute(
+            select(CopilotRun)
+            .where(CopilotRun.user_id == current_user.id)
+            .order_by(CopilotRun.id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+    ).scalars().all()
+    return {"items": [_to_response(r) for r in runs]}
+
+
+def _run_row(rng: random.Random, user_id: int, i: int) -> dict:
+    # shaped like copilot_service output: rule-based diagnosis plus 5 KB hits
+    device = f"device-{i % 50:03d}"
+    sources = [
+        {
+            "id": rng.randrange(10_000),
+            "title": f"Runbook {rng.randrange(100)}",
+            "source": f"kb/runbooks/{rng.randrange(100)}.md",
+            "snippet": " ".join(rng.choice(["codec", "reboot", "firmware", "fan", "DSP", "VLAN", "Dante"]) for _ in range(60)),
+        }
+        for _ in range(5)
+    ]
+    created = START + timedelta(minutes=i)
+    return {
+        "user_id": user_id,
+        "device_id": device,
+        "task": f"Diagnose {device} audio dropouts",
+        "input_context": {
+            "device_id": device,
+            "latest_telemetry": {
+                "id": i, "device_id": device, "temperature": 72, "packet_loss": 6,
+                "audio_dropouts": 3, "error_code": "E42", "created_at": created.isoformat(),
+            },
+        },
+        "output": {
+            "diagnosis": ["Packet loss is elevated.", "Audio dropouts detected."],
+            "next_steps": ["Check switch port errors.", "Verify QoS / DSCP marking."],
+            "notes": "rule-based fallback (LLM unavailable or invalid JSON).",
+            "generated_at": created.isoformat(),
+            "used_retrieval": True,
+            "sources": sources,
+        },
+        "status": "success",
+        "created_at": created,
+    }
+
+
+def seed() -> int:
+    rng = random.Random(7)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            insert(User).values(email="bench@example.com", hashed_password="x").returning(User.id)
+        ).scalar_one()
+        conn.execute(insert(TelemetryEvent), [
+            {
+                "device_id": f"device-{i % 200:03d}",
+                "temperature": rng.randrange(30, 90),
+                "packet_loss": rng.randrange(10),
+                "audio_dropouts": rng.randrange(6),
+                "error_code": rng.choice([None, None, None, "E42"]),
+                "message_id": f"m-{i}",
+                "created_at": START + timedelta(seconds=i, microseconds=rng.randrange(1_000_000)),
+            }
+            for i in range(EVENTS)
+        ])
+        conn.execute(insert(CopilotRun), [_run_row(rng, user_id, i) for i in range(RUNS)])
+    return user_id
+
+
+def timed(client: TestClient, url: str, headers: dict) -> list:
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        r = client.get(url, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200, r.text
+    return samples
+
+
+def timed_call(fn) -> list:
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def response_model_encoder(model):
+    # what FastAPI does for a dict return with response_model: validate, dump, json.dumps
+    adapter = TypeAdapter(model)
+
+    def encode(payload: dict) -> bytes:
+        value = adapter.validate_python(payload, from_attributes=True)
+        return json.dumps(adapter.dump_python(value, mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+    return encode
+
+
+async def fetch_rows(user_id: int):
+    events = await read_events(telemetry_shards, telemetry_archive, None, 200, 0)
+    async with AsyncReadSessionLocal() as db:
+        q = select(CopilotRun).where(CopilotRun.user_id == user_id).order_by(CopilotRun.id.desc()).limit(100)
+        runs = (await db.execute(q)).scalars().all()
+        run_rows = (await db.execute(q.with_only_columns(*_RUN_COLUMNS))).all()
+    # pooled connections belong to this event loop
+    await async_read_engine.dispose()
+    return events, runs, run_rows
+
+
+def serialization_only(user_id: int) -> None:
+    events, runs, run_rows = asyncio.run(fetch_rows(user_id))
+    old_events = response_model_encoder(TelemetryEventListResponse)
+    old_runs = response_model_encoder(CopilotRunListResponse)
+
+    print("serialization only")
+    p_old = report("  events: response_model", timed_call(lambda: old_events({"items": events})), 0)
+    p_new = report("  events: fast_json", timed_call(lambda: b"".join(iter_items(events))), 0)
+    print(f"  speedup {p_old / p_new:.2f}x")
+    p_old = report(
+        "  runs: _to_response + response_model",
+        timed_call(lambda: old_runs({"items": [_to_response(r) for r in runs]})),
+        0,
+    )
+    p_new = report("  runs: columns + fast_json", timed_call(lambda: b"".join(iter_items(run_rows, _encode_run_row))), 0)
+    print(f"  speedup {p_old / p_new:.2f}x")
+
+
+def report(label: str, samples: list, size: int) -> float:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    kib = f"{size / 1024:>9.1f} KiB" if size else ""
+    print(f"{label:<36}{p50:>9.2f} ms p50{p95:>9.2f} ms p95{kib}")
+    return p50
+
+
+def main() -> None:
+    user_id = seed()
+    headers = {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+    app = create_app()
+    app.include_router(before)
+
+    with TestClient(app) as client:
+        for name, path in (
+            ("telemetry/events?limit=200", "telemetry/events?limit=200"),
+            ("copilot/runs?limit=100", "copilot/runs?limit=100"),
+        ):
+            old_url, new_url = f"/before/{path}", f"/api/v1/{path}"
+            old, new = client.get(old_url, headers=headers), client.get(new_url, headers=headers)
+            assert json.loads(old.content) == json.loads(new.content), f"{name}: bodies differ"
+            for _ in range(20):  # warm-up
+                client.get(old_url, headers=headers)
+                client.get(new_url, headers=headers)
+
+            print(name)
+            p_old = report("  before (response_model)", timed(client, old_url, headers), len(old.content))
+            p_new = report("  after (columns + fast_json)", timed(client, new_url, headers), len(new.content))
+            print(f"  speedup {p_old / p_new:.2f}x")
+
+    serialization_only(user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Per-call and per-request cost of logging: the old synchronous basicConfig
+handler vs the queued pipeline in api.core.logging.
+
+Both write to the same sink: /dev/null ("fast", the best case for synchronous
+I/O) and a sink that stalls SLOW_SINK_US per write ("slow", a terminal or a
+container log driver under pressure). The sync handler pays the sink on the
+caller's thread; the queued one only formats a dict and enqueues.
+
+"per request" mounts a route that logs LINES_PER_REQUEST lines (roughly what a
+copilot run or a register emits at DEBUG) and reports the time the route spent
+in those calls plus the TestClient round trip, with RequestIdMiddleware in the
+stack for the queued variant. The round trip is mostly TestClient's own thread
+hops; the in-route figure is what logging adds to a request.
+
+    python -m scripts.bench_logging [calls] [requests]
+"""
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ.setdefault("DEBUG", "false")
+# large enough that the slow sink never drops records while we time the callers
+os.environ.setdefault("LOG_QUEUE_SIZE", "1000000")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from api.core import logging as app_logging  # noqa: E402
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+LINES_PER_REQUEST = 5
+SLOW_SINK_US = 50
+
+
+class SlowSink(io.TextIOBase):
+    def write(self, s: str) -> int:
+        # sleeps rather than spins: a blocked pipe write releases the GIL
+        time.sleep(SLOW_SINK_US / 1e6)
+        return len(s)
+
+    def flush(self) -> None:
+        pass
+
+
+def _sinks():
+    return {"fast": lambda: open(os.devnull, "w"), "slow": SlowSink}
+
+
+def use_sync(sink) -> None:
+    app_logging.stop_logging()
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        stream=sink,
+        force=True,
+    )
+
+
+def use_queued(sink) -> None:
+    app_logging.setup_logging(debug=False)
+    # point the listener's stream handler at the sink under test
+    for h in app_logging._pipeline.listener.handlers:
+        h.setStream(sink)
+
+
+def bench_calls(log: logging.Logger) -> float:
+    started = time.perf_counter()
+    for i in range(CALLS):
+        log.info("ingested %d items (%d duplicate)", 500, i % 3, extra={"items": 500})
+    return (time.perf_counter() - started) / CALLS * 1e6
+
+
+def make_app(with_request_id: bool) -> TestClient:
+    app = FastAPI()
+    log = logging.getLogger("bench.route")
+
+    @app.get("/work")
+    def work():
+        started = time.perf_counter()
+        for i in range(LINES_PER_REQUEST):
+            log.info("step %d done", i, extra={"step": i})
+        return {"logging_us": (time.perf_counter() - started) * 1e6}
+
+    if with_request_id:
+        app.add_middleware(app_logging.RequestIdMiddleware)
+    return TestClient(app)
+
+
+def bench_requests(client: TestClient):
+    for _ in range(50):
+        client.get("/work")
+    in_route, round_trip = [], []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        r = client.get("/work")
+        round_trip.append((time.perf_counter() - started) * 1e6)
+        in_route.append(r.json()["logging_us"])
+    return in_route, round_trip
+
+
+def main() -> int:
+    log = logging.getLogger("bench")
+    rows = []
+    for sink_name, make_sink in _sinks().items():
+        for variant in ("sync", "queued"):
+            sink = make_sink()
+            if variant == "sync":
+                use_sync(sink)
+                client = make_app(with_request_id=False)
+            else:
+                use_queued(sink)
+                client = make_app(with_request_id=True)
+            per_call = bench_calls(log)
+            app_logging.stop_logging()  # drains the backlog before timing requests
+            if variant == "queued":
+                use_queued(sink)
+            in_route, round_trip = bench_requests(client)
+            app_logging.stop_logging()
+            rows.append((
+                sink_name, variant, per_call,
+                statistics.median(in_route), statistics.quantiles(in_route, n=100)[98],
+                statistics.median(round_trip),
+            ))
+
+    use_sync(sys.stdout)
+    print(f"{CALLS} log calls, {REQUESTS} requests x {LINES_PER_REQUEST} lines, slow sink = {SLOW_SINK_US} µs/write")
+    print(f"{'sink':<6}{'pipeline':<10}{'µs/call':>10}{'in-route p50':>14}{'in-route p99':>14}{'round trip p50':>16}")
+    for sink_name, variant, per_call, p50, p99, rt in rows:
+        print(f"{sink_name:<6}{variant:<10}{per_call:>10.1f}{p50:>14.0f}{p99:>14.0f}{rt:>16.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
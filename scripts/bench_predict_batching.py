@@ -0,0 +1,116 @@
+"""
+Throughput and latency of POST /predict/risk under concurrent callers:
+
+  before     the previous handler: sync route (threadpool hop), compute_risk
+             per call, RiskResponse model validated per response
+  window=0   async route, score_risk_batch on a single item
+  window=Xms micro-batched: callers within the window scored in one pass
+
+Requests go through the full app (middlewares included) over httpx's ASGI
+transport, so the numbers are the app's own cost without sockets. Per-request
+latency isn't reported: callers run in one loop with no network, so it mostly
+measures how many callers are ahead of you. Queue wait is the batching cost.
+
+    python -m scripts.bench_predict_batching [requests] [concurrency] [window_ms]
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("WARMUP_ENABLED", "false")
+
+import httpx  # noqa: E402
+from fastapi import APIRouter  # noqa: E402
+
+from api.main import create_app  # noqa: E402
+from api.core.metrics import RISK_BATCH_SIZE, RISK_BATCH_WAIT  # noqa: E402
+from api.routers.predict import risk_batcher  # noqa: E402
+from api.schemas.telemetry import RiskResponse, TelemetryPayload  # noqa: E402
+from api.services.risk import compute_risk  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+WINDOW_MS = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+before = APIRouter(prefix="/before")
+
+
+@before.post("/predict/risk", response_model=RiskResponse)
+def predict_risk_before(payload: TelemetryPayload):
+    return compute_risk(payload)
+
+
+def _payload(i: int) -> dict:
+    rnd = random.Random(i)
+    return {
+        "device_id": f"device-{i % 500:03d}",
+        "temperature": rnd.uniform(30, 90),
+        "packet_loss": rnd.uniform(0, 10),
+        "audio_dropouts": rnd.randint(0, 6),
+        "error_code": rnd.choice([None, None, None, "E42"]),
+    }
+
+
+def _totals():
+    sizes, waits = RISK_BATCH_SIZE.labels(), RISK_BATCH_WAIT.labels()
+    return sum(sizes.counts), sizes.sum, waits.sum
+
+
+async def run(client: httpx.AsyncClient, path: str) -> float:
+    queue = iter(range(REQUESTS))
+
+    async def worker():
+        for i in queue:
+            r = await client.post(path, json=_payload(i))
+            assert r.status_code == 200, r.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - started)
+
+
+async def main_async() -> None:
+    app = create_app()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+    app.include_router(before)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # responses must match the previous handler, timestamps aside
+        for i in range(200):
+            old = (await client.post("/before/predict/risk", json=_payload(i))).json()
+            new = (await client.post("/api/v1/predict/risk", json=_payload(i))).json()
+            old.pop("timestamp"), new.pop("timestamp")
+            assert old == new, (old, new)
+
+        print(f"{REQUESTS} requests, {CONCURRENCY} concurrent callers")
+        print(f"{'variant':<14}{'req/s':>10}{'mean batch':>12}{'mean wait ms':>14}")
+        variants = [("before", "/before/predict/risk", None), ("window=0", "/api/v1/predict/risk", 0.0)]
+        variants.append((f"window={WINDOW_MS:g}ms", "/api/v1/predict/risk", WINDOW_MS))
+        for name, path, window in variants:
+            if window is not None:
+                risk_batcher.window = window / 1000
+            batches0, items0, wait0 = _totals()
+            rps = await run(client, path)
+            batches1, items1, wait1 = _totals()
+            if batches1 > batches0:
+                mean_batch = f"{(items1 - items0) / (batches1 - batches0):.1f}"
+                mean_wait = f"{(wait1 - wait0) / (items1 - items0) * 1000:.2f}"
+            else:
+                mean_batch = mean_wait = "-"
+            print(f"{name:<14}{rps:>10.0f}{mean_batch:>12}{mean_wait:>14}")
+
+
+def main() -> int:
+    asyncio.run(main_async())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Mixed read/write load against the "dev" and "production" SQLite profiles.
+
+Writers insert single telemetry events (one commit each, like /telemetry/ingest),
+readers page /telemetry/events-style queries. Each profile and mode gets a
+fresh temp DB. Two modes:
+
+  saturated  writers and readers loop flat out: throughput. Latency here is
+             mostly threads queueing for the CPU and the GIL, and it grows
+             with the work a profile gets through, so it isn't compared.
+  paced      both profiles get the same offered load (write_rate and
+             read_rate per second, spread over the threads): latency.
+
+    python -m scripts.bench_sqlite_profile [seconds] [writers] [readers] [write_rate] [read_rate]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from api.db.base import Base
+from api.db.models import TelemetryEvent
+from api.db.session import create_engines
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+WRITERS = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+READERS = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+WRITE_RATE = float(sys.argv[4]) if len(sys.argv) > 4 else 80
+READ_RATE = float(sys.argv[5]) if len(sys.argv) > 5 else 400
+SEED_ROWS = 50_000
+DEVICES = [f"device-{i:03d}" for i in range(200)]
+
+
+def _event(rng: random.Random) -> dict:
+    return {
+        "device_id": rng.choice(DEVICES),
+        "temperature": rng.randrange(30, 90),
+        "packet_loss": rng.randrange(10),
+        "audio_dropouts": rng.randrange(6),
+        "error_code": None,
+    }
+
+
+def _pace(rate: float, threads: int) -> Callable[[], None]:
+    """Sleeps until the thread's next slot at rate/threads per second (no-op when rate is 0)."""
+    interval = threads / rate if rate else 0.0
+    next_at = [time.perf_counter()]
+
+    def wait() -> None:
+        if interval:
+            next_at[0] += interval
+            time.sleep(max(0.0, next_at[0] - time.perf_counter()))
+
+    return wait
+
+
+def run(profile: str, write_rate: float = 0, read_rate: float = 0) -> Dict[str, float]:
+    tmp = tempfile.mkdtemp()
+    url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    write_engine, read_engine = create_engines(url, profile)
+    Base.metadata.create_all(write_engine)
+
+    rng = random.Random(1)
+    with write_engine.begin() as conn:
+        conn.execute(insert(TelemetryEvent), [_event(rng) for _ in range(SEED_ROWS)])
+
+    Writer = sessionmaker(bind=write_engine)
+    Reader = sessionmaker(bind=read_engine)
+    stop = time.perf_counter() + SECONDS
+    write_lat: List[float] = []
+    read_lat: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def writer(seed: int) -> None:
+        r = random.Random(seed)
+        wait = _pace(write_rate, WRITERS)
+        while time.perf_counter() < stop:
+            wait()
+            t0 = time.perf_counter()
+            try:
+                with Writer() as db:
+                    db.execute(insert(TelemetryEvent), _event(r))
+                    db.commit()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                write_lat.append(time.perf_counter() - t0)
+
+    def reader(seed: int) -> None:
+        r = random.Random(seed)
+        wait = _pace(read_rate, READERS)
+        while time.perf_counter() < stop:
+            wait()
+            t0 = time.perf_counter()
+            try:
+                with Reader() as db:
+                    db.execute(
+                        select(TelemetryEvent)
+                        .where(TelemetryEvent.device_id == r.choice(DEVICES))
+                        .order_by(TelemetryEvent.id.desc())
+                        .limit(50)
+                    ).all()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                read_lat.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    write_engine.dispose()
+    read_engine.dispose()
+
+    def p(lat: List[float], q: int) -> float:
+        return statistics.quantiles(lat, n=100)[q - 1] * 1000 if len(lat) > 1 else float("nan")
+
+    return {
+        "writes/s": len(write_lat) / SECONDS,
+        "reads/s": len(read_lat) / SECONDS,
+        "write p95 ms": p(write_lat, 95),
+        "read p50 ms": p(read_lat, 50),
+        "read p95 ms": p(read_lat, 95),
+        "read p99 ms": p(read_lat, 99),
+        "errors": errors[0],
+    }
+
+
+def _table(title: str, results: Dict[str, Dict[str, float]], metrics: List[str]) -> None:
+    print(f"{title:<14}{'dev':>12}{'production':>12}")
+    for metric in metrics:
+        print(f"{metric:<14}{results['dev'][metric]:>12,.1f}{results['production'][metric]:>12,.1f}")
+
+
+if __name__ == "__main__":
+    print(f"{SECONDS:g}s, {WRITERS} writers, {READERS} readers, {SEED_ROWS} seed rows, {os.cpu_count()} CPUs")
+    profiles = ("dev", "production")
+    saturated = {profile: run(profile) for profile in profiles}
+    _table("saturated", saturated, ["writes/s", "reads/s", "errors"])
+    paced = {profile: run(profile, WRITE_RATE, READ_RATE) for profile in profiles}
+    _table(f"paced {WRITE_RATE:g}w+{READ_RATE:g}r/s", paced, [
+        "writes/s", "reads/s", "write p95 ms", "read p50 ms", "read p95 ms", "read p99 ms", "errors",
+    ])
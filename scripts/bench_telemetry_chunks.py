@@ -0,0 +1,144 @@
+"""
+Compression ratio and scan speed of the per-device chunk format (telemetry_chunks).
+
+Builds a synthetic fleet history (readings every ~60s with server-side jitter,
+random-walk metrics, rare error codes, per-device sequence numbers as message
+ids), encodes it device by device into one chunk file, then compares bytes/row
+with the live SQLite table (measured on a sample, indexes included) and times:
+
+  - full scan of the metric columns
+  - full scan of every column
+  - one device over one day (chunks skipped via the index)
+  - temperature >= 88 fleet-wide (chunks skipped via header min/max)
+
+Rates are dataset rows / elapsed, so skipped chunks count as scanned.
+
+    python -m scripts.bench_telemetry_chunks [events] [devices]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+
+from api.db.base import Base
+from api.db.models import TelemetryEvent
+from api.services.telemetry_chunks import ChunkFile, ChunkFileWriter
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+DEVICES = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+SQLITE_SAMPLE = 200_000
+ERROR_CODES = [f"E{i:02d}" for i in range(20)]
+START = datetime(2026, 1, 1)
+START_US = (START - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+METRIC_COLUMNS = ("temperature", "packet_loss", "audio_dropouts")
+
+
+def device_history(rng: np.random.Generator, device: int, n: int) -> dict:
+    # ~60s reporting interval, server receive time jitters by a few ms
+    created_at = START_US + np.arange(n, dtype=np.int64) * 60_000_000 + rng.normal(0, 5_000, n).astype(np.int64)
+    temperature = np.clip(55 + np.cumsum(rng.integers(-1, 2, n)), 20, 95).astype(np.int32)
+    packet_loss = np.clip(np.cumsum(rng.integers(-1, 2, n)), 0, 20).astype(np.int32)
+    audio_dropouts = (rng.random(n) < 0.05).astype(np.int32) * rng.integers(1, 6, n).astype(np.int32)
+    errors = np.where(rng.random(n) < 0.02, rng.integers(0, len(ERROR_CODES), n), -1)
+    return {
+        "device_id": f"site-{device // 50:03d}/room-{device % 50:02d}/codec-{device:05d}",
+        "created_at": created_at,
+        # global ids interleave across the fleet, so per-device deltas are ~fleet size
+        "id": np.arange(n, dtype=np.int64) * DEVICES + device + 1,
+        "temperature": temperature,
+        "packet_loss": packet_loss,
+        "audio_dropouts": audio_dropouts,
+        "error_code": [None if e < 0 else ERROR_CODES[e] for e in errors],
+        "message_id": [str(i) for i in range(n)],
+    }
+
+
+def sqlite_bytes_per_row(rows: list) -> float:
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "sample.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[TelemetryEvent.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(TelemetryEvent), rows)
+    engine.dispose()
+    return os.path.getsize(path) / len(rows)
+
+
+def timed(label: str, rows: int, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{elapsed * 1000:>10.1f} ms{rows / elapsed / 1e6:>10.1f} M rows/s")
+    return result
+
+
+def main() -> None:
+    rng = np.random.default_rng(7)
+    per_device = EVENTS // DEVICES
+    print(f"{per_device * DEVICES:,} events, {DEVICES} devices")
+
+    writer = ChunkFileWriter()
+    sample = []
+    start = time.perf_counter()
+    for device in range(DEVICES):
+        h = device_history(rng, device, per_device)
+        writer.add_device(
+            h["device_id"], h["created_at"], h["id"],
+            {m: h[m] for m in METRIC_COLUMNS}, h["error_code"], h["message_id"],
+        )
+        if len(sample) < SQLITE_SAMPLE:
+            take = min(per_device, SQLITE_SAMPLE - len(sample))
+            sample += [
+                {
+                    "device_id": h["device_id"],
+                    "temperature": int(h["temperature"][i]),
+                    "packet_loss": int(h["packet_loss"][i]),
+                    "audio_dropouts": int(h["audio_dropouts"][i]),
+                    "error_code": h["error_code"][i],
+                    "message_id": h["message_id"][i],
+                    "created_at": START + timedelta(microseconds=int(h["created_at"][i] - START_US)),
+                }
+                for i in range(take)
+            ]
+    blob = writer.finish()
+    encode_s = time.perf_counter() - start
+    total = per_device * DEVICES
+
+    chunk_bpr = len(blob) / total
+    sqlite_bpr = sqlite_bytes_per_row(sample)
+    print(f"encode (incl. data generation)    {encode_s:>10.1f} s")
+    print(f"chunk file                        {len(blob) / 1e6:>10.1f} MB   {chunk_bpr:>6.2f} bytes/row")
+    print(f"sqlite table + indexes (sample)   {sqlite_bpr * total / 1e6:>10.1f} MB   {sqlite_bpr:>6.2f} bytes/row")
+    print(f"compression ratio                 {sqlite_bpr / chunk_bpr:>10.1f}x")
+    print()
+
+    f = ChunkFile(blob)
+    timed("scan metrics (3 columns)", total, lambda: f.scan(columns=METRIC_COLUMNS))
+    timed("scan all columns", total, lambda: f.scan())
+
+    device = f.index[len(f.index) // 2]["device_id"]
+    since = START_US + 2 * 86_400_000_000
+    until = since + 86_400_000_000
+
+    def one_device_day():
+        cols = f.scan(device, since, until)
+        m = (cols["created_at"] >= since) & (cols["created_at"] < until)
+        return int(m.sum())
+
+    hits = timed("one device, one day", total, one_device_day)
+    print(f"{'':<34}{hits} rows matched")
+
+    def hot_readings():
+        cols = f.scan(header_filter=lambda h: h.temperature[1] >= 88, columns=("created_at", "temperature"))
+        return int((cols["temperature"] >= 88).sum()), len(cols["temperature"])
+
+    hits, decoded = timed("temperature >= 88 (header skip)", total, hot_readings)
+    print(f"{'':<34}{hits} rows matched, {decoded / total:.1%} of rows decoded")
+
+
+if __name__ == "__main__":
+    main()
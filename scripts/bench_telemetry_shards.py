@@ -0,0 +1,95 @@
+"""
+Ingest throughput as the telemetry shard count grows.
+
+Several worker processes (like `uvicorn --workers`) each run concurrent clients
+that push batches through ShardRouter.save_columns, the path
+/telemetry/ingest/batch takes. All workers share the same shard files under the
+production SQLite profile, so with one shard every commit queues on a single
+file lock; each N gets fresh files in its own temp dir.
+
+    python -m scripts.bench_telemetry_shards [seconds] [workers] [clients_per_worker] [batch_size]
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from api.services.telemetry_codec import TelemetryColumns
+from api.services.telemetry_shards import build_router
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+CLIENTS = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+BATCH = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+SHARD_COUNTS = (1, 2, 4, 8)
+DEVICES = [f"device-{i:04d}" for i in range(1000)]
+
+
+def _batch(rng: random.Random, client: int, seq: int) -> TelemetryColumns:
+    return TelemetryColumns(
+        device_id=[rng.choice(DEVICES) for _ in range(BATCH)],
+        temperature=[rng.randrange(30, 90) for _ in range(BATCH)],
+        packet_loss=[rng.randrange(10) for _ in range(BATCH)],
+        audio_dropouts=[rng.randrange(6) for _ in range(BATCH)],
+        error_code=[None] * BATCH,
+        message_id=[f"{client}-{seq}-{i}" for i in range(BATCH)],
+    )
+
+
+async def _worker(worker: int, count: int, template: str, start: float, stop: float) -> int:
+    router = build_router(count, template, "production")
+    rows = 0
+    await asyncio.sleep(max(0.0, start - time.time()))
+
+    async def client(n: int) -> None:
+        nonlocal rows
+        rng = random.Random(n)
+        seq = 0
+        while time.time() < stop:
+            results = await router.save_columns(_batch(rng, n, seq))
+            rows += len(results)
+            seq += 1
+
+    await asyncio.gather(*(client(worker * CLIENTS + n) for n in range(CLIENTS)))
+    await router.dispose()
+    return rows
+
+
+def _worker_main(worker: int, count: int, template: str, start: float, stop: float, out) -> None:
+    out.put(asyncio.run(_worker(worker, count, template, start, stop)))
+
+
+def run(count: int) -> float:
+    tmp = tempfile.mkdtemp()
+    template = "sqlite:///" + os.path.join(tmp, "t_{shard}_of_{count}.db")
+    build_router(count, template, "production").ensure_schema()
+
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    # common wall-clock window for all workers, leaving time for them to start
+    start = time.time() + 2
+    stop = start + SECONDS
+    procs = [ctx.Process(target=_worker_main, args=(w, count, template, start, stop, out)) for w in range(WORKERS)]
+    for p in procs:
+        p.start()
+    rows = sum(out.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return rows / SECONDS
+
+
+def main() -> None:
+    print(f"{SECONDS:g}s per run, {WORKERS} workers x {CLIENTS} clients, {BATCH} rows/batch")
+    print(f"{'shards':>6}{'rows/s':>12}{'vs 1':>8}")
+    baseline = None
+    for count in SHARD_COUNTS:
+        rate = run(count)
+        baseline = baseline or rate
+        print(f"{count:>6}{rate:>12,.0f}{rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
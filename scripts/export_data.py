@@ -0,0 +1,68 @@
+"""
+Export telemetry events or copilot runs to a Parquet / Arrow IPC file.
+
+Same streaming path as GET /api/v1/export/*, but reads the databases directly,
+so it also works for full dumps (every user's copilot runs) and never holds more
+than one record batch in memory.
+
+    python -m scripts.export_data telemetry out.parquet [--device ID] [--since ISO] [--until ISO]
+    python -m scripts.export_data copilot-runs out.arrows --format arrow [--user-id N]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from api.services.export import (
+    copilot_run_schema,
+    iter_copilot_run_batches,
+    iter_telemetry_batches,
+    stream_export,
+    telemetry_schema,
+)
+from api.services.telemetry_archive import naive_utc, telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=["telemetry", "copilot-runs"])
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default=None,
+                        help="defaults from the file extension (.parquet, else arrow)")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--batch-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "arrow")
+    since, until = naive_utc(args.since), naive_utc(args.until)
+    if args.dataset == "telemetry":
+        schema = telemetry_schema()
+        batches = iter_telemetry_batches(
+            telemetry_shards, telemetry_archive, args.device, since, until, args.batch_rows
+        )
+    else:
+        schema = copilot_run_schema()
+        batches = iter_copilot_run_batches(args.user_id, since, until, args.batch_rows)
+
+    rows = [0]
+
+    def counted():
+        for batch in batches:
+            rows[0] += batch.num_rows
+            yield batch
+
+    start = time.perf_counter()
+    with open(args.output, "wb") as f:
+        for data in stream_export(counted(), schema, fmt):
+            f.write(data)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.output)
+    print(f"wrote {rows[0]:,} rows, {size / 1e6:.1f} MB to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
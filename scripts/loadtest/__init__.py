@@ -0,0 +1 @@
+"""Load-test suite: python -m scripts.loadtest (see __main__ for options)."""
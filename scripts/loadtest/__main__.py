@@ -0,0 +1,296 @@
+"""
+Load test: boot the API against a temp SQLite DB and a fake Ollama, drive a
+request mix, record per-route throughput and latency percentiles, and compare
+with a stored baseline.
+
+The app runs under uvicorn in a subprocess (api.main:create_app, factory mode)
+with a freshly migrated database, a few seeded KB docs and pre-ingested
+telemetry; the load generator is an asyncio/httpx client pool in this process.
+Both share the machine, so compare results only against baselines recorded on
+the same hardware.
+
+    python -m scripts.loadtest [--mix mixed] [--duration 30] [--concurrency 16]
+        [--llm-latency-ms 800] [--out loadtest_results.json]
+        [--baseline scripts/loadtest/baseline.json] [--save-baseline] [--tolerance 0.25]
+        [--env SQLITE_PROFILE=production ...]
+
+Exit status is 1 when a route regressed against the baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from scripts.loadtest import fake_ollama
+from scripts.loadtest.scenarios import MIXES, OPS, LoadContext, picker
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+KB_DOCS = [
+    ("Audio dropouts on Dante-enabled devices", "AV Ops Handbook",
+     "Frequent audio dropouts on Dante devices are often caused by clock sync mismatch, faulty Ethernet "
+     "cables or switch QoS misconfiguration. Verify the master clock, replace Cat6 cables, enable QoS and IGMP snooping."),
+    ("Packet loss troubleshooting for AV networks", "Network Ops Guide",
+     "Packet loss above 5% impacts real-time AV streams. Check congested switch ports, duplex mismatches and "
+     "broadcast storms; inspect port counters and separate AV traffic into its own VLAN."),
+    ("Codec overheating", "Hardware Runbook",
+     "High device temperature usually means blocked airflow, failed fans or excessive DSP load. Inspect cooling "
+     "fans, improve airflow and reduce processing load."),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_database(workdir: str) -> str:
+    from alembic import command
+    from alembic.config import Config
+
+    url = f"sqlite:///{workdir}/loadtest.db"
+    cfg = Config(str(ROOT / "alembic.ini"))
+    cfg.set_main_option("sqlalchemy.url", url)
+    command.upgrade(cfg, "head")
+
+    conn = sqlite3.connect(f"{workdir}/loadtest.db")
+    with conn:  # kb_docs triggers keep kb_docs_fts in sync
+        conn.executemany(
+            "INSERT INTO kb_docs (title, source, content, created_at) VALUES (?, ?, ?, ?)",
+            [(t, s, c, datetime.utcnow()) for t, s, c in KB_DOCS],
+        )
+    conn.close()
+    return url
+
+
+def start_server(workdir: str, db_url: str, llm_url: str, workers: int, extra_env: Dict[str, str]):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": db_url,
+        "OLLAMA_URL": llm_url,
+        "DEBUG": "false",
+        "TELEMETRY_ARCHIVE_DIR": f"{workdir}/archive",
+        "TELEMETRY_SHARD_URL_TEMPLATE": f"sqlite:///{workdir}/telemetry_{{shard}}_of_{{count}}.db",
+        # a few users and devices stand in for a fleet: per-tenant limits would cap the test, not the server
+        "INGEST_RATE_PER_DEVICE": "0",
+        "COPILOT_RATE_PER_USER": "0",
+        "LOGIN_RATE_PER_USER": "0",
+        **extra_env,
+    }
+    cmd = [
+        sys.executable, "-m", "uvicorn", "api.main:create_app", "--factory",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    log = open(f"{workdir}/server.log", "wb")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited early, see {workdir}/server.log")
+        try:
+            # /ready, not /health: measure a warmed instance (one worker's answer, with --workers > 1)
+            if httpx.get(f"{base}/ready", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"server did not come up, see {workdir}/server.log")
+
+
+async def setup_context(base: str, users: int, devices: int, seed_events: int) -> LoadContext:
+    ctx = LoadContext(devices=[f"device-{i:03d}" for i in range(devices)], tokens=[], users=[])
+    async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+        for i in range(users):
+            user = {"email": f"load{i}@example.com", "password": "loadtest-password"}
+            r = await client.post("/api/v1/auth/register", json=user)
+            r.raise_for_status()
+            r = await client.post("/api/v1/auth/login", data={"username": user["email"], "password": user["password"]})
+            r.raise_for_status()
+            ctx.users.append(user)
+            ctx.tokens.append(r.json()["access_token"])
+        for start in range(0, seed_events, 500):
+            items = [ctx.reading() for _ in range(min(500, seed_events - start))]
+            (await client.post("/api/v1/telemetry/ingest/batch", json={"items": items})).raise_for_status()
+    return ctx
+
+
+async def drive(base: str, ctx: LoadContext, mix: str, duration: float, concurrency: int, timeout: float) -> dict:
+    pick = picker(mix)
+    samples: Dict[str, List[float]] = {name: [] for name in MIXES[mix]}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in MIXES[mix]}
+    errors: Dict[str, int] = {name: 0 for name in MIXES[mix]}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=timeout, limits=limits) as client:
+        stop = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < stop:
+                name = pick()
+                start = time.perf_counter()
+                try:
+                    r = await OPS[name](ctx, client)
+                    code = str(r.status_code)
+                    failed = r.status_code >= 500
+                except httpx.HTTPError as e:
+                    code, failed = type(e).__name__, True
+                samples[name].append((time.perf_counter() - start) * 1000)
+                statuses[name][code] = statuses[name].get(code, 0) + 1
+                errors[name] += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name, lat in samples.items():
+        if not lat:
+            continue
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        routes[name] = {
+            "requests": len(lat),
+            "rps": round(len(lat) / elapsed, 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "error_rate": round(errors[name] / len(lat), 4),
+            "status": statuses[name],
+        }
+    total = sum(len(v) for v in samples.values())
+    return {"elapsed_s": round(elapsed, 2), "total_rps": round(total / elapsed, 2), "routes": routes}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, tolerance: float, noise_ms: float) -> List[str]:
+    """Regressions: p95 up or throughput down by more than tolerance, or new server errors."""
+    problems = []
+    for name, cur in current["routes"].items():
+        base = baseline["routes"].get(name)
+        if base is None:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance) and cur["p95_ms"] - base["p95_ms"] > noise_ms:
+            problems.append(f"{name}: p95 {base['p95_ms']} -> {cur['p95_ms']} ms")
+        if cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {base['rps']} -> {cur['rps']} req/s")
+        if cur["error_rate"] > base["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+    return problems
+
+
+def print_table(result: dict, baseline: Optional[dict]) -> None:
+    print(f"{'route':<36}{'req':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>7}{'base p95':>10}")
+    for name, r in result["routes"].items():
+        base = (baseline or {}).get("routes", {}).get(name)
+        base_p95 = f"{base['p95_ms']:>10.1f}" if base else f"{'-':>10}"
+        print(
+            f"{name:<36}{r['requests']:>7}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            f"{r['p99_ms']:>9.1f}{r['error_rate']:>7.1%}{base_p95}"
+        )
+    print(f"{'total':<36}{'':>7}{result['total_rps']:>9.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AVOps API load test")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--seed-events", type=int, default=20_000)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--out", default="loadtest_results.json")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline for --mix")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--noise-ms", type=float, default=2.0, help="ignore p95 increases smaller than this")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra server settings")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    workdir = tempfile.mkdtemp(prefix="avops-loadtest-")
+    llm, _ = fake_ollama.start(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+    db_url = prepare_database(workdir)
+    proc, base = start_server(workdir, db_url, llm.url, args.workers, extra_env)
+    try:
+        ctx = asyncio.run(setup_context(base, args.users, args.devices, args.seed_events))
+        print(f"{args.mix}: {args.concurrency} clients for {args.duration:.0f}s against {base} (workdir {workdir})")
+        run = asyncio.run(drive(base, ctx, args.mix, args.duration, args.concurrency, args.timeout))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        llm.shutdown()
+
+    result = {
+        "mix": args.mix,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "llm_latency_ms": args.llm_latency_ms,
+            "env": extra_env,
+        },
+        **run,
+    }
+    Path(args.out).write_text(json.dumps(result, indent=2))
+
+    baselines = json.loads(Path(args.baseline).read_text()) if Path(args.baseline).exists() else {}
+    baseline = baselines.get(args.mix)
+    print_table(result, baseline)
+    print(f"results written to {args.out}")
+
+    if args.save_baseline:
+        baselines[args.mix] = result
+        Path(args.baseline).write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"baseline for '{args.mix}' saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"no baseline for '{args.mix}' in {args.baseline}")
+        return 0
+
+    problems = compare(result, baseline, args.tolerance, args.noise_ms)
+    for p in problems:
+        print(f"REGRESSION {p}")
+    if not problems:
+        print(f"no regressions vs baseline {baseline.get('commit')} (tolerance {args.tolerance:.0%})")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Stand-in for Ollama's /api/chat with configurable latency.
+
+Answers every chat request with a fixed, valid copilot JSON reply after
+latency_ms (± jitter_ms), so copilot runs exercise the full LLM path without a
+model. Threaded, so concurrent runs overlap like they would against Ollama.
+
+The startup warm-up's preload (/api/generate without a prompt) takes load_ms
+and marks the model as loaded in /api/ps, which /ready probes.
+
+    python -m scripts.loadtest.fake_ollama [--port 11434] [--latency-ms 800] [--jitter-ms 200] [--load-ms 0]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Set, Tuple
+
+REPLY = {
+    "diagnosis": ["Packet loss is elevated on the device uplink.", "Audio dropouts correlate with the loss."],
+    "next_steps": ["Check switch port counters.", "Verify QoS / DSCP marking for Dante traffic."],
+    "notes": "stub reply from scripts.loadtest.fake_ollama",
+}
+
+
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency_ms: float, jitter_ms: float, load_ms: float = 0) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.load_ms = load_ms
+        self.requests = 0
+        self.loaded: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def delay(self) -> float:
+        return max(0.0, random.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)) / 1000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOllama
+
+    def do_GET(self) -> None:
+        if self.path != "/api/ps":
+            self.send_error(404)
+            return
+        with self.server._lock:
+            models = [{"name": f"{m}:latest", "model": f"{m}:latest"} for m in sorted(self.server.loaded)]
+        self._reply({"models": models})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = json.loads(body or b"{}")
+        if self.path == "/api/generate" and not request.get("prompt"):
+            # preload: no generation, just the model load
+            time.sleep(self.server.load_ms / 1000)
+            with self.server._lock:
+                self.server.loaded.add(str(request.get("model")).split(":")[0])
+            self._reply({"model": request.get("model"), "response": "", "done": True})
+            return
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        with self.server._lock:
+            self.server.requests += 1
+        time.sleep(self.server.delay())
+        self._reply({
+            "model": request.get("model"),
+            "message": {"role": "assistant", "content": json.dumps(REPLY)},
+            "done": True,
+        })
+
+    def _reply(self, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:  # keep load-test output readable
+        pass
+
+
+def start(port: int = 0, latency_ms: float = 800, jitter_ms: float = 200) -> Tuple[FakeOllama, threading.Thread]:
+    server = FakeOllama(port, latency_ms, jitter_ms)
+    thread = threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--load-ms", type=float, default=0, help="model preload time")
+    args = parser.parse_args()
+
+    server = FakeOllama(args.port, args.latency_ms, args.jitter_ms, args.load_ms)
+    print(f"fake Ollama on {server.url} ({args.latency_ms:.0f} ± {args.jitter_ms:.0f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Request mixes for the load test.
+
+Each operation is one request against the API (a coroutine taking the shared
+LoadContext and an httpx.AsyncClient); MIXES weight them into workloads. The
+operation name is the route label in the results file, so renaming one breaks
+comparison with stored baselines.
+"""
+from __future__ import annotations
+
+import itertools
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+
+
+@dataclass
+class LoadContext:
+    devices: List[str]
+    tokens: List[str]
+    users: List[dict]
+    run_ids: List[int] = field(default_factory=list)
+    batch_size: int = 50
+    _seq: "itertools.count" = field(default_factory=itertools.count)
+
+    def reading(self, device_id: Optional[str] = None) -> dict:
+        return {
+            "device_id": device_id or random.choice(self.devices),
+            "temperature": random.randrange(35, 90),
+            "packet_loss": random.randrange(0, 12),
+            "audio_dropouts": random.randrange(0, 6),
+            "error_code": random.choice([None] * 9 + ["E42"]),
+            "message_id": f"lt-{next(self._seq)}",
+        }
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {random.choice(self.tokens)}"}
+
+
+Op = Callable[[LoadContext, httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+async def ingest_single(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post(f"{API}/telemetry/ingest", json=ctx.reading())
+
+
+async def ingest_batch(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    items = [ctx.reading() for _ in range(ctx.batch_size)]
+    return await client.post(f"{API}/telemetry/ingest/batch", json={"items": items})
+
+
+async def events_page(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    params = {"limit": random.choice([50, 50, 200]), "offset": random.choice([0, 0, 0, 50, 200])}
+    if random.random() < 0.5:
+        params["device_id"] = random.choice(ctx.devices)
+    return await client.get(f"{API}/telemetry/events", params=params, headers=ctx.auth())
+
+
+async def latest(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    return await client.get(f"{API}/telemetry/latest/{random.choice(ctx.devices)}")
+
+
+async def copilot_run(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    task = f"Diagnose {random.choice(ctx.devices)} audio dropouts and packet loss"
+    r = await client.post(f"{API}/copilot/run", json={"task": task}, headers=ctx.auth())
+    if r.status_code == 200:
+        ctx.run_ids.append(r.json()["run_id"])
+    return r
+
+
+async def copilot_runs(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    params = {"limit": random.choice([20, 100])}
+    if random.random() < 0.5:
+        params["fields"] = "summary"
+    return await client.get(f"{API}/copilot/runs", params=params, headers=ctx.auth())
+
+
+async def copilot_run_get(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    if not ctx.run_ids:
+        return await copilot_runs(ctx, client)
+    # run ids are per user; a foreign id is a legitimate 404 and counted as such
+    return await client.get(f"{API}/copilot/runs/{random.choice(ctx.run_ids)}", headers=ctx.auth())
+
+
+async def login(ctx: LoadContext, client: httpx.AsyncClient) -> httpx.Response:
+    user = random.choice(ctx.users)
+    return await client.post(
+        f"{API}/auth/login", data={"username": user["email"], "password": user["password"]}
+    )
+
+
+OPS: Dict[str, Op] = {
+    "POST /telemetry/ingest": ingest_single,
+    "POST /telemetry/ingest/batch": ingest_batch,
+    "GET /telemetry/events": events_page,
+    "GET /telemetry/latest/{device_id}": latest,
+    "POST /copilot/run": copilot_run,
+    "GET /copilot/runs": copilot_runs,
+    "GET /copilot/runs/{run_id}": copilot_run_get,
+    "POST /auth/login": login,
+}
+
+# relative weights per operation
+MIXES: Dict[str, Dict[str, int]] = {
+    "mixed": {
+        "POST /telemetry/ingest": 30,
+        "POST /telemetry/ingest/batch": 5,
+        "GET /telemetry/events": 20,
+        "GET /telemetry/latest/{device_id}": 30,
+        "GET /copilot/runs": 8,
+        "GET /copilot/runs/{run_id}": 4,
+        "POST /copilot/run": 2,
+        "POST /auth/login": 1,
+    },
+    "ingest": {"POST /telemetry/ingest": 70, "POST /telemetry/ingest/batch": 30},
+    "read": {
+        "GET /telemetry/events": 40,
+        "GET /telemetry/latest/{device_id}": 40,
+        "GET /copilot/runs": 15,
+        "GET /copilot/runs/{run_id}": 5,
+    },
+    "copilot": {"POST /copilot/run": 50, "GET /copilot/runs": 30, "GET /copilot/runs/{run_id}": 20},
+    "login-burst": {"POST /auth/login": 100},
+}
+
+
+def picker(mix: str) -> Callable[[], str]:
+    weights = MIXES[mix]
+    names, cum = list(weights), list(itertools.accumulate(weights.values()))
+    return lambda: random.choices(names, cum_weights=cum)[0]
@@ -0,0 +1,208 @@
+"""
+Replay captured traffic (TRAFFIC_CAPTURE_ENABLED=true, see api/core/traffic_capture.py)
+against a target and compare latencies with the capture.
+
+Requests are re-issued in capture order. --speed 1 keeps the original spacing,
+--speed 10 compresses it tenfold and --speed max sends as fast as --concurrency
+allows. When a timed replay cannot keep up (all slots busy), requests start
+late; the worst lag is reported, as it means the target was not seeing the
+original traffic shape.
+
+Captures contain no credentials. Redacted Authorization headers are replaced
+with --token (or a token from --login email:password); redacted device
+signatures cannot be recreated, so replay signed ingest against a target with
+DEVICE_AUTH_REQUIRED=false. Password and token fields in bodies stay redacted,
+so login and register replay with the literal password "[redacted]": status
+mismatches on those routes (401 for users the replay didn't register itself,
+409 for emails the target already has) are expected. Writes replay the
+original bodies, so point this at a scratch database, not production.
+
+    python -m scripts.replay_traffic requests.jsonl [--url http://127.0.0.1:8000] [--speed 1|10|max]
+        [--concurrency 16] [--token ... | --login user@example.com:secret] [--limit N] [--out replay.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from api.core.traffic_capture import REDACTED
+
+
+def load_capture(path: str, limit: Optional[int] = None) -> List[dict]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "method" not in record or "path" not in record:
+                continue  # not a capture line
+            records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def _label(record: dict) -> str:
+    return f"{record['method']} {record.get('route') or record['path']}"
+
+
+def _request_args(record: dict, token: Optional[str]) -> dict:
+    headers = {}
+    for name, value in record.get("headers", {}).items():
+        if value != REDACTED:
+            headers[name] = value
+        elif name == "authorization" and token:
+            headers[name] = f"Bearer {token}"
+    if "body_b64" in record:
+        content = base64.b64decode(record["body_b64"])
+    else:
+        content = record.get("body", "").encode("utf-8")
+    url = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+    return {"method": record["method"], "url": url, "headers": headers, "content": content}
+
+
+async def replay(records: List[dict], url: str, speed: Optional[float], concurrency: int, token: Optional[str], timeout: float) -> dict:
+    results: List[dict] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    max_lag = 0.0
+
+    async with httpx.AsyncClient(base_url=url.rstrip("/"), timeout=timeout, limits=limits) as client:
+
+        async def send(record: dict) -> None:
+            try:
+                start = time.perf_counter()
+                try:
+                    r = await client.request(**_request_args(record, token))
+                    status = r.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                results.append({
+                    "label": _label(record),
+                    "captured_ms": record.get("duration_ms"),
+                    "replay_ms": (time.perf_counter() - start) * 1000,
+                    "captured_status": record.get("status"),
+                    "status": status,
+                })
+            finally:
+                slots.release()
+
+        t0 = datetime.fromisoformat(records[0]["ts"]) if records else None
+        started = time.perf_counter()
+        tasks = []
+        for record in records:
+            if speed:
+                due = started + (datetime.fromisoformat(record["ts"]) - t0).total_seconds() / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await slots.acquire()
+            if speed:
+                max_lag = max(max_lag, time.perf_counter() - due)
+            tasks.append(asyncio.create_task(send(record)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {"elapsed_s": round(elapsed, 2), "max_lag_ms": round(max_lag * 1000, 1), "results": results}
+
+
+def summarize(results: List[dict]) -> Dict[str, dict]:
+    by_label: Dict[str, List[dict]] = {}
+    for r in results:
+        by_label.setdefault(r["label"], []).append(r)
+    routes = {}
+    for label, rows in sorted(by_label.items(), key=lambda kv: -len(kv[1])):
+        captured = [r["captured_ms"] for r in rows if r["captured_ms"] is not None]
+        replayed = [r["replay_ms"] for r in rows]
+        cap50, cap95 = np.percentile(captured, [50, 95]) if captured else (float("nan"),) * 2
+        rep50, rep95 = np.percentile(replayed, [50, 95])
+        routes[label] = {
+            "requests": len(rows),
+            "captured_p50_ms": round(float(cap50), 2),
+            "captured_p95_ms": round(float(cap95), 2),
+            "replay_p50_ms": round(float(rep50), 2),
+            "replay_p95_ms": round(float(rep95), 2),
+            "p95_delta": round(float(rep95 / cap95 - 1), 4) if captured and cap95 > 0 else None,
+            "status_mismatches": sum(r["status"] != r["captured_status"] for r in rows),
+        }
+    return routes
+
+
+def print_table(routes: Dict[str, dict]) -> None:
+    print(f"{'route':<44}{'req':>7}{'cap p50':>9}{'cap p95':>9}{'rep p50':>9}{'rep p95':>9}{'Δp95':>8}{'status≠':>9}")
+    for label, r in routes.items():
+        delta = f"{r['p95_delta']:>+8.0%}" if r["p95_delta"] is not None else f"{'-':>8}"
+        print(
+            f"{label[:43]:<44}{r['requests']:>7}{r['captured_p50_ms']:>9.1f}{r['captured_p95_ms']:>9.1f}"
+            f"{r['replay_p50_ms']:>9.1f}{r['replay_p95_ms']:>9.1f}{delta}{r['status_mismatches']:>9}"
+        )
+
+
+def _login(url: str, credentials: str) -> str:
+    email, _, password = credentials.partition(":")
+    r = httpx.post(f"{url.rstrip('/')}/api/v1/auth/login", data={"username": email, "password": password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured API traffic and compare latencies")
+    parser.add_argument("capture", help="JSONL written by the traffic capture middleware")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", default="1", help="time scale (1, 10, ...) or 'max'")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--token", help="bearer token for requests whose Authorization was redacted")
+    parser.add_argument("--login", metavar="EMAIL:PASSWORD", help="log in to the target to get --token")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--include-truncated", action="store_true", help="also send bodies cut at capture time")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--out", help="write per-route results as JSON")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    records = load_capture(args.capture, args.limit)
+    truncated = sum(1 for r in records if r.get("body_truncated"))
+    if truncated and not args.include_truncated:
+        records = [r for r in records if not r.get("body_truncated")]
+        print(f"skipping {truncated} requests with truncated bodies (--include-truncated to send them)")
+    if not records:
+        print("nothing to replay")
+        return 1
+    token = args.token or (_login(args.url, args.login) if args.login else None)
+
+    pace = "max speed" if speed is None else f"{args.speed}x"
+    span = (datetime.fromisoformat(records[-1]["ts"]) - datetime.fromisoformat(records[0]["ts"])).total_seconds()
+    print(f"replaying {len(records):,} requests (captured over {span:.1f}s) at {pace} against {args.url}")
+    run = asyncio.run(replay(records, args.url, speed, args.concurrency, token, args.timeout))
+    routes = summarize(run["results"])
+    print_table(routes)
+    print(f"\n{len(records):,} requests in {run['elapsed_s']}s", end="")
+    print(f", max schedule lag {run['max_lag_ms']} ms" if speed else "")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "capture": args.capture,
+                "target": args.url,
+                "speed": args.speed,
+                "concurrency": args.concurrency,
+                "elapsed_s": run["elapsed_s"],
+                "max_lag_ms": run["max_lag_ms"],
+                "routes": routes,
+            }, f, indent=2)
+        print(f"results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Copy telemetry_events from the current shard layout into a new shard count.
+
+The source layout is TELEMETRY_SHARDS / TELEMETRY_SHARD_URL_TEMPLATE from the
+environment (1 = the main database). Rows are re-routed by device hash and keep
+created_at and message_id; event ids are renumbered above every archived id, so
+clients holding old ids must re-read them. Stop ingest while this runs, then
+restart the API with TELEMETRY_SHARDS=<new_count>.
+
+    python -m scripts.reshard_telemetry <new_count> [target_url_template]
+
+The target shards must be empty; the default template already includes the
+shard count in the file name, so old and new layouts never share a file.
+"""
+import sys
+import time
+
+from sqlalchemy import func, insert, select
+
+from api.core.config import settings
+from api.db.models import TelemetryEvent
+from api.services.telemetry_archive import telemetry_archive
+from api.services.telemetry_shards import build_router, shard_index
+
+BATCH_SIZE = 5000
+
+
+def _count(router) -> int:
+    total = 0
+    for shard in router.shards:
+        with shard.ReadSession() as db:
+            total += db.execute(select(func.count(TelemetryEvent.id))).scalar_one()
+    return total
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    new_count = int(sys.argv[1])
+    template = sys.argv[2] if len(sys.argv) > 2 else None
+
+    source = build_router(settings.telemetry_shards)
+    if new_count == 1 and template is None:
+        target = build_router(1)
+    else:
+        target = build_router(new_count, template or settings.telemetry_shard_url_template, "production")
+
+    source_urls = {str(s.engine.url) for s in source.shards}
+    if source_urls & {str(s.engine.url) for s in target.shards}:
+        sys.exit("Source and target layouts share a database file")
+
+    target.ensure_schema()
+    if _count(target):
+        sys.exit("Target shards are not empty")
+    target.ensure_ids_above(telemetry_archive.max_id)
+
+    expected = _count(source)
+    print(f"resharding {expected} events: {source.count} -> {target.count} shards")
+
+    start = time.perf_counter()
+    copied = 0
+    for s in range(source.count):
+        for batch in source.iter_shard_rows(s, BATCH_SIZE):
+            by_target = {}
+            for r in batch:
+                by_target.setdefault(shard_index(r.device_id, target.count), []).append({
+                    "device_id": r.device_id,
+                    "temperature": r.temperature,
+                    "packet_loss": r.packet_loss,
+                    "audio_dropouts": r.audio_dropouts,
+                    "error_code": r.error_code,
+                    "message_id": r.message_id,
+                    "created_at": r.created_at,
+                })
+            for t, rows in by_target.items():
+                with target.shards[t].engine.begin() as conn:
+                    conn.execute(insert(TelemetryEvent), rows)
+            copied += len(batch)
+            print(f"  {copied}/{expected}", end="\r")
+
+    actual = _count(target)
+    elapsed = time.perf_counter() - start
+    print(f"copied {copied} events in {elapsed:.1f}s ({copied / max(elapsed, 1e-9):,.0f}/s)")
+    for shard in target.shards:
+        with shard.ReadSession() as db:
+            n = db.execute(select(func.count(TelemetryEvent.id))).scalar_one()
+        print(f"  shard {shard.index}: {n} events  {shard.engine.url}")
+
+    if actual != expected:
+        sys.exit(f"Count mismatch: source {expected}, target {actual}")
+    print(f"done; set TELEMETRY_SHARDS={target.count} and restart the API")
+    print("the source rows are left in place; the API warns at startup while the main database still has them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Synthetic AV fleet telemetry with fault injection, for scale tests.
+
+The fleet is laid out as sites > rooms > devices (device ids stay
+"device-NNNNN" so copilot tasks can reference them). Every device reports once
+per --interval seconds; readings are generated tick by tick for the whole fleet
+(chronological, like production ingest) from a seeded numpy Generator, so the
+same arguments always produce the same stream.
+
+Baseline behaviour: per-device temperature with a diurnal cycle, low packet
+loss, Poisson audio dropouts that follow loss, and rare random error codes.
+Injected faults:
+
+  switch     a room's switch fails: every device in the room sees heavy packet
+             loss, dropouts and E42 (network) errors for the outage
+  thermal    a device's temperature drifts upward from a start day (failing fan)
+  burst      a device emits one error code repeatedly for a while
+
+Modes:
+
+  bulk   insert straight into telemetry_events (through the shard router, so
+         TELEMETRY_SHARDS applies) with simulated created_at: months of history
+         in minutes. Needs a migrated database; skips the idempotency check,
+         so load into an empty table.
+  push   POST /telemetry/ingest/batch at --rate events/s (json, msgpack or
+         x-avops-frame); created_at is server time. Readings carry seq, so a
+         re-run is deduplicated by the API.
+  dump   write TelemetryPayload NDJSON (with a "ts" field) to --out, e.g. for
+         /telemetry/ingest/stream
+
+--faults-out writes the topology and the injected fault schedule as JSON, the
+ground truth for anomaly-detection tests.
+
+    python -m scripts.simulate_fleet bulk [--devices 1000] [--days 7] [--interval 300] [--seed 7]
+    python -m scripts.simulate_fleet push --url http://127.0.0.1:8000 [--rate 2000] [--batch 500]
+    python -m scripts.simulate_fleet dump --out fleet.ndjson
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+ERROR_CODES = ["E10", "E11", "E17", "E23", "E31", "E42", "E55", "E61"]
+NETWORK_ERROR = "E42"
+
+
+@dataclass
+class FleetConfig:
+    devices: int = 1000
+    devices_per_room: int = 4
+    rooms_per_site: int = 25
+    start: datetime = datetime(2026, 1, 1)
+    days: float = 7
+    interval_s: int = 300
+    seed: int = 7
+    # fault injection rates
+    switch_failures_per_room_year: float = 2.0
+    switch_outage_hours: float = 3.0  # mean, exponential
+    thermal_drift_fraction: float = 0.02
+    thermal_drift_per_day: Tuple[float, float] = (0.3, 1.5)  # degrees C/day, uniform
+    error_bursts_per_device_year: float = 4.0
+    error_burst_hours: float = 1.0  # mean, exponential
+    random_error_rate: float = 0.001
+
+
+@dataclass
+class Fault:
+    kind: str  # switch | thermal | burst
+    start: datetime
+    end: Optional[datetime]
+    devices: List[str]
+    room: Optional[str] = None
+    error_code: Optional[str] = None
+    drift_per_day: Optional[float] = None
+
+
+class FleetSimulator:
+    def __init__(self, config: FleetConfig) -> None:
+        self.config = c = config
+        self.rng = np.random.default_rng(c.seed)
+        n = c.devices
+        self.device_ids = [f"device-{i:05d}" for i in range(n)]
+        self.room = np.arange(n) // c.devices_per_room
+        self.rooms = int(self.room[-1]) + 1 if n else 0
+        self.room_names = [
+            f"site-{r // c.rooms_per_site:03d}/room-{r % c.rooms_per_site:02d}" for r in range(self.rooms)
+        ]
+        self.ticks = int(c.days * 86400 // c.interval_s)
+
+        rng = self.rng
+        self.base_temp = rng.normal(45, 4, n)
+        self.base_loss = rng.exponential(0.4, n)
+        # per-device shift of the diurnal peak (hours)
+        self.phase = rng.uniform(-1, 1, n)
+
+        self.faults: List[Fault] = []
+        self._switch = self._schedule_switch_failures()
+        self._drift_start, self._drift_rate = self._schedule_thermal_drift()
+        self._bursts = self._schedule_error_bursts()
+
+    # ---------- fault schedule ----------
+
+    def _tick_time(self, tick: int) -> datetime:
+        return self.config.start + timedelta(seconds=tick * self.config.interval_s)
+
+    def _intervals(self, count: int, mean_hours: float) -> List[Tuple[int, int]]:
+        """count random [start, end) tick ranges with exponential durations."""
+        c = self.config
+        starts = self.rng.integers(0, max(self.ticks, 1), count)
+        lengths = np.maximum(1, self.rng.exponential(mean_hours * 3600 / c.interval_s, count)).astype(int)
+        return [(int(s), int(min(s + l, self.ticks))) for s, l in zip(starts, lengths)]
+
+    def _schedule_switch_failures(self) -> List[Tuple[int, int, int]]:
+        c = self.config
+        lam = c.switch_failures_per_room_year * c.days / 365
+        out = []
+        for room, count in enumerate(self.rng.poisson(lam, self.rooms)):
+            for s, e in self._intervals(int(count), c.switch_outage_hours):
+                out.append((room, s, e))
+                self.faults.append(Fault(
+                    "switch", self._tick_time(s), self._tick_time(e),
+                    [d for d, r in zip(self.device_ids, self.room) if r == room],
+                    room=self.room_names[room], error_code=NETWORK_ERROR,
+                ))
+        return out
+
+    def _schedule_thermal_drift(self) -> Tuple[np.ndarray, np.ndarray]:
+        c = self.config
+        n = c.devices
+        drifting = self.rng.random(n) < c.thermal_drift_fraction
+        start = np.where(drifting, self.rng.integers(0, max(self.ticks, 1), n), np.iinfo(np.int64).max)
+        rate = np.where(drifting, self.rng.uniform(*c.thermal_drift_per_day, n), 0.0)
+        for i in np.flatnonzero(drifting):
+            self.faults.append(Fault(
+                "thermal", self._tick_time(int(start[i])), None, [self.device_ids[i]],
+                drift_per_day=round(float(rate[i]), 3),
+            ))
+        return start, rate
+
+    def _schedule_error_bursts(self) -> List[Tuple[int, int, int, int]]:
+        c = self.config
+        lam = c.error_bursts_per_device_year * c.days / 365
+        out = []
+        for device, count in enumerate(self.rng.poisson(lam, c.devices)):
+            for s, e in self._intervals(int(count), c.error_burst_hours):
+                code = int(self.rng.integers(0, len(ERROR_CODES)))
+                out.append((device, s, e, code))
+                self.faults.append(Fault(
+                    "burst", self._tick_time(s), self._tick_time(e), [self.device_ids[device]],
+                    error_code=ERROR_CODES[code],
+                ))
+        return out
+
+    def _active(self, events: list, tick: int) -> list:
+        return [ev for ev in events if ev[1] <= tick < ev[2]]
+
+    # ---------- readings ----------
+
+    def tick(self, t: int) -> Dict[str, np.ndarray]:
+        """All devices' readings at tick t (arrays indexed by device)."""
+        c, rng, n = self.config, self.rng, self.config.devices
+        ts = self._tick_time(t)
+        hour = ts.hour + ts.minute / 60
+
+        days_drifting = np.clip((t - self._drift_start) * c.interval_s / 86400, 0, None)
+        temperature = (
+            self.base_temp
+            + 4 * np.sin(2 * np.pi * (hour - 9 + self.phase) / 24)
+            + self._drift_rate * days_drifting
+            + rng.normal(0, 0.8, n)
+        )
+        packet_loss = self.base_loss + rng.exponential(0.3, n)
+
+        # error index into ERROR_CODES, -1 = none
+        errors = np.where(rng.random(n) < c.random_error_rate, rng.integers(0, len(ERROR_CODES), n), -1)
+
+        for room, _, _ in self._active(self._switch, t):
+            members = self.room == room
+            k = int(members.sum())
+            packet_loss[members] += rng.uniform(8, 35, k)
+            errors[members] = np.where(rng.random(k) < 0.4, ERROR_CODES.index(NETWORK_ERROR), errors[members])
+
+        for device, _, _, code in self._active(self._bursts, t):
+            if rng.random() < 0.7:
+                errors[device] = code
+
+        audio_dropouts = rng.poisson(0.05 + 0.25 * packet_loss)
+        return {
+            "temperature": np.clip(np.rint(temperature), -20, 120).astype(np.int64),
+            "packet_loss": np.clip(np.rint(packet_loss), 0, 100).astype(np.int64),
+            "audio_dropouts": audio_dropouts.astype(np.int64),
+            "errors": errors,
+        }
+
+    def iter_ticks(self) -> Iterator[Tuple[int, datetime, Dict[str, np.ndarray]]]:
+        for t in range(self.ticks):
+            yield t, self._tick_time(t), self.tick(t)
+
+    def payloads(self, t: int, readings: Dict[str, np.ndarray]) -> List[dict]:
+        """TelemetryPayload dicts for one tick; seq is the tick, so replays dedupe."""
+        temps = readings["temperature"].tolist()
+        loss = readings["packet_loss"].tolist()
+        drops = readings["audio_dropouts"].tolist()
+        errs = readings["errors"].tolist()
+        return [
+            {
+                "device_id": d,
+                "temperature": temps[i],
+                "packet_loss": loss[i],
+                "audio_dropouts": drops[i],
+                "error_code": ERROR_CODES[errs[i]] if errs[i] >= 0 else None,
+                "seq": t,
+            }
+            for i, d in enumerate(self.device_ids)
+        ]
+
+    def ground_truth(self) -> dict:
+        c = self.config
+        return {
+            "config": {**asdict(c), "start": c.start.isoformat()},
+            "topology": {
+                name: self.device_ids[r * c.devices_per_room : (r + 1) * c.devices_per_room]
+                for r, name in enumerate(self.room_names)
+            },
+            "faults": [
+                {**asdict(f), "start": f.start.isoformat(), "end": f.end.isoformat() if f.end else None}
+                for f in sorted(self.faults, key=lambda f: (f.start, f.kind))
+            ],
+        }
+
+
+# ---------- modes ----------
+
+def run_bulk(sim: FleetSimulator, batch_rows: int) -> int:
+    from sqlalchemy import insert
+
+    from api.db.models import TelemetryEvent
+    from api.schemas.telemetry import SEQ_ID_PREFIX
+    from api.services.telemetry_shards import shard_index, telemetry_shards
+
+    router = telemetry_shards
+    router.ensure_schema()
+    shard_of = np.array([shard_index(d, router.count) for d in sim.device_ids])
+    pending: Dict[int, List[dict]] = {s: [] for s in range(router.count)}
+
+    def flush(s: int) -> None:
+        if pending[s]:
+            with router.shards[s].engine.begin() as conn:
+                conn.execute(insert(TelemetryEvent), pending[s])
+            pending[s] = []
+
+    total = 0
+    start = time.perf_counter()
+    for t, ts, readings in sim.iter_ticks():
+        for i, p in enumerate(sim.payloads(t, readings)):
+            s = int(shard_of[i])
+            pending[s].append({
+                "device_id": p["device_id"],
+                "temperature": p["temperature"],
+                "packet_loss": p["packet_loss"],
+                "audio_dropouts": p["audio_dropouts"],
+                "error_code": p["error_code"],
+                "message_id": f"{SEQ_ID_PREFIX}{t}",  # what ingest stores for seq=t
+                "created_at": ts,
+            })
+            if len(pending[s]) >= batch_rows:
+                flush(s)
+        total += sim.config.devices
+        if t % 50 == 0:
+            rate = total / max(time.perf_counter() - start, 1e-9)
+            print(f"  tick {t}/{sim.ticks}  {total:,} events  {rate:,.0f}/s", end="\r")
+    for s in pending:
+        flush(s)
+    return total
+
+
+def _encode_batch(items: List[dict], fmt: str) -> Tuple[bytes, str]:
+    if fmt == "frame":
+        from api.services.telemetry_codec import FRAME_CONTENT_TYPE, encode_frame
+
+        return encode_frame(items, with_seq=True), FRAME_CONTENT_TYPE
+    if fmt == "msgpack":
+        import msgpack
+
+        return msgpack.packb(items), "application/msgpack"
+    return json.dumps({"items": items}).encode(), "application/json"
+
+
+async def run_push(sim: FleetSimulator, url: str, rate: float, batch: int, concurrency: int, fmt: str) -> int:
+    import httpx
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    sent = failed = 0
+    start = time.perf_counter()
+
+    async def produce() -> None:
+        buf: List[dict] = []
+        n = 0
+        for t, _, readings in sim.iter_ticks():
+            for p in sim.payloads(t, readings):
+                buf.append(p)
+                if len(buf) == batch:
+                    n += len(buf)
+                    # pace to the target rate: batch k leaves no earlier than k * batch / rate
+                    delay = start + n / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await queue.put(buf)
+                    buf = []
+        if buf:
+            await queue.put(buf)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume(client: "httpx.AsyncClient") -> None:
+        nonlocal sent, failed
+        while (items := await queue.get()) is not None:
+            body, content_type = _encode_batch(items, fmt)
+            try:
+                r = await client.post(
+                    "/api/v1/telemetry/ingest/batch", content=body, headers={"Content-Type": content_type}
+                )
+                ok = r.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                sent += len(items)
+            else:
+                failed += len(items)
+            elapsed = time.perf_counter() - start
+            print(f"  {sent:,} sent  {failed:,} failed  {sent / max(elapsed, 1e-9):,.0f}/s", end="\r")
+
+    async with httpx.AsyncClient(base_url=url.rstrip("/"), timeout=60) as client:
+        await asyncio.gather(produce(), *(consume(client) for _ in range(concurrency)))
+    print()
+    if failed:
+        print(f"{failed:,} events failed (see server log)")
+    return sent
+
+
+def run_dump(sim: FleetSimulator, out: str) -> int:
+    total = 0
+    with open(out, "w") as f:
+        for t, ts, readings in sim.iter_ticks():
+            stamp = ts.isoformat()
+            for p in sim.payloads(t, readings):
+                f.write(json.dumps({**p, "ts": stamp}) + "\n")
+            total += sim.config.devices
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic AV fleet telemetry with fault injection")
+    parser.add_argument("mode", choices=["bulk", "push", "dump"])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--interval", type=int, default=300, help="seconds between readings per device")
+    parser.add_argument("--start", default="2026-01-01", help="simulated start (bulk/dump created_at)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--switch-failures", type=float, default=2.0, help="per room per year")
+    parser.add_argument("--thermal-drift", type=float, default=0.02, help="fraction of devices")
+    parser.add_argument("--error-bursts", type=float, default=4.0, help="per device per year")
+    parser.add_argument("--faults-out", help="write topology + fault schedule JSON here")
+    parser.add_argument("--batch-rows", type=int, default=20_000, help="bulk: rows per insert")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="push: API base URL")
+    parser.add_argument("--rate", type=float, default=2000, help="push: events per second")
+    parser.add_argument("--batch", type=int, default=500, help="push: events per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="push: requests in flight")
+    parser.add_argument("--format", choices=["json", "msgpack", "frame"], default="json", help="push: body format")
+    parser.add_argument("--out", default="fleet.ndjson", help="dump: output file")
+    args = parser.parse_args()
+
+    sim = FleetSimulator(FleetConfig(
+        devices=args.devices,
+        days=args.days,
+        interval_s=args.interval,
+        start=datetime.fromisoformat(args.start),
+        seed=args.seed,
+        switch_failures_per_room_year=args.switch_failures,
+        thermal_drift_fraction=args.thermal_drift,
+        error_bursts_per_device_year=args.error_bursts,
+    ))
+    kinds: Dict[str, int] = {}
+    for f in sim.faults:
+        kinds[f.kind] = kinds.get(f.kind, 0) + 1
+    print(
+        f"{args.devices:,} devices in {sim.rooms:,} rooms, {sim.ticks:,} ticks "
+        f"({sim.ticks * args.devices:,} readings); faults: {kinds or 'none'}"
+    )
+    if args.faults_out:
+        with open(args.faults_out, "w") as f:
+            json.dump(sim.ground_truth(), f, indent=1)
+        print(f"fault schedule written to {args.faults_out}")
+
+    start = time.perf_counter()
+    if args.mode == "bulk":
+        total = run_bulk(sim, args.batch_rows)
+    elif args.mode == "push":
+        total = asyncio.run(run_push(sim, args.url, args.rate, args.batch, args.concurrency, args.format))
+    else:
+        total = run_dump(sim, args.out)
+    elapsed = time.perf_counter() - start
+    print(f"\n{args.mode}: {total:,} events in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Train the /predict/risk model on telemetry history and publish a new version.
+
+Reads the last --days of telemetry_events (every live shard, plus archived
+partitions in range), builds features per reading from the device's previous
+--window readings (api/services/risk_model.py) and labels each reading with
+whether the device had an incident within --horizon-minutes. Fits a
+HistGradientBoostingClassifier (it takes NaN history features for a device's
+first readings as they are) and evaluates it on the newest --holdout share of
+time against the threshold rules.
+
+The version is written to RISK_MODEL_DIR and made current; running API
+processes swap it in at their next manifest check (RISK_MODEL_RELOAD_SECONDS).
+--dry-run trains and evaluates without publishing.
+
+    python -m scripts.train_risk_model [--days 30] [--window 12] [--horizon-minutes 60] [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import average_precision_score, roc_auc_score
+from sqlalchemy import select
+
+from api.db.models import TelemetryEvent
+from api.services.risk import rule_scores
+from api.services.risk_model import (
+    NO_ERROR,
+    feature_matrix,
+    history_windows,
+    incident_labels,
+    incidents,
+    risk_models,
+)
+from api.services.telemetry_archive import telemetry_archive
+from api.services.telemetry_shards import telemetry_shards
+
+_COLUMNS = ["device_id", "temperature", "packet_loss", "audio_dropouts", "error_code", "created_at"]
+
+
+def load_history(since: datetime) -> pd.DataFrame:
+    """One frame of readings since `since`, live shards and archive, sorted per device by time."""
+    frames: List[pd.DataFrame] = []
+    for shard in telemetry_shards.shards:
+        q = select(*(getattr(TelemetryEvent, c) for c in _COLUMNS)).where(TelemetryEvent.created_at >= since)
+        with shard.read_engine.connect() as conn:
+            frames.append(pd.read_sql(q, conn))
+    for partition in telemetry_archive.prune(since, None):
+        cols = telemetry_archive.partition_columns(partition, since=since)
+        keep = cols.mask(None, since, None)
+        codes = cols.error_codes[keep]
+        frames.append(pd.DataFrame({
+            "device_id": cols.devices[cols.device_codes[keep]],
+            "temperature": cols.temperature[keep],
+            "packet_loss": cols.packet_loss[keep],
+            "audio_dropouts": cols.audio_dropouts[keep],
+            "error_code": np.where(codes < 0, None, cols.errors[np.maximum(codes, 0)]) if len(cols.errors) else None,
+            "created_at": pd.to_datetime(cols.created_at[keep], unit="us"),
+        }))
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(["device_id", "created_at"], kind="stable", ignore_index=True)
+
+
+def build_dataset(
+    df: pd.DataFrame, window: int, horizon_minutes: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(features, labels, reading minutes, rule scores) for every reading whose horizon is observed."""
+    # error codes as ids shared by the whole frame (-1 = none), which is what feature_matrix compares
+    error_ids, _ = pd.factorize(df["error_code"], use_na_sentinel=True)
+    reading_minutes = (df["created_at"] - pd.Timestamp(0)).dt.total_seconds().to_numpy() / 60
+    series = {
+        "temperature": df["temperature"].to_numpy(np.float64),
+        "packet_loss": df["packet_loss"].to_numpy(np.float64),
+        "audio_dropouts": df["audio_dropouts"].to_numpy(np.float64),
+        "error_code": error_ids.astype(np.int64),
+        "minutes": reading_minutes,
+    }
+    parts: Dict[str, List[np.ndarray]] = {"X": [], "y": [], "t": [], "rules": []}
+    for rows in df.groupby("device_id", sort=False).indices.values():
+        device = {key: values[rows] for key, values in series.items()}
+        label, known = incident_labels(
+            device["minutes"],
+            incidents(device["packet_loss"], device["audio_dropouts"], device["error_code"]),
+            horizon_minutes,
+        )
+        if not known.any():
+            continue
+        history = {key: values[known] for key, values in history_windows(device, window).items()}
+        current = {key: values[known] for key, values in device.items()}
+        parts["X"].append(feature_matrix(current, history))
+        parts["y"].append(label[known])
+        parts["t"].append(current["minutes"])
+        parts["rules"].append(rule_scores(
+            current["temperature"], current["packet_loss"], current["audio_dropouts"], current["error_code"] != NO_ERROR
+        )[0])
+    if not parts["X"]:
+        return np.empty((0, 0)), np.empty(0, dtype=bool), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(parts[k]) for k in ("X", "y", "t", "rules"))  # type: ignore[return-value]
+
+
+def _scores(y: np.ndarray, predicted: np.ndarray) -> Dict[str, Optional[float]]:
+    if len(np.unique(y)) < 2:
+        return {"roc_auc": None, "average_precision": None}
+    return {
+        "roc_auc": round(float(roc_auc_score(y, predicted)), 4),
+        "average_precision": round(float(average_precision_score(y, predicted)), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=float, default=30, help="history to train on")
+    parser.add_argument("--window", type=int, default=12, help="previous readings per feature row")
+    parser.add_argument("--horizon-minutes", type=float, default=60, help="incident look-ahead for labels")
+    parser.add_argument("--holdout", type=float, default=0.2, help="newest share of time kept for evaluation")
+    parser.add_argument("--max-rows", type=int, default=2_000_000, help="training rows (sampled above this)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dry-run", action="store_true", help="train and evaluate, don't publish")
+    args = parser.parse_args()
+    if args.window < 1:
+        sys.exit("--window must be at least 1")
+
+    started = time.perf_counter()
+    since = datetime.utcnow() - timedelta(days=args.days)
+    df = load_history(since)
+    X, y, t, rules = build_dataset(df, args.window, args.horizon_minutes)
+    print(f"{len(df)} readings from {df['device_id'].nunique()} devices, {len(y)} labelled "
+          f"({y.mean() if len(y) else 0:.1%} incident within {args.horizon_minutes:g} min) "
+          f"in {time.perf_counter() - started:.1f}s")
+    if len(np.unique(y)) < 2:
+        sys.exit("Need labelled readings with and without incidents; ingest more history or widen --days")
+
+    # split by time; training rows must also see their whole horizon before the cut, or labels leak
+    cut = np.quantile(t, 1 - args.holdout)
+    train = np.flatnonzero(t + args.horizon_minutes <= cut)
+    test = np.flatnonzero(t >= cut)
+    rng = np.random.default_rng(args.seed)
+    if len(train) > args.max_rows:
+        train = np.sort(rng.choice(train, args.max_rows, replace=False))
+    if len(np.unique(y[train])) < 2:
+        sys.exit("Training split has a single class; lower --holdout or widen --days")
+
+    started = time.perf_counter()
+    model = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=args.seed)
+    model.fit(X[train], y[train])
+    print(f"trained on {len(train)} rows in {time.perf_counter() - started:.1f}s")
+
+    evaluation = {
+        "model": _scores(y[test], model.predict_proba(X[test])[:, 1]),
+        "rules": _scores(y[test], rules[test]),
+    }
+    print(f"holdout ({len(test)} rows):")
+    for name, scores in evaluation.items():
+        print(f"  {name:<6} ROC AUC {scores['roc_auc']}  average precision {scores['average_precision']}")
+
+    if args.dry_run:
+        return
+    version = risk_models.publish(model, {
+        "window": args.window,
+        "horizon_minutes": args.horizon_minutes,
+        "trained_since": since.isoformat(),
+        "train_rows": int(len(train)),
+        "positive_rate": round(float(y[train].mean()), 4),
+        "holdout": {"rows": int(len(test)), **evaluation},
+    })
+    print(f"published {version} to {risk_models.root}")
+
+
+if __name__ == "__main__":
+    main()